@@ -3,6 +3,9 @@ import os
 
 import streamlit as st
 
+from src.metrics import start_metrics_server, summarize_llm, summarize_stages
+from src.opensearch import get_connection_stats
+from src.startup import start_warmup
 from src.utils import setup_logging
 
 # Initialize logger
@@ -134,9 +137,65 @@ def display_sidebar_content() -> None:
     logger.info("Displayed sidebar content.")
 
 
+# Function to display live performance metrics
+@st.fragment(run_every="5s")
+def display_performance_panel() -> None:
+    """Displays stage latencies, LLM speed and connection reuse, refreshed every 5s."""
+    with st.expander("📈 Performance", expanded=False):
+        llm = summarize_llm()
+        connections = get_connection_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(
+            "Time to first token (p50)",
+            f"{llm['ttft_p50_ms']:.0f} ms" if llm["ttft_p50_ms"] is not None else "n/a",
+        )
+        col2.metric(
+            "Prefill (p50)",
+            (
+                f"{llm['prefill_p50_ms']:.0f} ms"
+                if llm["prefill_p50_ms"] is not None
+                else "n/a"
+            ),
+            help="Prompt evaluation time reported by Ollama; it shrinks when the "
+            "previous turn's prompt prefix is reused.",
+        )
+        col3.metric(
+            "Tokens/sec (p50)",
+            (
+                f"{llm['tokens_per_second_p50']:.1f}"
+                if llm["tokens_per_second_p50"] is not None
+                else "n/a"
+            ),
+        )
+        col4.metric("Connection reuse", f"{connections['connection_reuse_ratio']:.0%}")
+
+        stages = summarize_stages()
+        if stages:
+            st.dataframe(
+                [
+                    {
+                        "Stage": row["stage"],
+                        "Calls": row["count"],
+                        "Errors": row["errors"],
+                        "Mean (ms)": round(row["mean_ms"], 1),
+                        "p50 (ms)": round(row["p50_ms"], 1),
+                        "p95 (ms)": round(row["p95_ms"], 1),
+                    }
+                    for row in stages
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.caption("No traced requests yet in this process.")
+
+
 # Main execution
 if __name__ == "__main__":
+    start_metrics_server()
+    start_warmup()  # Loads the models while the welcome page is read
     apply_custom_css()
     display_logo("images/jamwithai_logo.png")
     display_sidebar_content()
     display_main_content()
+    display_performance_panel()
@@ -1,20 +1,20 @@
 import logging
 import os
+from typing import Any, Dict
 
 import streamlit as st
 
-from src.chat import (  # type: ignore
-    ensure_model_pulled,
-    generate_response_streaming,
-    get_embedding_model,
-)
-from src.ingestion import create_index, get_opensearch_client
-from src.constants import OLLAMA_MODEL_NAME, OPENSEARCH_INDEX
+from src.async_chat import generate_response_async, iterate_in_background
+from src.catalog import list_documents, list_tags
+from src.constants import RERANK_ENABLED
+from src.metrics import start_metrics_server
+from src.startup import get_readiness, start_warmup, wait_until_ready
 from src.utils import setup_logging
 
 # Initialize logger
 setup_logging()  # Configures logging for the application
 logger = logging.getLogger(__name__)
+start_metrics_server()  # Serves /metrics once per process
 
 # Set page configuration
 st.set_page_config(page_title="Jam with AI - Chatbot", page_icon="🤖")
@@ -40,12 +40,88 @@ st.markdown(
 )
 logger.info("Custom CSS applied.")
 
+# Names shown while components warm up
+COMPONENT_LABELS = {
+    "index": "search index",
+    "embedding_model": "embedding model",
+    "llm": "language model",
+    "reranker": "reranking model",
+}
+
+
+# Shows background loading progress until every component is ready
+@st.fragment(run_every="2s")
+def display_readiness() -> None:
+    """Shows which components are still loading in the background, and failures."""
+    readiness = get_readiness()
+    loading = [
+        COMPONENT_LABELS.get(component, component)
+        for component, state in readiness.items()
+        if state["state"] in ("pending", "loading")
+    ]
+    if loading:
+        st.info(
+            f"Loading the {', '.join(loading)} in the background; you can type your "
+            "question meanwhile."
+        )
+    for component, state in readiness.items():
+        if state["state"] == "failed":
+            st.warning(
+                f"The {COMPONENT_LABELS.get(component, component)} failed to load: "
+                f"{state.get('error')}"
+            )
+
+
+def render_search_filters() -> Dict[str, Any]:
+    """
+    Shows the search filters in the sidebar.
+
+    Returns:
+        Dict[str, Any]: The chosen filters, see resolve_search_filters; empty if none.
+    """
+    filters: Dict[str, Any] = {}
+    with st.sidebar.expander("Search filters"):
+        document_names = st.multiselect(
+            "Documents",
+            [document["document_name"] for document in list_documents()],
+            help="Only search these documents.",
+        )
+        uploaded = st.date_input(
+            "Uploaded between", value=(), help="Only search documents uploaded then."
+        )
+        tags = st.multiselect(
+            "Tags", list_tags(), help="Only search documents with any of these tags."
+        )
+        page_from = st.number_input("From page", min_value=1, value=None, step=1)
+        page_to = st.number_input("To page", min_value=1, value=None, step=1)
+        if page_from is not None or page_to is not None:
+            st.caption(
+                "Documents indexed before page numbers were recorded match any pages; "
+                "ingest them again to filter them by page."
+            )
+
+    if document_names:
+        filters["document_names"] = document_names
+    if isinstance(uploaded, tuple) and len(uploaded) >= 1:
+        filters["uploaded_from"] = uploaded[0]
+        filters["uploaded_to"] = uploaded[-1]
+    if tags:
+        filters["tags"] = tags
+    if page_from is not None:
+        filters["page_from"] = page_from
+    if page_to is not None:
+        filters["page_to"] = page_to
+    return filters
+
 
 # Main chatbot page rendering function
 def render_chatbot_page() -> None:
     # Set up a placeholder at the very top of the main content area
     st.title("Jam with AI - Chatbot 🤖")
-    model_loading_placeholder = st.empty()
+
+    # Load the index and models in the background while the page renders
+    start_warmup()
+    display_readiness()
 
     # Initialize session state variables for chatbot settings
     if "use_hybrid_search" not in st.session_state:
@@ -54,14 +130,8 @@ def render_chatbot_page() -> None:
         st.session_state["num_results"] = 5
     if "temperature" not in st.session_state:
         st.session_state["temperature"] = 0.7
-
-    # Initialize OpenSearch client
-    with st.spinner("Connecting to OpenSearch..."):
-        client = get_opensearch_client()
-    index_name = OPENSEARCH_INDEX
-
-    # Ensure the index exists
-    create_index(client)
+    if "use_reranker" not in st.session_state:
+        st.session_state["use_reranker"] = RERANK_ENABLED
 
     # Sidebar settings for hybrid search toggle, result count, and temperature
     st.session_state["use_hybrid_search"] = st.sidebar.checkbox(
@@ -74,6 +144,12 @@ def render_chatbot_page() -> None:
         value=st.session_state["num_results"],
         step=1,
     )
+    st.session_state["use_reranker"] = st.sidebar.checkbox(
+        "Rerank results",
+        value=st.session_state["use_reranker"],
+        help="Retrieves more candidates and keeps the most relevant ones using a "
+        "cross-encoder. Falls back to the search order if it takes too long.",
+    )
     st.session_state["temperature"] = st.sidebar.slider(
         "Response Temperature",
         min_value=0.0,
@@ -81,6 +157,7 @@ def render_chatbot_page() -> None:
         value=st.session_state["temperature"],
         step=0.1,
     )
+    st.session_state["search_filters"] = render_search_filters()
 
     # Display logo or placeholder
     logo_path = "images/jamwithai_logo.png"
@@ -111,20 +188,6 @@ def render_chatbot_page() -> None:
     )
     logger.info("Sidebar configured with headers and footer.")
 
-    # Display loading spinner at the top of the main content area
-    with model_loading_placeholder.container():
-        st.spinner("Loading models for chat...")
-
-    # Load models if not already loaded
-    if "embedding_models_loaded" not in st.session_state:
-        with model_loading_placeholder:
-            with st.spinner("Loading Embedding and Ollama models for Hybrid Search..."):
-                get_embedding_model()
-                ensure_model_pulled(OLLAMA_MODEL_NAME)
-                st.session_state["embedding_models_loaded"] = True
-        logger.info("Embedding model loaded.")
-        model_loading_placeholder.empty()
-
     # Initialize chat history in session state if not already present
     if "chat_history" not in st.session_state:
         st.session_state["chat_history"] = []
@@ -146,13 +209,23 @@ def render_chatbot_page() -> None:
             with st.spinner("Generating response..."):
                 response_placeholder = st.empty()
                 response_text = ""
+                prompt_usage = None
 
-                response_stream = generate_response_streaming(
-                    prompt,
-                    use_hybrid_search=st.session_state["use_hybrid_search"],
-                    num_results=st.session_state["num_results"],
-                    temperature=st.session_state["temperature"],
-                    chat_history=st.session_state["chat_history"],
+                # The index must exist before it is searched
+                if st.session_state["use_hybrid_search"]:
+                    wait_until_ready("index")
+
+                # Retrieval and generation run on the shared async event loop
+                response_stream = iterate_in_background(
+                    generate_response_async(
+                        prompt,
+                        use_hybrid_search=st.session_state["use_hybrid_search"],
+                        num_results=st.session_state["num_results"],
+                        temperature=st.session_state["temperature"],
+                        chat_history=st.session_state["chat_history"],
+                        rerank=st.session_state["use_reranker"],
+                        filters=st.session_state["search_filters"],
+                    )
                 )
 
             # Stream response content if response_stream is valid
@@ -165,10 +238,19 @@ def render_chatbot_page() -> None:
                     ):
                         response_text += chunk["message"]["content"]
                         response_placeholder.markdown(response_text + "▌")
+                    elif isinstance(chunk, dict) and "prompt_usage" in chunk:
+                        prompt_usage = chunk["prompt_usage"]
                     else:
                         logger.error("Unexpected chunk format in response stream.")
 
             response_placeholder.markdown(response_text)
+            if prompt_usage:
+                st.caption(
+                    f"Prompt: ~{prompt_usage['total']} of {prompt_usage['budget']} "
+                    f"tokens, {prompt_usage['context']} from "
+                    f"{prompt_usage['passages']} passages and "
+                    f"{prompt_usage['history']} from history"
+                )
             st.session_state["chat_history"].append(
                 {"role": "assistant", "content": response_text}
             )
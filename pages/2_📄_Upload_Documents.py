@@ -1,23 +1,34 @@
+import hashlib
 import logging
 import os
 import time
+import uuid
 
 import streamlit as st
-from PyPDF2 import PdfReader
-
-from src.constants import OPENSEARCH_INDEX, TEXT_CHUNK_SIZE
-from src.embeddings import generate_embeddings, get_embedding_model
-from src.ingestion import (
-    bulk_index_documents,
-    create_index,
-    delete_documents_by_document_name,
+
+from src.catalog import (
+    delete_document,
+    get_document,
+    list_documents,
+    parse_tags,
+)
+from src.ingestion import backfill_catalog
+from src.jobs import (
+    ACTIVE_STATUSES,
+    enqueue_job,
+    ensure_workers_running,
+    get_active_job,
+    list_jobs,
 )
-from src.opensearch import get_opensearch_client
-from src.utils import chunk_text, setup_logging
+from src.metrics import start_metrics_server
+from src.retrieval import get_retrieval_backend
+from src.startup import start_warmup
+from src.utils import setup_logging
 
 # Initialize logger
 setup_logging()  # Set up centralized logging configuration
 logger = logging.getLogger(__name__)
+start_metrics_server()  # Serves /metrics once per process
 
 # Set page config with title, icon, and layout
 st.set_page_config(page_title="Jam with AI - Upload Documents", page_icon="📂")
@@ -77,56 +88,25 @@ def render_upload_page() -> None:
     """
 
     st.title("Upload Documents")
-    # Placeholder for the loading spinner at the top
-    model_loading_placeholder = st.empty()
-
-    # Display the loading spinner at the top for loading the embedding model
-    if "embedding_models_loaded" not in st.session_state:
-        with model_loading_placeholder:
-            with st.spinner("Loading models for document processing..."):
-                get_embedding_model()
-                st.session_state["embedding_models_loaded"] = True
-        logger.info("Embedding models loaded.")
-        model_loading_placeholder.empty()  # Clear the placeholder after loading
+
+    # Ingestion runs in worker processes; warm up the chat models meanwhile
+    start_warmup()
 
     UPLOAD_DIR = "uploaded_files"
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-    # Initialize OpenSearch client
-    with st.spinner("Connecting to OpenSearch..."):
-        client = get_opensearch_client()
-    index_name = OPENSEARCH_INDEX
-
-    # Ensure the index exists
-    create_index(client)
-
-    # Initialize or clear the documents list in session state
-    st.session_state["documents"] = []
-
-    # Query OpenSearch to get the list of unique document names
-    query = {
-        "size": 0,
-        "aggs": {"unique_docs": {"terms": {"field": "document_name", "size": 10000}}},
-    }
-    response = client.search(index=index_name, body=query)
-    buckets = response["aggregations"]["unique_docs"]["buckets"]
-    document_names = [bucket["key"] for bucket in buckets]
-    logger.info("Retrieved document names from OpenSearch.")
-
-    # Load document information from the index
-    for document_name in document_names:
-        file_path = os.path.join(UPLOAD_DIR, document_name)
-        if os.path.exists(file_path):
-            reader = PdfReader(file_path)
-            text = "".join([page.extract_text() for page in reader.pages])
-            st.session_state["documents"].append(
-                {"filename": document_name, "content": text, "file_path": file_path}
-            )
-        else:
-            st.session_state["documents"].append(
-                {"filename": document_name, "content": "", "file_path": None}
-            )
-            logger.warning(f"File '{document_name}' does not exist locally.")
+    # Connect to the retrieval backend and ensure the index exists
+    with st.spinner("Connecting to the search index..."):
+        backend = get_retrieval_backend()
+        backend.ensure_index()
+
+    # Load the indexed documents from the local catalog instead of the index itself
+    documents = list_documents()
+    if not documents and backfill_catalog(backend.document_chunk_counts(), UPLOAD_DIR):
+        documents = list_documents()
+    st.session_state["documents"] = documents
+    document_names = [doc["document_name"] for doc in st.session_state["documents"]]
+    logger.info("Retrieved document names from the catalog.")
 
     if "deleted_file" in st.session_state:
         st.success(
@@ -138,43 +118,62 @@ def render_upload_page() -> None:
     uploaded_files = st.file_uploader(
         "Upload PDF documents", type="pdf", accept_multiple_files=True
     )
+    update_existing = st.checkbox(
+        "Update documents that already exist",
+        help="Only re-embeds the chunks that changed since the previous version.",
+    )
+    tags = parse_tags(
+        st.text_input(
+            "Tags",
+            placeholder="eg. contracts, 2024",
+            help="Comma-separated tags to filter searches by. Left empty, updated "
+            "documents keep their tags.",
+        )
+    )
 
+    # Uploads (name, content hash) already queued in this session
+    queued_uploads = st.session_state.setdefault("queued_uploads", set())
     if uploaded_files:
         with st.spinner("Uploading and processing documents. Please wait..."):
             for uploaded_file in uploaded_files:
-                if uploaded_file.name in document_names:
+                exists = uploaded_file.name in document_names
+                if exists and not update_existing:
                     st.warning(
                         f"The file '{uploaded_file.name}' already exists in the index."
                     )
                     continue
 
+                # Every rerun sees the upload again; its job may still be reading it,
+                # or have failed without leaving a catalog entry to skip it by
+                content_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+                upload_key = (uploaded_file.name, content_hash)
+                if upload_key in queued_uploads or get_active_job(uploaded_file.name):
+                    continue
+
+                previous = get_document(uploaded_file.name) if exists else None
+                if previous and previous["content_hash"] == content_hash:
+                    st.info(f"The file '{uploaded_file.name}' is unchanged.")
+                    continue
+
+                # The worker moves the staged file into place once it is indexed
                 file_path = save_uploaded_file(uploaded_file)
-                reader = PdfReader(file_path)
-                text = "".join([page.extract_text() for page in reader.pages])
-                chunks = chunk_text(text, chunk_size=TEXT_CHUNK_SIZE, overlap=100)
-                embeddings = generate_embeddings(chunks)
-
-                documents_to_index = [
-                    {
-                        "doc_id": f"{uploaded_file.name}_{i}",
-                        "text": chunk,
-                        "embedding": embedding,
-                        "document_name": uploaded_file.name,
-                    }
-                    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
-                ]
-                bulk_index_documents(documents_to_index)
-                st.session_state["documents"].append(
-                    {
-                        "filename": uploaded_file.name,
-                        "content": text,
-                        "file_path": file_path,
-                    }
+                enqueue_job(
+                    uploaded_file.name,
+                    file_path,
+                    update=exists,
+                    tags=tags or None,
+                    target_path=os.path.join(UPLOAD_DIR, uploaded_file.name),
                 )
-                document_names.append(uploaded_file.name)
-                logger.info(f"File '{uploaded_file.name}' uploaded and indexed.")
+                queued_uploads.add(upload_key)
+                job = get_active_job(uploaded_file.name)
+                if job is not None and job["file_path"] != file_path:
+                    os.remove(file_path)  # Another session queued it meanwhile
+                logger.info(f"File '{uploaded_file.name}' uploaded and queued.")
 
-        st.success("Files uploaded and indexed successfully!")
+        ensure_workers_running()
+        st.success("Files uploaded. They are indexed in the background.")
+
+    display_ingestion_jobs()
 
     if st.session_state["documents"]:
         st.markdown("### Uploaded Documents")
@@ -182,39 +181,86 @@ def render_upload_page() -> None:
             for idx, doc in enumerate(st.session_state["documents"], 1):
                 col1, col2 = st.columns([4, 1])
                 with col1:
+                    characters = (
+                        doc["char_count"] if doc["char_count"] is not None else "n/a"
+                    )
+                    tag_list = (
+                        f" - tags: {', '.join(doc['tags'])}" if doc["tags"] else ""
+                    )
                     st.write(
-                        f"{idx}. {doc['filename']} - {len(doc['content'])} characters extracted"
+                        f"{idx}. {doc['document_name']} - {characters} characters extracted"
+                        f"{tag_list}"
                     )
                 with col2:
                     delete_button = st.button(
                         "Delete",
-                        key=f"delete_{doc['filename']}_{idx}",
-                        help=f"Delete {doc['filename']}",
+                        key=f"delete_{doc['document_name']}_{idx}",
+                        help=f"Delete {doc['document_name']}",
                     )
                     if delete_button:
                         if doc["file_path"] and os.path.exists(doc["file_path"]):
                             try:
                                 os.remove(doc["file_path"])
                                 logger.info(
-                                    f"Deleted file '{doc['filename']}' from filesystem."
+                                    f"Deleted file '{doc['document_name']}' from filesystem."
                                 )
                             except FileNotFoundError:
                                 st.error(
-                                    f"File '{doc['filename']}' not found in filesystem."
+                                    f"File '{doc['document_name']}' not found in filesystem."
                                 )
                                 logger.error(
-                                    f"File '{doc['filename']}' not found during deletion."
+                                    f"File '{doc['document_name']}' not found during deletion."
                                 )
-                        delete_documents_by_document_name(doc["filename"])
+                        backend.delete_document(doc["document_name"])
+                        delete_document(doc["document_name"])
                         st.session_state["documents"].pop(idx - 1)
-                        st.session_state["deleted_file"] = doc["filename"]
+                        st.session_state["deleted_file"] = doc["document_name"]
+                        # Let the same file be uploaded again after deleting it
+                        st.session_state["queued_uploads"] = {
+                            key
+                            for key in queued_uploads
+                            if key[0] != doc["document_name"]
+                        }
                         time.sleep(0.5)
                         st.rerun()
 
 
+@st.fragment(run_every="2s")
+def display_ingestion_jobs() -> None:
+    """
+    Shows the progress of recent ingestion jobs, refreshing the page when one finishes.
+    """
+    jobs = list_jobs()
+    active = {job["job_id"] for job in jobs if job["status"] in ACTIVE_STATUSES}
+    # Reload the document list once jobs seen running have finished
+    if st.session_state.get("active_jobs", set()) - active:
+        st.session_state["active_jobs"] = active
+        st.rerun()
+    st.session_state["active_jobs"] = active
+
+    if not jobs:
+        return
+    with st.expander("Ingestion Jobs", expanded=bool(active)):
+        for job in jobs:
+            name = job["document_name"]
+            if job["status"] == "failed":
+                st.error(f"{name}: failed - {job['error']}")
+            elif job["status"] == "done":
+                st.write(f"{name}: done, {job['chunks_indexed']} chunks indexed")
+            elif job["status"] == "queued":
+                st.write(f"{name}: waiting for a worker")
+            else:
+                total = job["pages_total"] or 0
+                done = min(job["pages_done"], total)
+                st.progress(
+                    done / total if total else 0.0,
+                    text=f"{name}: {done} of {total or '?'} pages",
+                )
+
+
 def save_uploaded_file(uploaded_file) -> str:  # type: ignore
     """
-    Saves an uploaded file to the local file system.
+    Saves an uploaded file to a staging path of its own, which is never overwritten.
 
     Args:
         uploaded_file: The uploaded file to save.
@@ -222,8 +268,9 @@ def save_uploaded_file(uploaded_file) -> str:  # type: ignore
     Returns:
         str: The file path where the uploaded file is saved.
     """
-    UPLOAD_DIR = "uploaded_files"
-    file_path = os.path.join(UPLOAD_DIR, uploaded_file.name)
+    STAGING_DIR = os.path.join("uploaded_files", ".staging")
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    file_path = os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}_{uploaded_file.name}")
     with open(file_path, "wb") as f:
         f.write(uploaded_file.getbuffer())
     logger.info(f"File '{uploaded_file.name}' saved to '{file_path}'.")
@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    TypeVar,
+)
+
+from src.chat import retrieve_search_results
+from src.constants import (
+    HYBRID_FUSION_MODE,
+    HYBRID_FUSION_STRATEGY,
+    HYBRID_SEARCH_WEIGHTS,
+    LLM_CONTEXT_TOKENS,
+    LLM_KEEP_ALIVE,
+    OLLAMA_MODEL_NAME,
+    OPENSEARCH_HOST,
+    OPENSEARCH_HTTP_COMPRESS,
+    OPENSEARCH_POOL_MAXSIZE,
+    OPENSEARCH_PORT,
+)
+from src.context import build_llm_messages
+from src.embeddings import generate_query_embedding
+from src.fusion import fuse, resolve_leg_depths
+from src.metrics import LLMStreamRecorder, traced
+from src.opensearch import build_hybrid_query, build_knn_query, build_text_query
+from src.query_cache import get_query_cache, read_index_generation
+from src.rerank import get_candidate_count, rerank_hits
+from src.retrieval import OpenSearchBackend, get_retrieval_backend
+from src.search_filters import filters_key, resolve_search_filters
+from src.utils import setup_logging
+
+if TYPE_CHECKING:
+    from ollama import AsyncClient, Message, Options
+    from opensearchpy import AsyncOpenSearch
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Event loop shared by every chat session of the process, running in its own thread
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# Async clients are bound to the event loop they were created on
+_async_clients: MutableMapping[asyncio.AbstractEventLoop, "AsyncOpenSearch"] = (
+    weakref.WeakKeyDictionary()
+)
+_ollama_clients: MutableMapping[asyncio.AbstractEventLoop, "AsyncClient"] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide event loop, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running background event loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="async-chat-loop", daemon=True
+            ).start()
+            logger.info("Started background event loop for async chat.")
+        return _loop
+
+
+def iterate_in_background(stream: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consumes an async iterator on the background loop from synchronous code.
+
+    Lets the Streamlit script thread read an async token stream while the I/O of all
+    sessions is multiplexed on the one background loop.
+
+    Args:
+        stream (AsyncIterator[T]): The async iterator to consume.
+
+    Yields:
+        T: The items of the async iterator.
+    """
+    loop = get_background_loop()
+    try:
+        while True:
+            try:
+                item: T = asyncio.run_coroutine_threadsafe(
+                    stream.__anext__(), loop  # type: ignore[arg-type]
+                ).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+
+
+def get_async_opensearch_client() -> "AsyncOpenSearch":
+    """
+    Returns the AsyncOpenSearch client of the running event loop, creating it if needed.
+
+    Returns:
+        AsyncOpenSearch: Configured async OpenSearch client instance.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from opensearchpy import AsyncOpenSearch
+
+        client = AsyncOpenSearch(
+            hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
+            http_compress=OPENSEARCH_HTTP_COMPRESS,
+            maxsize=OPENSEARCH_POOL_MAXSIZE,
+            timeout=30,
+            max_retries=3,
+            retry_on_timeout=True,
+        )
+        _async_clients[loop] = client
+        logger.info("AsyncOpenSearch client initialized.")
+    return client
+
+
+def get_async_ollama_client() -> "AsyncClient":
+    """
+    Returns the Ollama AsyncClient of the running event loop, creating it if needed.
+
+    Returns:
+        AsyncClient: Ollama async client instance.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ollama_clients.get(loop)
+    if client is None:
+        from ollama import AsyncClient
+
+        client = AsyncClient()
+        _ollama_clients[loop] = client
+        logger.info("Ollama AsyncClient initialized.")
+    return client
+
+
+@traced("hybrid_search_async")
+async def hybrid_search_async(
+    query_text: str,
+    top_k: int = 5,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Performs a hybrid search, embedding the query while the BM25 leg is running.
+
+    In "client" HYBRID_FUSION_MODE the query embedding is computed in an executor while
+    the BM25 search is already in flight; the k-NN search follows as soon as the
+    embedding is ready. Both legs are then fused client-side with
+    HYBRID_FUSION_STRATEGY and HYBRID_SEARCH_WEIGHTS. In "pipeline" mode one hybrid
+    query is sent once the query is embedded and fused by `nlp-search-pipeline`, as in
+    the synchronous search. Cached results of the same or a similar query short-circuit the search. Backends
+    other than OpenSearch are searched in-process through an executor. With rerank, a
+    wider candidate set is searched and the cross-encoder keeps the best top_k.
+    Filters are applied inside both legs, so k-NN only searches matching chunks.
+
+    Args:
+        query_text (str): The text query.
+        top_k (int, optional): Number of top results to retrieve. Defaults to 5.
+        rerank (bool): Whether to rerank candidates with the cross-encoder. Defaults to False.
+        filters (Optional[Dict[str, Any]]): Search filters, see resolve_search_filters.
+
+    Returns:
+        List[Dict[str, Any]]: List of search results.
+    """
+    loop = asyncio.get_running_loop()
+    backend = get_retrieval_backend()
+    if not isinstance(backend, OpenSearchBackend):
+        return await loop.run_in_executor(
+            None, retrieve_search_results, query_text, top_k, rerank, filters
+        )
+    if filters:
+        # Upload dates and tags are looked up in the catalog
+        filters = await loop.run_in_executor(None, resolve_search_filters, filters)
+        if filters is not None and filters["document_names"] == []:
+            return []  # No document matches the filters
+    if rerank:
+        candidates = await hybrid_search_async(
+            query_text, get_candidate_count(top_k), filters=filters
+        )
+        return await loop.run_in_executor(
+            None, rerank_hits, query_text, candidates, top_k
+        )
+
+    params = (top_k, filters_key(filters))
+    cache = get_query_cache()
+    if cache is not None:
+        cached = cache.get(query_text, params)
+        if cached is not None:
+            return cached
+
+    if HYBRID_FUSION_MODE not in ("client", "pipeline"):
+        raise ValueError(f"Unknown hybrid fusion mode: {HYBRID_FUSION_MODE}")
+    client = get_async_opensearch_client()
+    text_depth, knn_depth = resolve_leg_depths(top_k)
+    source_filter = {"exclude": ["embedding"]}
+
+    generation = read_index_generation()
+    embedding_task = loop.run_in_executor(None, generate_query_embedding, query_text)
+    text_task: Optional["asyncio.Future[Dict[str, Any]]"] = None
+    if HYBRID_FUSION_MODE == "client":
+        text_task = asyncio.ensure_future(
+            client.search(
+                index=backend.index_name,
+                body={
+                    "_source": source_filter,
+                    "query": build_text_query(query_text, filters),
+                    "size": text_depth,
+                },
+            )
+        )
+    query_embedding = await embedding_task
+    if cache is not None:
+        cached = cache.get_similar(query_embedding, params)
+        if cached is not None:
+            if text_task is not None:
+                text_task.cancel()
+            return cached
+
+    hits: List[Dict[str, Any]]
+    if text_task is None:
+        response = await client.search(
+            index=backend.index_name,
+            body={
+                "_source": source_filter,
+                "query": build_hybrid_query(
+                    query_text, query_embedding.tolist(), knn_depth, filters
+                ),
+                "size": top_k,
+            },
+            search_pipeline="nlp-search-pipeline",
+        )
+        hits = response["hits"]["hits"]
+    else:
+        knn_response = await client.search(
+            index=backend.index_name,
+            body={
+                "_source": source_filter,
+                "query": build_knn_query(query_embedding.tolist(), knn_depth, filters),
+                "size": knn_depth,
+            },
+        )
+        text_response = await text_task
+        hits = fuse(
+            [text_response["hits"]["hits"], knn_response["hits"]["hits"]],
+            HYBRID_FUSION_STRATEGY,
+            HYBRID_SEARCH_WEIGHTS,
+            top_k,
+        )
+    if cache is not None:
+        cache.put(query_text, params, query_embedding, hits, generation)
+    logger.info(
+        f"Async hybrid search completed for query '{query_text}' with top_k={top_k}."
+    )
+    return hits
+
+
+async def run_llama_streaming_async(
+    messages: List["Message"], temperature: float
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams a response from the LLaMA model with Ollama's async client.
+
+    Args:
+        messages (List[Message]): The chat messages to send to the model.
+        temperature (float): The response generation temperature.
+
+    Yields:
+        Dict[str, Any]: Response chunks in the same format as `ollama.chat`.
+    """
+    import ollama
+
+    recorder = LLMStreamRecorder()
+    status = "ok"
+    options: "Options" = {"temperature": temperature, "num_ctx": LLM_CONTEXT_TOKENS}
+    try:
+        logger.info("Streaming response from LLaMA model (async).")
+        stream = await get_async_ollama_client().chat(
+            model=OLLAMA_MODEL_NAME,
+            messages=messages,
+            stream=True,
+            options=options,
+            keep_alive=LLM_KEEP_ALIVE,
+        )
+        async for chunk in stream:
+            recorder.on_chunk(chunk)
+            yield dict(chunk)
+    except ollama.ResponseError as e:
+        status = "error"
+        logger.error(f"Error during streaming: {e.error}")
+    finally:
+        recorder.finish(status)
+
+
+async def generate_response_async(
+    query: str,
+    use_hybrid_search: bool,
+    num_results: int,
+    temperature: float,
+    chat_history: Optional[List[Dict[str, str]]] = None,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of `generate_response_streaming`.
+
+    Args:
+        query (str): The user's query.
+        use_hybrid_search (bool): Whether to use hybrid search for context.
+        num_results (int): The number of search results to include in the context.
+        temperature (float): The temperature for the response generation.
+        chat_history (Optional[List[Dict[str, str]]]): List of chat history messages.
+        rerank (bool): Whether to rerank search results with the cross-encoder. Defaults to False.
+        filters (Optional[Dict[str, Any]]): Search filters, see resolve_search_filters.
+
+    Yields:
+        Dict[str, Any]: The estimated token usage of the prompt as {"prompt_usage": ...},
+            then response chunks in the same format as `ollama.chat`.
+    """
+    search_results: List[Dict[str, Any]] = []
+
+    if use_hybrid_search:
+        logger.info("Performing async hybrid search.")
+        search_results = await hybrid_search_async(
+            query, top_k=num_results, rerank=rerank, filters=filters
+        )
+
+    messages, usage = build_llm_messages(query, search_results, chat_history or [])
+    yield {"prompt_usage": usage}
+    async for chunk in run_llama_streaming_async(messages, temperature):
+        yield chunk
@@ -0,0 +1,515 @@
+"""
+Benchmarks ingestion and retrieval on a scratch index.
+
+Usage:
+    python -m src.benchmark --output benchmark_results/baseline.json
+    python -m src.benchmark --profile high-recall --concurrency 1 4 8
+    python -m src.benchmark --compare benchmark_results/baseline.json benchmark_results/new.json
+
+The bundled PDFs are ingested into a scratch index (or a temporary local index), then
+every query of the query set is replayed through hybrid search and the full chat path
+with a stubbed LLM. The query result and embedding caches are bypassed for queries,
+so every query is embedded and searched.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.catalog import hash_file
+from src.chat import generate_response_streaming, retrieve_search_results
+from src.constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_SERVICE_URL,
+    HYBRID_FUSION_MODE,
+    HYBRID_FUSION_STRATEGY,
+    HYBRID_SEARCH_WEIGHTS,
+    INDEX_PROFILE,
+    OPENSEARCH_INDEX,
+    RETRIEVAL_BACKEND,
+    TEXT_CHUNK_OVERLAP,
+    TEXT_CHUNK_SIZE,
+)
+from src.embeddings import generate_query_embedding, get_embedding_model
+from src.ingestion import delete_index
+from src.opensearch import get_opensearch_client
+from src.pipeline import ingest_pdf
+from src.rerank import get_candidate_count, rerank_hits
+from src.retrieval import (
+    LocalBackend,
+    OpenSearchBackend,
+    RetrievalBackend,
+    set_retrieval_backend,
+)
+from src.utils import setup_logging
+
+if TYPE_CHECKING:
+    from ollama import Message
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+DEFAULT_PDF_PATTERNS = ["uploaded_files/*.pdf", "notebooks/*.pdf"]
+DEFAULT_QUERY_SET = "src/benchmark_queries.json"
+
+# Tokens streamed by the stubbed LLM for every answer
+STUB_RESPONSE_TOKENS = 64
+
+
+def stub_llama_streaming(
+    messages: List["Message"], temperature: float
+) -> Iterator[str]:
+    """Streams a fixed answer like run_llama_streaming without running a model."""
+    for _ in range(STUB_RESPONSE_TOKENS):
+        yield "token "
+
+
+def summarize_latencies(seconds: List[float]) -> Dict[str, float]:
+    """
+    Summarises latencies in milliseconds.
+
+    Args:
+        seconds (List[float]): Measured latencies in seconds.
+
+    Returns:
+        Dict[str, float]: Count, mean, p50, p95 and p99 in milliseconds.
+    """
+    if not seconds:
+        return {"count": 0}
+    values = np.asarray(seconds) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def timed(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, float]:
+    """Calls a function and returns its result and the elapsed seconds."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def find_pdfs(patterns: List[str]) -> List[str]:
+    """
+    Finds the PDFs to ingest, skipping files with the same content.
+
+    Args:
+        patterns (List[str]): Glob patterns of PDF files.
+
+    Returns:
+        List[str]: Paths of distinct PDFs, the first of each duplicate kept.
+    """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            content_hash = hash_file(path)
+            if content_hash not in seen:
+                seen.add(content_hash)
+                paths.append(path)
+    return paths
+
+
+def benchmark_ingestion(
+    paths: List[str], use_embedding_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Ingests PDFs into the current retrieval backend and measures throughput.
+
+    Args:
+        paths (List[str]): Paths of the PDFs.
+        use_embedding_cache (bool): Whether to reuse cached chunk embeddings.
+
+    Returns:
+        Dict[str, Any]: Totals with pages/s and chunks/s.
+    """
+    totals: Dict[str, Any] = {"documents": 0, "pages": 0, "chunks": 0, "errors": 0}
+    start = time.perf_counter()
+    for path in paths:
+        stats = ingest_pdf(
+            path,
+            os.path.basename(path),
+            record_in_catalog=False,
+            use_embedding_cache=use_embedding_cache,
+        )
+        totals["documents"] += 1
+        totals["pages"] += stats["pages"]
+        totals["chunks"] += stats["chunks"]
+        totals["errors"] += len(stats["errors"])
+    totals["seconds"] = time.perf_counter() - start
+    totals["pages_per_second"] = totals["pages"] / totals["seconds"]
+    totals["chunks_per_second"] = totals["chunks"] / totals["seconds"]
+    return totals
+
+
+def is_relevant(hit: Dict[str, Any], labelled: Dict[str, Any]) -> bool:
+    """Tells whether a hit is from the labelled document and contains an answer."""
+    source = hit["_source"]
+    if source.get("document_name") != labelled["document_name"]:
+        return False
+    text = source["text"].lower()
+    return any(answer.lower() in text for answer in labelled["answers"])
+
+
+def score_results(
+    results: List[List[Dict[str, Any]]], queries: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """
+    Computes recall@k and MRR@k of search results against labelled answers.
+
+    Recall counts the share of a query's answers found in any of its top-k hits; the
+    reciprocal rank is that of the first relevant hit.
+
+    Args:
+        results (List[List[Dict[str, Any]]]): Top-k hits of every query.
+        queries (List[Dict[str, Any]]): Labelled queries in the same order.
+
+    Returns:
+        Dict[str, float]: Mean recall and MRR over the queries.
+    """
+    recalls = []
+    reciprocal_ranks = []
+    for hits, labelled in zip(results, queries):
+        found = {
+            answer
+            for hit in hits
+            for answer in labelled["answers"]
+            if is_relevant(hit, {**labelled, "answers": [answer]})
+        }
+        recalls.append(len(found) / len(labelled["answers"]))
+        ranks = [rank for rank, hit in enumerate(hits, 1) if is_relevant(hit, labelled)]
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+    return {
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "mrr": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else 0.0,
+    }
+
+
+def benchmark_queries(
+    backend: RetrievalBackend,
+    queries: List[Dict[str, Any]],
+    top_k: int,
+    repeat: int,
+    rerank: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Replays the query set and measures each stage.
+
+    Stages: 'embed' (query embedding), 'search' (hybrid search), 'rerank' (if enabled),
+    'retrieve' (all of them, as the chat does), 'first_token' and 'end_to_end' (the
+    full streaming chat path). Quality is scored on the final (reranked) hits.
+
+    Args:
+        backend (RetrievalBackend): Backend holding the ingested documents.
+        queries (List[Dict[str, Any]]): Labelled queries.
+        top_k (int): Number of results per search.
+        repeat (int): Number of passes over the query set.
+        rerank (bool): Whether to rerank candidates with the cross-encoder. Defaults to False.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, float]]: Latency summaries per stage, and retrieval quality.
+    """
+    latencies: Dict[str, List[float]] = {
+        "embed": [],
+        "search": [],
+        "rerank": [],
+        "retrieve": [],
+        "first_token": [],
+        "end_to_end": [],
+    }
+    results: List[List[Dict[str, Any]]] = []
+    for iteration in range(repeat):
+        for labelled in queries:
+            query = labelled["query"]
+            embedding, seconds = timed(generate_query_embedding, query, use_cache=False)
+            latencies["embed"].append(seconds)
+            depth = get_candidate_count(top_k) if rerank else top_k
+            hits, seconds = timed(
+                backend.hybrid_search, query, embedding.tolist(), top_k=depth
+            )
+            latencies["search"].append(seconds)
+            if rerank:
+                hits, seconds = timed(rerank_hits, query, hits, top_k)
+                latencies["rerank"].append(seconds)
+            if iteration == 0:
+                results.append(hits)
+
+            _, seconds = timed(
+                retrieve_search_results, query, top_k, rerank, use_cache=False
+            )
+            latencies["retrieve"].append(seconds)
+
+            start = time.perf_counter()
+            stream = generate_response_streaming(
+                query,
+                True,
+                top_k,
+                0.0,
+                rerank=rerank,
+                use_cache=False,
+                llm=stub_llama_streaming,
+            )
+            for position, _ in enumerate(stream or []):
+                if position == 0:
+                    latencies["first_token"].append(time.perf_counter() - start)
+            latencies["end_to_end"].append(time.perf_counter() - start)
+
+    summaries = {
+        stage: summarize_latencies(values)
+        for stage, values in latencies.items()
+        if values
+    }
+    return summaries, score_results(results, queries)
+
+
+def benchmark_concurrency(
+    queries: List[Dict[str, Any]], top_k: int, repeat: int, levels: List[int]
+) -> Dict[str, Any]:
+    """
+    Measures retrieval throughput with concurrent callers.
+
+    Args:
+        queries (List[Dict[str, Any]]): Labelled queries.
+        top_k (int): Number of results per search.
+        repeat (int): Number of passes over the query set.
+        levels (List[int]): Numbers of concurrent callers to measure.
+
+    Returns:
+        Dict[str, Any]: QPS and latency summary per concurrency level.
+    """
+    texts = [labelled["query"] for labelled in queries] * repeat
+    throughput = {}
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            start = time.perf_counter()
+            timings = list(
+                executor.map(
+                    lambda query: timed(
+                        retrieve_search_results, query, top_k, use_cache=False
+                    )[1],
+                    texts,
+                )
+            )
+            elapsed = time.perf_counter() - start
+        throughput[str(level)] = {
+            "qps": len(texts) / elapsed,
+            **summarize_latencies(timings),
+        }
+        logger.info(f"Concurrency {level}: {len(texts) / elapsed:.1f} queries/s.")
+    return throughput
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Runs the ingestion, latency, quality and throughput benchmarks.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+
+    Returns:
+        Dict[str, Any]: The benchmark results.
+    """
+    with open(args.queries, "r") as f:
+        queries = json.load(f)
+    paths = find_pdfs(args.pdfs)
+    if not paths:
+        raise RuntimeError(f"No PDFs found for {args.pdfs}.")
+
+    backend: RetrievalBackend
+    scratch_dir: Optional[str] = None
+    if args.backend == "local":
+        scratch_dir = tempfile.mkdtemp(prefix="benchmark-")
+        backend = LocalBackend(scratch_dir, EMBEDDING_DIMENSION)
+    else:
+        scratch_index = f"{OPENSEARCH_INDEX}-benchmark-{time.strftime('%Y%m%d%H%M%S')}"
+        backend = OpenSearchBackend(scratch_index, args.profile)
+    backend.ensure_index()
+    set_retrieval_backend(backend)
+
+    results: Dict[str, Any] = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "backend": args.backend,
+            "index_profile": args.profile,
+            "fusion_mode": HYBRID_FUSION_MODE,
+            "fusion_strategy": HYBRID_FUSION_STRATEGY,
+            "fusion_weights": HYBRID_SEARCH_WEIGHTS,
+            "embedding_model": EMBEDDING_MODEL_PATH,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "embedding_service": EMBEDDING_SERVICE_URL,
+            "chunk_size": TEXT_CHUNK_SIZE,
+            "chunk_overlap": TEXT_CHUNK_OVERLAP,
+            "top_k": args.top_k,
+            "rerank": args.rerank,
+            "repeat": args.repeat,
+            "documents": paths,
+            "queries": len(queries),
+        },
+    }
+    get_embedding_model()  # Load the model before anything is timed
+    try:
+        results["ingestion"] = benchmark_ingestion(
+            paths, use_embedding_cache=not args.cold
+        )
+        if isinstance(backend, OpenSearchBackend):
+            get_opensearch_client().indices.refresh(index=backend.index_name)
+
+        results["latency"], quality = benchmark_queries(
+            backend, queries, args.top_k, args.repeat, args.rerank
+        )
+        results["quality"] = {
+            f"recall@{args.top_k}": quality["recall"],
+            f"mrr@{args.top_k}": quality["mrr"],
+        }
+        results["throughput"] = benchmark_concurrency(
+            queries, args.top_k, args.repeat, args.concurrency
+        )
+    finally:
+        set_retrieval_backend(None)
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        elif isinstance(backend, OpenSearchBackend) and not args.keep_index:
+            delete_index(get_opensearch_client(), backend.index_name)
+    return results
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flattens the numeric values of nested results into dotted keys."""
+    values: Dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = float(value)
+    return values
+
+
+def compare_results(baseline_path: str, candidate_path: str) -> None:
+    """
+    Prints every metric of two result files side by side with the relative change.
+
+    Args:
+        baseline_path (str): Results to compare against.
+        candidate_path (str): New results.
+    """
+    with open(baseline_path, "r") as f:
+        baseline = flatten(json.load(f))
+    with open(candidate_path, "r") as f:
+        candidate = flatten(json.load(f))
+
+    print(f"{'metric':<40} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for key in sorted(set(baseline) | set(candidate)):
+        if key.startswith("config."):
+            continue
+        old, new = baseline.get(key), candidate.get(key)
+        change = (
+            f"{(new - old) / old * 100:+8.1f}%"
+            if old is not None and new is not None and old != 0
+            else ""
+        )
+        old_text = f"{old:12.3f}" if old is not None else f"{'-':>12}"
+        new_text = f"{new:12.3f}" if new is not None else f"{'-':>12}"
+        print(f"{key:<40} {old_text} {new_text} {change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--backend",
+        choices=["opensearch", "local"],
+        default=RETRIEVAL_BACKEND,
+        help="Retrieval backend to benchmark.",
+    )
+    parser.add_argument(
+        "--profile", default=INDEX_PROFILE, help="Index profile of the scratch index."
+    )
+    parser.add_argument(
+        "--pdfs",
+        nargs="+",
+        default=DEFAULT_PDF_PATTERNS,
+        help="Glob patterns of the PDFs to ingest.",
+    )
+    parser.add_argument(
+        "--queries", default=DEFAULT_QUERY_SET, help="Labelled query set (JSON)."
+    )
+    parser.add_argument("--top-k", type=int, default=5, help="Results per search.")
+    parser.add_argument(
+        "--rerank",
+        action="store_true",
+        help="Rerank candidates with the cross-encoder.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Passes over the query set."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 8],
+        help="Numbers of concurrent callers for the throughput test.",
+    )
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="Bypass the embedding cache so ingestion encodes every chunk.",
+    )
+    parser.add_argument(
+        "--keep-index", action="store_true", help="Keep the scratch OpenSearch index."
+    )
+    parser.add_argument("--output", help="File to write the JSON results to.")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CANDIDATE"),
+        help="Compare two result files instead of running the benchmark.",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    results = run_benchmark(args)
+    output = args.output or os.path.join(
+        "benchmark_results", f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    ingestion = results["ingestion"]
+    print(
+        f"Ingestion: {ingestion['pages_per_second']:.1f} pages/s, "
+        f"{ingestion['chunks_per_second']:.1f} chunks/s"
+    )
+    for stage, summary in results["latency"].items():
+        print(
+            f"{stage:<12} p50 {summary['p50_ms']:8.1f} ms  p95 {summary['p95_ms']:8.1f} ms"
+            f"  p99 {summary['p99_ms']:8.1f} ms"
+        )
+    for level, summary in results["throughput"].items():
+        print(f"concurrency {level:>3}: {summary['qps']:.1f} queries/s")
+    for metric, value in results["quality"].items():
+        print(f"{metric}: {value:.3f}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.constants import CATALOG_DB_PATH
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+CATALOG_COLUMNS = [
+    "document_name",
+    "file_path",
+    "size_bytes",
+    "page_count",
+    "char_count",
+    "chunk_count",
+    "content_hash",
+    "indexed_at",
+    "tags",
+]
+
+
+def connect_catalog() -> sqlite3.Connection:
+    """
+    Opens the document catalog, creating it if needed.
+
+    Returns:
+        sqlite3.Connection: Connection whose rows can be read as dictionaries.
+    """
+    os.makedirs(os.path.dirname(CATALOG_DB_PATH) or ".", exist_ok=True)
+    connection = sqlite3.connect(CATALOG_DB_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            document_name TEXT PRIMARY KEY,
+            file_path TEXT,
+            size_bytes INTEGER,
+            page_count INTEGER,
+            char_count INTEGER,
+            chunk_count INTEGER,
+            content_hash TEXT,
+            indexed_at TEXT
+        )
+        """)
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash)"
+    )
+    # Catalogs created before documents had tags lack the column
+    columns = {
+        row["name"] for row in connection.execute("PRAGMA table_info(documents)")
+    }
+    if "tags" not in columns:
+        connection.execute("ALTER TABLE documents ADD COLUMN tags TEXT")
+    return connection
+
+
+def _row_to_document(row: sqlite3.Row) -> Dict[str, Any]:
+    """Converts a catalog row to a dictionary, decoding its tags to a list."""
+    document = dict(row)
+    document["tags"] = json.loads(document["tags"]) if document.get("tags") else []
+    return document
+
+
+def parse_tags(text: Optional[str]) -> List[str]:
+    """
+    Parses comma-separated tags, eg. "Contracts, 2024".
+
+    Args:
+        text (Optional[str]): The tags as entered by the user.
+
+    Returns:
+        List[str]: The distinct non-empty tags, lowercased, in the order given.
+    """
+    tags: List[str] = []
+    for tag in (text or "").split(","):
+        tag = tag.strip().lower()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Computes the SHA-256 digest of a file's content.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def upsert_document(record: Dict[str, Any]) -> None:
+    """
+    Adds or replaces a document in the catalog.
+
+    Args:
+        record (Dict[str, Any]): Document metadata keyed by CATALOG_COLUMNS. Missing
+            values are stored as NULL and 'indexed_at' defaults to the current time.
+            'tags' is a list of tags; if it is missing or None, the document keeps the
+            tags it already has.
+    """
+    values = {column: record.get(column) for column in CATALOG_COLUMNS}
+    values["indexed_at"] = (
+        values["indexed_at"] or datetime.now(timezone.utc).isoformat()
+    )
+    if values["tags"] is not None:
+        values["tags"] = json.dumps(sorted(set(values["tags"])))
+    placeholders = ", ".join(f":{column}" for column in CATALOG_COLUMNS)
+    updates = ", ".join(
+        f"{column} = excluded.{column}"
+        for column in CATALOG_COLUMNS
+        if column not in ("document_name", "tags")
+    )
+    with closing(connect_catalog()) as connection, connection:
+        connection.execute(
+            f"INSERT INTO documents ({', '.join(CATALOG_COLUMNS)}) "
+            f"VALUES ({placeholders}) "
+            f"ON CONFLICT (document_name) DO UPDATE SET {updates}, "
+            "tags = COALESCE(excluded.tags, documents.tags)",
+            values,
+        )
+    logger.info(f"Catalog updated for document '{record['document_name']}'.")
+
+
+def get_document(document_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up a document by name.
+
+    Args:
+        document_name (str): Name of the document.
+
+    Returns:
+        Optional[Dict[str, Any]]: The document metadata, with 'tags' as a list, or None
+            if it is not catalogued.
+    """
+    with closing(connect_catalog()) as connection:
+        row = connection.execute(
+            "SELECT * FROM documents WHERE document_name = ?", (document_name,)
+        ).fetchone()
+    return _row_to_document(row) if row else None
+
+
+def find_document_by_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up a document by the hash of its file content.
+
+    Args:
+        content_hash (str): SHA-256 digest of the file content.
+
+    Returns:
+        Optional[Dict[str, Any]]: The document metadata, or None if no document matches.
+    """
+    with closing(connect_catalog()) as connection:
+        row = connection.execute(
+            "SELECT * FROM documents WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+    return _row_to_document(row) if row else None
+
+
+def list_documents() -> List[Dict[str, Any]]:
+    """
+    Lists all catalogued documents in the order they were indexed.
+
+    Returns:
+        List[Dict[str, Any]]: Metadata of each document, with 'tags' as a list.
+    """
+    with closing(connect_catalog()) as connection:
+        rows = connection.execute(
+            "SELECT * FROM documents ORDER BY indexed_at, document_name"
+        ).fetchall()
+    return [_row_to_document(row) for row in rows]
+
+
+def list_tags() -> List[str]:
+    """
+    Lists every tag given to a catalogued document.
+
+    Returns:
+        List[str]: The distinct tags, sorted.
+    """
+    return sorted({tag for document in list_documents() for tag in document["tags"]})
+
+
+def delete_document(document_name: str) -> None:
+    """
+    Removes a document from the catalog.
+
+    Args:
+        document_name (str): Name of the document.
+    """
+    with closing(connect_catalog()) as connection, connection:
+        connection.execute(
+            "DELETE FROM documents WHERE document_name = ?", (document_name,)
+        )
+    logger.info(f"Removed document '{document_name}' from the catalog.")
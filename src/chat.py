@@ -1,14 +1,21 @@
 import logging
-from typing import Dict, Iterable, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
 
-import ollama
 import streamlit as st
 
-from src.constants import ASSYMETRIC_EMBEDDING, OLLAMA_MODEL_NAME
-from src.embeddings import get_embedding_model
-from src.opensearch import hybrid_search
+from src.constants import LLM_CONTEXT_TOKENS, LLM_KEEP_ALIVE, OLLAMA_MODEL_NAME
+from src.context import build_llm_messages
+from src.embeddings import generate_query_embedding
+from src.metrics import record_llm_stream, traced
+from src.query_cache import get_query_cache, read_index_generation
+from src.rerank import get_candidate_count, rerank_hits
+from src.retrieval import get_retrieval_backend
+from src.search_filters import filters_key, resolve_search_filters
 from src.utils import setup_logging
 
+if TYPE_CHECKING:
+    from ollama import Message, Options
+
 # Initialize logger
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -25,8 +32,12 @@ def ensure_model_pulled(model: str) -> bool:
     Returns:
         bool: True if the model is available or successfully pulled, False if an error occurs.
     """
+    import ollama
+
     try:
-        available_models = ollama.list()
+        available_models = {
+            entry.get("name") for entry in ollama.list().get("models", [])
+        }
         if model not in available_models:
             logger.info(f"Model {model} not found locally. Pulling the model...")
             ollama.pull(model)
@@ -39,67 +50,127 @@ def ensure_model_pulled(model: str) -> bool:
     return True
 
 
-def run_llama_streaming(prompt: str, temperature: float) -> Optional[Iterable[str]]: 
+def preload_model(model: str) -> None:
+    """
+    Loads a model into Ollama's memory so that the first question does not wait for it.
+
+    Uses the same context window and keep-alive as chat requests, as Ollama reloads a
+    model whose context window changes.
+
+    Args:
+        model (str): The name of the model to load.
+    """
+    import ollama
+
+    try:
+        ollama.generate(
+            model=model,
+            prompt="",
+            options={"num_ctx": LLM_CONTEXT_TOKENS},
+            keep_alive=LLM_KEEP_ALIVE,
+        )
+        logger.info(f"Model {model} loaded into Ollama.")
+    except ollama.ResponseError as e:
+        logger.error(f"Error loading model {model}: {e.error}")
+
+
+def run_llama_streaming(
+    messages: List["Message"], temperature: float
+) -> Optional[Iterable[str]]:
     """
     Uses Ollama's Python library to run the LLaMA model with streaming enabled.
 
+    The model is kept loaded for LLM_KEEP_ALIVE with a context window of
+    LLM_CONTEXT_TOKENS, so the prompt cache of the previous turn stays usable.
+
     Args:
-        prompt (str): The prompt to send to the model.
+        messages (List[Message]): The chat messages to send to the model.
         temperature (float): The response generation temperature.
 
     Returns:
         Optional[Iterable[str]]: A generator yielding response chunks as strings, or None if an error occurs.
     """
+    import ollama
 
+    options: "Options" = {"temperature": temperature, "num_ctx": LLM_CONTEXT_TOKENS}
     try:
         # Now attempt to stream the response from the model
         logger.info("Streaming response from LLaMA model.")
         stream = ollama.chat(
             model=OLLAMA_MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
             stream=True,
-            options={"temperature": temperature},
+            options=options,
+            keep_alive=LLM_KEEP_ALIVE,
         )
     except ollama.ResponseError as e:
         logger.error(f"Error during streaming: {e.error}")
         return None
 
-    return stream
+    # Records time to first token, prefill and decode speed as the stream is consumed
+    return record_llm_stream(stream)
 
 
-def prompt_template(query: str, context: str, history: List[Dict[str, str]]) -> str:
+@traced("retrieve")
+def retrieve_search_results(
+    query: str,
+    num_results: int,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
     """
-    Builds the prompt with context, conversation history, and user query.
+    Runs hybrid search for a query, reusing cached results where possible.
+
+    An identical query is answered without embedding it; otherwise the query embedding
+    is compared against cached queries before falling back to the retrieval backend.
+    With rerank, a wider candidate set is retrieved (and cached) and the cross-encoder
+    keeps the best num_results. Filters restrict both search legs to the matching
+    chunks before they are ranked.
 
     Args:
         query (str): The user's query.
-        context (str): Context text gathered from hybrid search.
-        history (List[Dict[str, str]]): Conversation history to include in the prompt.
+        num_results (int): The number of search results to retrieve.
+        rerank (bool): Whether to rerank candidates with the cross-encoder. Defaults to False.
+        filters (Optional[Dict[str, Any]]): Search filters, see resolve_search_filters.
+        use_cache (bool): Whether to use the query result and embedding caches.
+            Defaults to True.
 
     Returns:
-        str: Constructed prompt for Ollama model.
+        List[Dict[str, Any]]: List of search results.
     """
-    prompt = "You are a knowledgeable chatbot assistant. "
-    if context:
-        prompt += (
-            "Use the following context to answer the question.\nContext:\n"
-            + context
-            + "\n"
+    filters = resolve_search_filters(filters)
+    if filters is not None and filters["document_names"] == []:
+        return []  # No document matches the filters
+    if rerank:
+        candidates = retrieve_search_results(
+            query,
+            get_candidate_count(num_results),
+            filters=filters,
+            use_cache=use_cache,
         )
-    else:
-        prompt += "Answer questions to the best of your knowledge.\n"
-
-    if history:
-        prompt += "Conversation History:\n"
-        for msg in history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            content = msg["content"]
-            prompt += f"{role}: {content}\n"
-        prompt += "\n"
-
-    prompt += f"User: {query}\nAssistant:"
-    logger.info("Prompt constructed with context and conversation history.")
-    return prompt
+        return rerank_hits(query, candidates, num_results)
+
+    params = (num_results, filters_key(filters))
+    cache = get_query_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(query, params)
+        if cached is not None:
+            return cached
+
+    query_embedding = generate_query_embedding(query, use_cache)
+    if cache is not None:
+        cached = cache.get_similar(query_embedding, params)
+        if cached is not None:
+            return cached
+
+    generation = read_index_generation()
+    search_results = get_retrieval_backend().hybrid_search(
+        query, query_embedding.tolist(), top_k=num_results, filters=filters
+    )
+    if cache is not None:
+        cache.put(query, params, query_embedding, search_results, generation)
+    return search_results
 
 
 def generate_response_streaming(
@@ -108,6 +179,10 @@ def generate_response_streaming(
     num_results: int,
     temperature: float,
     chat_history: Optional[List[Dict[str, str]]] = None,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    llm: Optional[Callable[[List["Message"], float], Optional[Iterable[str]]]] = None,
 ) -> Optional[Iterable[str]]:
     """
     Generates a chatbot response by performing hybrid search and incorporating conversation history.
@@ -118,34 +193,27 @@ def generate_response_streaming(
         num_results (int): The number of search results to include in the context.
         temperature (float): The temperature for the response generation.
         chat_history (Optional[List[Dict[str, str]]]): List of chat history messages.
+        rerank (bool): Whether to rerank search results with the cross-encoder. Defaults to False.
+        filters (Optional[Dict[str, Any]]): Search filters, see resolve_search_filters.
+        use_cache (bool): Whether to use the query result and embedding caches.
+            Defaults to True.
+        llm (Optional[Callable]): Streams the answer to the messages at a temperature.
+            Defaults to run_llama_streaming.
 
     Returns:
         Optional[Iterable[str]]: A generator yielding response chunks as strings, or None if an error occurs.
     """
-    chat_history = chat_history or []
-    max_history_messages = 10
-    history = chat_history[-max_history_messages:]
-    context = ""
+    search_results: List[Dict[str, Any]] = []
 
     # Include hybrid search results if enabled
     if use_hybrid_search:
         logger.info("Performing hybrid search.")
-        if ASSYMETRIC_EMBEDDING:
-            prefixed_query = f"passage: {query}"
-        else:
-            prefixed_query = f"{query}"
-        embedding_model = get_embedding_model()
-        query_embedding = embedding_model.encode(
-            prefixed_query
-        ).tolist()  # Convert tensor to list of floats
-        search_results = hybrid_search(query, query_embedding, top_k=num_results)
+        search_results = retrieve_search_results(
+            query, num_results, rerank, filters, use_cache
+        )
         logger.info("Hybrid search completed.")
 
-        # Collect text from search results
-        for i, result in enumerate(search_results):
-            context += f"Document {i}:\n{result['_source']['text']}\n\n"
-
-    # Generate prompt using the prompt_template function
-    prompt = prompt_template(query, context, history)
+    # Pack the results and history into the LLM context window
+    messages, _ = build_llm_messages(query, search_results, chat_history or [])
 
-    return run_llama_streaming(prompt, temperature)
+    return (llm or run_llama_streaming)(messages, temperature)
@@ -0,0 +1,218 @@
+import bisect
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from src.utils import clean_text, setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Sentence ends (punctuation followed by whitespace) and paragraph breaks
+SEGMENT_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"\S+")
+
+# A paragraph break ends the current chunk once it holds this share of the budget
+PARAGRAPH_MIN_FILL = 0.5
+
+# (start, end, starts_paragraph): a sentence or, for overlong sentences, a word range
+Segment = Tuple[int, int, bool]
+
+# Fields locating a chunk in its document, stored with each indexed chunk
+POSITION_FIELDS = ("char_start", "char_end", "page_start", "page_end")
+
+
+def split_segments(text: str, offset: int = 0) -> List[Segment]:
+    """
+    Splits text into sentences, noting which ones start a paragraph.
+
+    Args:
+        text (str): The text to split.
+        offset (int): Position of text in the document, added to every offset.
+
+    Returns:
+        List[Segment]: (start, end, starts_paragraph) of every non-empty sentence.
+    """
+    segments: List[Segment] = []
+    position = 0
+    starts_paragraph = True
+    for boundary in SEGMENT_BOUNDARY.finditer(text):
+        _append_segment(segments, text, position, boundary.start(), starts_paragraph)
+        position = boundary.end()
+        starts_paragraph = "\n" in boundary.group()
+    _append_segment(segments, text, position, len(text), starts_paragraph)
+    return [(start + offset, end + offset, new) for start, end, new in segments]
+
+
+def _append_segment(
+    segments: List[Segment], text: str, start: int, end: int, starts_paragraph: bool
+) -> None:
+    """Appends text[start:end] without surrounding whitespace, if not empty."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        segments.append((start, end, starts_paragraph))
+
+
+def iter_text_chunks(
+    texts: Iterable[str],
+    max_tokens: int,
+    overlap_tokens: int,
+    count_tokens: Callable[[List[str]], List[int]],
+) -> Iterator[Dict[str, Any]]:
+    """
+    Splits a stream of texts (eg. PDF pages) into chunks that fit a token budget.
+
+    Chunks are made of whole sentences and end early at a paragraph break once they are
+    half full. A sentence longer than the budget is split between words. Consecutive
+    chunks share trailing sentences worth up to overlap_tokens, except across a
+    paragraph break. Offsets refer to the document text, ie. the cleaned non-empty texts
+    joined with spaces; each chunk's text is a single slice of it. Page numbers count
+    every text from 1, empty ones included.
+
+    Only the text of the chunk being built is kept between texts, and sentences carried
+    over are not tokenized again.
+
+    Args:
+        texts (Iterable[str]): The texts to split, in order.
+        max_tokens (int): Maximum number of tokens in a chunk.
+        overlap_tokens (int): Maximum number of tokens repeated from the previous chunk.
+        count_tokens (Callable[[List[str]], List[int]]): Counts the tokens of each text.
+
+    Yields:
+        Dict[str, Any]: Chunks with 'text', 'char_start', 'char_end', 'page_start',
+            'page_end' and 'tokens'.
+    """
+    buffer = ""  # Document text from offset `base` on, from the chunk being built
+    base = 0
+    emitted_until = 0  # End offset of the last emitted chunk
+    token_counts: Dict[Tuple[int, int], int] = {}
+    chunk_count = 0
+    page_offsets: List[int] = []  # Document offset where each non-empty text starts
+    page_numbers: List[int] = []
+
+    def page_at(offset: int) -> int:
+        return page_numbers[bisect.bisect_right(page_offsets, offset) - 1]
+
+    def emit(start: int, end: int, tokens: int) -> Dict[str, Any]:
+        nonlocal emitted_until, chunk_count
+        emitted_until = end
+        chunk_count += 1
+        return {
+            "text": buffer[start - base : end - base],
+            "char_start": start,
+            "char_end": end,
+            "page_start": page_at(start),
+            "page_end": page_at(end - 1),
+            "tokens": tokens,
+        }
+
+    def pack(final: bool) -> Iterator[Dict[str, Any]]:
+        nonlocal buffer, base
+        segments = split_segments(buffer, base)
+        missing = [(start, end) for start, end, _ in segments]
+        missing = [span for span in missing if span not in token_counts]
+        counts = count_tokens([buffer[s - base : e - base] for s, e in missing])
+        token_counts.update(zip(missing, counts))
+        segments = _fit_segments(
+            segments, buffer, base, max_tokens, token_counts, count_tokens
+        )
+        tokens = [token_counts[(start, end)] for start, end, _ in segments]
+
+        first = 0
+        total = 0
+        for index, (_, _, starts_paragraph) in enumerate(segments):
+            if index == first:
+                total += tokens[index]
+                continue
+            paragraph_break = (
+                starts_paragraph and total >= max_tokens * PARAGRAPH_MIN_FILL
+            )
+            if paragraph_break or total + tokens[index] > max_tokens:
+                yield emit(segments[first][0], segments[index - 1][1], total)
+                # Start the next chunk with the trailing sentences that fit the overlap
+                overlap = 0
+                next_first = index
+                while (
+                    not paragraph_break
+                    and next_first - 1 > first
+                    and overlap + tokens[next_first - 1] <= overlap_tokens
+                    and overlap + tokens[next_first - 1] + tokens[index] <= max_tokens
+                ):
+                    next_first -= 1
+                    overlap += tokens[next_first]
+                first, total = next_first, overlap
+            total += tokens[index]
+
+        if final:
+            if segments and segments[-1][1] > emitted_until:
+                yield emit(segments[first][0], segments[-1][1], total)
+            return
+
+        # Keep only the text of the chunk being built for the next text
+        keep_from = segments[first][0] if segments else base + len(buffer)
+        buffer = buffer[keep_from - base :]
+        base = keep_from
+        for span in [span for span in token_counts if span[0] < base]:
+            del token_counts[span]
+
+    document_length = 0
+    for page_number, text in enumerate(texts, start=1):
+        text = clean_text(text)
+        if not text:
+            continue
+        if document_length:
+            buffer += " "
+            document_length += 1
+        page_offsets.append(document_length)
+        page_numbers.append(page_number)
+        buffer += text
+        document_length += len(text)
+        yield from pack(final=False)
+    yield from pack(final=True)
+
+    logger.info(
+        f"Text streamed into {chunk_count} chunks of at most {max_tokens} tokens "
+        f"with up to {overlap_tokens} tokens of overlap."
+    )
+
+
+def _fit_segments(
+    segments: List[Segment],
+    buffer: str,
+    base: int,
+    max_tokens: int,
+    token_counts: Dict[Tuple[int, int], int],
+    count_tokens: Callable[[List[str]], List[int]],
+) -> List[Segment]:
+    """
+    Splits segments that alone exceed the budget into word ranges that fit it.
+
+    Word ranges are counted as the sum of their words' counts, which matches tokenizers
+    that split on whitespace first. Their counts are added to token_counts.
+    """
+    fitted: List[Segment] = []
+    for start, end, starts_paragraph in segments:
+        if token_counts[(start, end)] <= max_tokens:
+            fitted.append((start, end, starts_paragraph))
+            continue
+        words = [
+            (start + match.start(), start + match.end())
+            for match in WORD.finditer(buffer[start - base : end - base])
+        ]
+        word_tokens = count_tokens([buffer[s - base : e - base] for s, e in words])
+        piece_start, piece_end, piece_tokens = words[0][0], words[0][1], 0
+        for (word_start, word_end), tokens in zip(words, word_tokens):
+            if piece_tokens and piece_tokens + tokens > max_tokens:
+                token_counts[(piece_start, piece_end)] = piece_tokens
+                fitted.append((piece_start, piece_end, starts_paragraph))
+                starts_paragraph = False
+                piece_start, piece_tokens = word_start, 0
+            piece_tokens += tokens
+            piece_end = word_end
+        token_counts[(piece_start, piece_end)] = piece_tokens
+        fitted.append((piece_start, piece_end, starts_paragraph))
+    return fitted
@@ -1,7 +1,58 @@
 EMBEDDING_MODEL_PATH = "sentence-transformers/all-mpnet-base-v2"  # OR Path of local eg. "embedding_model/"" or the name of SentenceTransformer model eg. "sentence-transformers/all-mpnet-base-v2" from Hugging Face
 ASSYMETRIC_EMBEDDING = False  # Flag for asymmetric embedding
 EMBEDDING_DIMENSION = 768  # Embedding model settings
-TEXT_CHUNK_SIZE = 300  # Maximum number of characters in each text chunk for
+TEXT_CHUNK_SIZE = 300  # Max embedding tokens per chunk, capped by the model's window
+TEXT_CHUNK_OVERLAP = 50  # Max tokens of trailing sentences repeated in the next chunk
+EMBEDDING_BATCH_SIZE = 32  # Number of chunks encoded per forward pass
+EMBEDDING_DEVICE = None  # None picks cuda, then mps, then cpu; or set eg. "cpu"
+EMBEDDING_BACKEND = "torch"  # "torch", or "onnx" for int8 ONNX Runtime on the CPU
+EMBEDDING_ONNX_THREADS = 0  # Inference threads of the "onnx" backend; 0 = all cores
+EMBEDDING_SERVICE_URL = (
+    None  # eg. "http://127.0.0.1:9465" to share one embedding server
+)
+EMBEDDING_SERVER_MAX_BATCH = 64  # Texts the embedding server encodes together at most
+EMBEDDING_SERVER_MAX_WAIT_MS = 5  # Time the embedding server waits to fill a batch
+EMBEDDING_SERVER_MAX_AGE_MS = 200  # Requests waiting longer are encoded next
+EMBEDDING_CACHE_ENABLED = True  # Reuse embeddings of previously seen chunks and queries
+EMBEDDING_CACHE_MAX_ENTRIES = (
+    100000  # Least recently used embeddings are evicted beyond this
+)
+QUERY_CACHE_ENABLED = True  # Reuse search results of repeated or similar queries
+QUERY_CACHE_MAX_ENTRIES = 256  # Least recently used queries are evicted beyond this
+QUERY_CACHE_TTL = 600  # Seconds a cached search result stays valid
+QUERY_CACHE_SIMILARITY = 0.95  # Cosine similarity above which queries share results
+PDF_EXTRACTION_WORKERS = 0  # Processes for page extraction and OCR; 0 = one per core
+PDF_PAGE_TIMEOUT = 120  # Seconds to wait for a single page before skipping it
+INGEST_BULK_THREADS = 2  # Concurrent bulk requests while ingesting; 1 disables threads
+INGEST_BULK_CHUNK_SIZE = 200  # Number of chunks sent per bulk request
+INGEST_BULK_MAX_BYTES = 10 * 1024 * 1024  # Upper bound on the size of one bulk request
+INGEST_VECTOR_DECIMALS = None  # Decimals of embeddings sent to OpenSearch; None = exact
+INDEX_EMBEDDINGS_IN_SOURCE = True  # False keeps vectors out of _source of new indices
+INGEST_WORKER_PROCESSES = 1  # Background ingestion jobs processed at the same time
+INGEST_WORKER_NICE = 10  # Priority drop of ingestion workers so chat stays responsive
+INGEST_WORKER_EXTRACTION_PROCESSES = 2  # Page extraction/OCR processes per worker
+INGEST_WORKER_TORCH_THREADS = 2  # CPU threads a worker may use for embedding
+INGEST_CHECKPOINT_PAGES = 16  # Pages extracted between two checkpoints of a job
+
+RETRIEVAL_BACKEND = "opensearch"  # "opensearch", or "local" for the in-process index
+INDEX_PROFILE = "default"  # k-NN index profile from src/index_profiles.json
+HYBRID_FUSION_MODE = "pipeline"  # "pipeline" (nlp-search-pipeline) or "client"
+HYBRID_FUSION_STRATEGY = "min_max"  # Client-side fusion: "min_max", "z_score" or "rrf"
+HYBRID_TEXT_DEPTH = None  # BM25 candidates fetched per query; None = number of results
+HYBRID_KNN_DEPTH = None  # k-NN candidates fetched per query; None = number of results
+RERANK_ENABLED = False  # Default of the sidebar toggle for cross-encoder reranking
+RERANK_MODEL_PATH = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # Local path or HF name
+RERANK_CANDIDATE_MULTIPLIER = 4  # Hits retrieved per result kept after reranking
+RERANK_LATENCY_BUDGET = 0.5  # Seconds reranking may take before it is skipped
+LLM_CONTEXT_TOKENS = 4096  # Context window requested from Ollama (num_ctx)
+LLM_RESPONSE_TOKENS = 512  # Part of the context window kept free for the answer
+PROMPT_HISTORY_SHARE = 0.25  # Share of the prompt budget reserved for chat history
+MAX_HISTORY_MESSAGES = 10  # Most recent chat messages considered for the prompt
+LLM_PROMPT_LAYOUT = "messages"  # "messages" keeps a reusable prefix; "single" prompt
+LLM_KEEP_ALIVE = "30m"  # How long Ollama keeps the model and its prompt cache loaded
+
+METRICS_ENABLED = True  # Trace pipeline stages and LLM speed; served as Prometheus text
+METRICS_PORT = 9464  # Local port of the /metrics endpoint
 
 OLLAMA_MODEL_NAME = (
     "llama3.2:1b"  # Name of the model used in Ollama for chat functionality
@@ -13,7 +64,36 @@ OLLAMA_MODEL_NAME = (
 
 # Logging
 LOG_FILE_PATH = "logs/app.log"  # File path for the application log file
+# Local caches
+EMBEDDING_CACHE_DIR = "cache/embeddings"  # Memory-mapped embedding cache directory
+CATALOG_DB_PATH = "cache/catalog.sqlite3"  # Metadata of indexed documents
+LOCAL_INDEX_DIR = "cache/local_index"  # Storage of the "local" retrieval backend
+INDEX_GENERATION_PATH = "cache/index_generation"  # Touched on every index write
+INGEST_QUEUE_DB_PATH = "cache/jobs.sqlite3"  # Background ingestion job queue
+EMBEDDING_ONNX_DIR = "cache/onnx"  # Embedding models exported for the "onnx" backend
 # OpenSearch settings
 OPENSEARCH_HOST = "localhost"  # Hostname for the OpenSearch instance
 OPENSEARCH_PORT = 9200  # Port number for OpenSearch
 OPENSEARCH_INDEX = "documents"  # Index name for storing documents in OpenSearch
+OPENSEARCH_POOL_MAXSIZE = 10  # Connections kept open to OpenSearch per process
+OPENSEARCH_KEEP_ALIVE = True  # Reuse HTTP connections between requests
+OPENSEARCH_HTTP_COMPRESS = False  # Gzip request bodies; costs CPU on a local cluster
+OPENSEARCH_HEALTH_CHECK_TTL = 60  # Seconds cached health checks stay valid
+# Retrieval settings
+LOCAL_INDEX_IVF_MIN_ROWS = 50000  # Local k-NN switches from exact to IVF search here
+LOCAL_INDEX_IVF_NPROBE = 8  # IVF lists probed per local k-NN query
+HYBRID_SEARCH_WEIGHTS = [0.3, 0.7]  # BM25 and k-NN weights used by nlp-search-pipeline
+RERANK_BATCH_SIZE = 16  # Query-passage pairs scored per cross-encoder forward pass
+RERANK_MAX_LENGTH = 512  # Tokens of each query-passage pair seen by the cross-encoder
+RERANK_MAX_CANDIDATES = 50  # Upper bound on the candidates retrieved for reranking
+# Prompt settings
+PROMPT_CHARS_PER_TOKEN = 4  # Characters per LLM token when estimating prompt sizes
+PROMPT_HISTORY_TRIM_STEP = 6  # History is trimmed this many messages at a time
+# Embedding server settings
+EMBEDDING_SERVICE_TIMEOUT = 60  # Seconds a request to the embedding server may take
+EMBEDDING_SERVER_START_TIMEOUT = 120  # Seconds to wait for a started server to load
+# Startup settings
+STARTUP_IMPORT_BUDGET = 2.0  # Seconds a page may take to import (python -m src.startup)
+# Ingestion worker settings
+INGEST_WORKER_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before polling again
+INGEST_JOB_MAX_ATTEMPTS = 3  # Jobs whose worker died this many times are marked failed
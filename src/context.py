@@ -0,0 +1,423 @@
+import logging
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Mapping, Optional, Tuple
+
+from src.constants import (
+    LLM_CONTEXT_TOKENS,
+    LLM_PROMPT_LAYOUT,
+    LLM_RESPONSE_TOKENS,
+    MAX_HISTORY_MESSAGES,
+    PROMPT_CHARS_PER_TOKEN,
+    PROMPT_HISTORY_SHARE,
+    PROMPT_HISTORY_TRIM_STEP,
+)
+from src.metrics import record_prompt_usage, traced
+from src.utils import setup_logging
+
+if TYPE_CHECKING:
+    from ollama import Message
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a knowledgeable chatbot assistant. "
+CONTEXT_INSTRUCTION = "Use the following context to answer the question.\nContext:\n"
+NO_CONTEXT_INSTRUCTION = "Answer questions to the best of your knowledge.\n"
+PASSAGE_PREFIX = "passage: "
+# System message of the "messages" layout; must not change between turns
+SYSTEM_MESSAGE = (
+    "You are a knowledgeable chatbot assistant. When a question comes with context, "
+    "use the context to answer it; otherwise answer to the best of your knowledge."
+)
+QUESTION_PREFIX = "Question: "
+# Tokens the chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Chunks without offsets (indexed before they were stored) are merged when one ends
+# with at least this many of the words the other starts with
+MIN_OVERLAP_WORDS = 20
+# Words of each older user message kept when old turns are summarised
+SUMMARY_WORDS = 20
+
+SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of LLM tokens of a text from its length.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return -(-len(text) // PROMPT_CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """
+    Shortens text to about the given number of tokens, at a sentence end if possible.
+
+    Args:
+        text (str): The text to shorten.
+        tokens (int): The token budget.
+
+    Returns:
+        str: The text, or its longest prefix within the budget.
+    """
+    limit = max(tokens, 0) * PROMPT_CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    ends = [match.end() for match in SENTENCE_END.finditer(text, 0, limit)]
+    return text[: ends[-1]] if ends else text[:limit]
+
+
+def _stitch(first: str, second: str) -> Optional[str]:
+    """Joins two texts if the end of the first overlaps the start of the second."""
+    if second in first:
+        return first
+    first_words = first.split()
+    second_words = second.split()
+    longest = min(len(first_words), len(second_words))
+    for overlap in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if first_words[-overlap:] == second_words[:overlap]:
+            return " ".join(first_words + second_words[overlap:])
+    return None
+
+
+def merge_search_results(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merges overlapping and adjacent chunks of the same document into passages.
+
+    Chunks are placed by their character offsets, so a passage holds each part of the
+    document once. Chunks indexed without offsets are only merged when their texts
+    overlap by MIN_OVERLAP_WORDS words or one contains the other.
+
+    Args:
+        search_results (List[Dict[str, Any]]): Search hits, best first.
+
+    Returns:
+        List[Dict[str, Any]]: Passages with 'document_name', 'text', 'rank' (best rank of
+            their chunks) and 'chunks' (number of merged chunks), best first.
+    """
+    by_document: Dict[str, List[Dict[str, Any]]] = {}
+    for rank, hit in enumerate(search_results):
+        source = hit["_source"]
+        text = str(source["text"])
+        if text.startswith(PASSAGE_PREFIX):
+            text = text[len(PASSAGE_PREFIX) :]
+        by_document.setdefault(str(source.get("document_name", "")), []).append(
+            {
+                "text": text,
+                "rank": rank,
+                "start": source.get("char_start"),
+                "end": source.get("char_end"),
+            }
+        )
+
+    passages: List[Dict[str, Any]] = []
+    for document_name, chunks in by_document.items():
+        placed = sorted(
+            (chunk for chunk in chunks if chunk["start"] is not None),
+            key=lambda chunk: chunk["start"],
+        )
+        merged: List[Dict[str, Any]] = []
+        for chunk in placed:
+            current = merged[-1] if merged else None
+            # Consecutive chunks are separated by at most one whitespace character
+            if current is None or chunk["start"] > current["end"] + 1:
+                merged.append({**chunk, "chunks": 1})
+                continue
+            if chunk["end"] > current["end"]:
+                separator = " " if chunk["start"] > current["end"] else ""
+                tail = chunk["text"][max(current["end"] - chunk["start"], 0) :]
+                current["text"] += separator + tail
+                current["end"] = chunk["end"]
+            current["rank"] = min(current["rank"], chunk["rank"])
+            current["chunks"] += 1
+
+        for chunk in chunks:
+            if chunk["start"] is not None:
+                continue
+            for current in merged:
+                stitched = _stitch(current["text"], chunk["text"]) or _stitch(
+                    chunk["text"], current["text"]
+                )
+                if stitched is not None:
+                    current["text"] = stitched
+                    current["rank"] = min(current["rank"], chunk["rank"])
+                    current["chunks"] += 1
+                    break
+            else:
+                merged.append({**chunk, "chunks": 1})
+
+        passages.extend(
+            {
+                "document_name": document_name,
+                "text": passage["text"],
+                "rank": passage["rank"],
+                "chunks": passage["chunks"],
+            }
+            for passage in merged
+        )
+    return sorted(passages, key=lambda passage: passage["rank"])
+
+
+def pack_passages(passages: List[Dict[str, Any]], budget: int) -> Tuple[List[str], int]:
+    """
+    Formats the best passages that fit a token budget.
+
+    A passage that does not fit is skipped in favour of smaller, lower ranked ones,
+    except the best passage, which is shortened to fit.
+
+    Args:
+        passages (List[Dict[str, Any]]): Passages from merge_search_results, best first.
+        budget (int): Token budget of the context.
+
+    Returns:
+        Tuple[List[str], int]: The formatted passages and their token count.
+    """
+    parts: List[str] = []
+    used = 0
+    for passage in passages:
+        text = passage["text"]
+        header = f"Document {len(parts)}:\n"
+        tokens = estimate_tokens(header + text + "\n\n")
+        if used + tokens > budget:
+            if parts:
+                continue
+            text = truncate_to_tokens(text, budget - estimate_tokens(header) - 1)
+            if not text:
+                break
+            tokens = estimate_tokens(header + text + "\n\n")
+        parts.append(f"{header}{text}\n\n")
+        used += tokens
+    return parts, used
+
+
+def estimate_message_tokens(message: Mapping[str, Any]) -> int:
+    """
+    Estimates the tokens of a chat message, including its role markers.
+
+    Args:
+        message (Mapping[str, Any]): Message with 'role' and 'content'.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def _history_message(message: Dict[str, str]) -> "Message":
+    """Copies a history message, whose role is 'user' or 'assistant', for the LLM."""
+    role: Literal["user", "assistant"] = (
+        "assistant" if message["role"] == "assistant" else "user"
+    )
+    return {"role": role, "content": message["content"]}
+
+
+def pack_history(
+    history: List[Dict[str, str]], budget: int
+) -> Tuple[List[Dict[str, str]], str, Dict[str, int]]:
+    """
+    Keeps the most recent messages that fit a token budget and summarises older ones.
+
+    History is cut at a multiple of PROMPT_HISTORY_TRIM_STEP messages, so the kept
+    messages start at the same place for several turns and the model server can reuse
+    the cached prefix. Older turns are summarised by the beginning of each user
+    message, as long as the summary still fits; otherwise they are dropped.
+
+    Args:
+        history (List[Dict[str, str]]): Conversation history, oldest first.
+        budget (int): Token budget of the history.
+
+    Returns:
+        Tuple[List[Dict[str, str]], str, Dict[str, int]]: The kept messages, the summary
+            of older turns (or ""), and the counts of 'history' tokens and of 'kept',
+            'summarised' and 'dropped' messages.
+    """
+    tokens = [estimate_message_tokens(message) for message in history]
+    starts = list(range(0, len(history), PROMPT_HISTORY_TRIM_STEP)) + [len(history)]
+    for start in starts:
+        used = sum(tokens[start:])
+        if len(history) - start <= MAX_HISTORY_MESSAGES and used <= budget:
+            break
+    kept = history[start:]
+
+    questions = [
+        " ".join(message["content"].split()[:SUMMARY_WORDS])
+        for message in history[:start]
+        if message["role"] == "user"
+    ]
+    summary = ""
+    if questions:
+        summary = f"Earlier, the user asked: {'; '.join(questions)}\n"
+        if used + estimate_tokens(summary) <= budget:
+            used += estimate_tokens(summary)
+        else:
+            summary = ""
+
+    counts = {
+        "history": used,
+        "kept": len(kept),
+        "summarised": start if summary else 0,
+        "dropped": 0 if summary else start,
+    }
+    return kept, summary, counts
+
+
+def _pack(
+    query: str,
+    search_results: List[Dict[str, Any]],
+    history: List[Dict[str, str]],
+    fixed_tokens: int,
+) -> Tuple[List[str], List[Dict[str, str]], str, Dict[str, int]]:
+    """Shares the budget left after the fixed parts between context and history."""
+    # The chat page appends the query to the history before asking for an answer
+    if history and history[-1] == {"role": "user", "content": query}:
+        history = history[:-1]
+    budget = LLM_CONTEXT_TOKENS - LLM_RESPONSE_TOKENS
+    available = max(budget - fixed_tokens, 0)
+
+    history_tokens = sum(
+        estimate_message_tokens(message) for message in history[-MAX_HISTORY_MESSAGES:]
+    )
+    history_reserve = min(history_tokens, int(available * PROMPT_HISTORY_SHARE))
+    passages = merge_search_results(search_results)
+    context_parts, context_tokens = pack_passages(passages, available - history_reserve)
+    kept, summary, history_counts = pack_history(history, available - context_tokens)
+    usage = {
+        "budget": budget,
+        "context": context_tokens,
+        "chunks": len(search_results),
+        "passages": len(context_parts),
+        **history_counts,
+    }
+    return context_parts, kept, summary, usage
+
+
+def _report(usage: Dict[str, int]) -> None:
+    record_prompt_usage(usage)
+    logger.info(f"Prompt constructed within the token budget: {usage}")
+
+
+@traced("build_prompt")
+def build_prompt(
+    query: str,
+    search_results: List[Dict[str, Any]],
+    history: List[Dict[str, str]],
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Builds a single prompt with context, conversation history, and user query within
+    the LLM context window.
+
+    The window, minus LLM_RESPONSE_TOKENS kept for the answer, is shared by the fixed
+    instructions and query, the retrieved context and the history. History may take up
+    to PROMPT_HISTORY_SHARE of what remains after the fixed parts; context fills the
+    rest, and room it leaves unused goes to history. Overlapping and adjacent chunks
+    are merged first so no text is sent twice.
+
+    Args:
+        query (str): The user's query.
+        search_results (List[Dict[str, Any]]): Search hits, best first.
+        history (List[Dict[str, str]]): Conversation history, oldest first.
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The prompt, and its estimated token usage per part.
+    """
+    instructions = SYSTEM_PROMPT + (
+        CONTEXT_INSTRUCTION if search_results else NO_CONTEXT_INSTRUCTION
+    )
+    question = f"User: {query}\nAssistant:"
+    context_parts, kept, summary, usage = _pack(
+        query, search_results, history, estimate_tokens(instructions + question)
+    )
+
+    parts = [SYSTEM_PROMPT]
+    if context_parts:
+        parts.append(CONTEXT_INSTRUCTION)
+        parts.extend(context_parts)
+        parts.append("\n")
+    else:
+        parts.append(NO_CONTEXT_INSTRUCTION)
+    if kept or summary:
+        parts.append("Conversation History:\n")
+        parts.append(summary)
+        for message in kept:
+            role = "User" if message["role"] == "user" else "Assistant"
+            parts.append(f"{role}: {message['content']}\n")
+        parts.append("\n")
+    parts.append(question)
+    prompt = "".join(parts)
+
+    usage["total"] = estimate_tokens(prompt)
+    _report(usage)
+    return prompt, usage
+
+
+@traced("build_prompt")
+def build_messages(
+    query: str,
+    search_results: List[Dict[str, Any]],
+    history: List[Dict[str, str]],
+) -> Tuple[List["Message"], Dict[str, int]]:
+    """
+    Builds chat messages laid out so that consecutive turns share a long prefix.
+
+    The system message does not depend on the turn, the history is sent as the
+    original messages, and the retrieved context goes into the last user message
+    together with the query. The model server can then reuse the cached prompt up to
+    the previous turn and only prefill the new context and query. The token budget is
+    shared as in build_prompt.
+
+    Args:
+        query (str): The user's query.
+        search_results (List[Dict[str, Any]]): Search hits, best first.
+        history (List[Dict[str, str]]): Conversation history, oldest first.
+
+    Returns:
+        Tuple[List[Message], Dict[str, int]]: The messages, and their estimated
+            token usage per part.
+    """
+    fixed = estimate_tokens(SYSTEM_MESSAGE + QUESTION_PREFIX + query)
+    context_parts, kept, summary, usage = _pack(
+        query, search_results, history, fixed + 2 * MESSAGE_OVERHEAD_TOKENS
+    )
+
+    system = SYSTEM_MESSAGE + (f"\n{summary}" if summary else "")
+    messages: List["Message"] = [{"role": "system", "content": system}]
+    messages.extend(_history_message(message) for message in kept)
+    if context_parts:
+        content = "".join(["Context:\n", *context_parts, QUESTION_PREFIX, query])
+    else:
+        content = query
+    messages.append({"role": "user", "content": content})
+
+    usage["total"] = sum(estimate_message_tokens(message) for message in messages)
+    _report(usage)
+    return messages, usage
+
+
+def build_llm_messages(
+    query: str,
+    search_results: List[Dict[str, Any]],
+    history: List[Dict[str, str]],
+) -> Tuple[List["Message"], Dict[str, int]]:
+    """
+    Builds the messages sent to the LLM in the layout set by LLM_PROMPT_LAYOUT.
+
+    Args:
+        query (str): The user's query.
+        search_results (List[Dict[str, Any]]): Search hits, best first.
+        history (List[Dict[str, str]]): Conversation history, oldest first.
+
+    Returns:
+        Tuple[List[Message], Dict[str, int]]: The messages, and their estimated
+            token usage per part.
+    """
+    if LLM_PROMPT_LAYOUT == "single":
+        prompt, usage = build_prompt(query, search_results, history)
+        return [{"role": "user", "content": prompt}], usage
+    return build_messages(query, search_results, history)
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.constants import EMBEDDING_BACKEND, EMBEDDING_MODEL_PATH
+from src.utils import setup_logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Keys per SQLite query, below SQLite's limit on bound parameters
+SQLITE_MAX_PARAMETERS = 900
+
+
+def make_cache_key(text: str, prefix: str = "") -> str:
+    """
+    Builds the content-addressed key of an embedding.
+
+    Args:
+        text (str): The text that is embedded.
+        prefix (str): The prefix prepended to the text before encoding (eg. "passage: ").
+
+    Returns:
+        str: Hex digest identifying the (model, backend, prefix, text) combination.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    # Quantized embeddings differ slightly, so other backends get their own keys
+    model = EMBEDDING_MODEL_PATH
+    if EMBEDDING_BACKEND != "torch":
+        model = f"{EMBEDDING_MODEL_PATH}@{EMBEDDING_BACKEND}"
+    key_material = f"{model}\0{prefix}\0{text_hash}"
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache backed by a memory-mapped float32 matrix.
+
+    Each key owns one row ("slot") of the matrix. The key-to-slot map and the last use
+    of every key live in a SQLite index next to the vector file, so a lookup or store
+    only reads and writes the rows of its own keys. When every slot is taken the least
+    recently used keys give up their slots. Writers take an exclusive file lock and
+    readers a shared one, so a slot cannot be reassigned while it is being read and
+    several processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir: str, dimension: int, max_entries: int) -> None:
+        self.cache_dir = cache_dir
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.index_path = os.path.join(cache_dir, "index.sqlite3")
+        self.lock_path = os.path.join(cache_dir, "cache.lock")
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.index_path, timeout=30, check_same_thread=False
+        )
+        with self._file_lock():
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    used_at INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at);
+                """)
+            if not self._is_valid() or not os.path.exists(self.vectors_path):
+                with self._connection:
+                    self._connection.execute("DELETE FROM entries")
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                        [("dimension", dimension), ("max_entries", max_entries)],
+                    )
+                self._vectors = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float32,
+                    mode="w+",
+                    shape=(max_entries, dimension),
+                )
+                logger.info(f"Created embedding cache at {cache_dir}.")
+            else:
+                self._vectors = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float32,
+                    mode="r+",
+                    shape=(max_entries, dimension),
+                )
+                logger.info(
+                    f"Opened embedding cache at {cache_dir} with {len(self)} entries."
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return int(row[0])
+
+    def _file_lock(self, shared: bool = False) -> Any:
+        """Returns a context manager holding the cross-process lock."""
+        return _FileLock(self.lock_path, shared)
+
+    def _is_valid(self) -> bool:
+        """Tells whether the index was written for the current vector shape."""
+        meta = dict(self._connection.execute("SELECT name, value FROM meta"))
+        if not meta:
+            return False
+        if (
+            meta.get("dimension") != self.dimension
+            or meta.get("max_entries") != self.max_entries
+        ):
+            logger.info("Embedding cache shape changed; rebuilding the cache.")
+            return False
+        return True
+
+    def _slots_of(self, keys: List[str]) -> Dict[str, int]:
+        """Returns the slots of the keys that are cached."""
+        slots: Dict[str, int] = {}
+        for start in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+            batch = keys[start : start + SQLITE_MAX_PARAMETERS]
+            placeholders = ", ".join("?" for _ in batch)
+            slots.update(
+                self._connection.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})",
+                    batch,
+                )
+            )
+        return slots
+
+    def lookup(self, keys: List[str]) -> Tuple[List[int], np.ndarray[Any, Any]]:
+        """
+        Looks up cached embeddings.
+
+        Args:
+            keys (List[str]): Cache keys built with make_cache_key.
+
+        Returns:
+            Tuple[List[int], np.ndarray]: Positions in `keys` that were found, and their
+            embeddings as a float32 matrix in the same order.
+        """
+        with self._lock, self._file_lock(shared=True):
+            cached = self._slots_of(keys)
+            positions = [i for i, key in enumerate(keys) if key in cached]
+            slots = [cached[keys[i]] for i in positions]
+            vectors = np.array(self._vectors[slots], dtype=np.float32)
+            if cached:
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE entries SET used_at = ? WHERE key = ?",
+                        [(time.time_ns(), key) for key in cached],
+                    )
+        return positions, vectors
+
+    def store(self, keys: List[str], vectors: np.ndarray[Any, Any]) -> None:
+        """
+        Stores embeddings, evicting the least recently used entries when full.
+
+        Args:
+            keys (List[str]): Cache keys built with make_cache_key.
+            vectors (np.ndarray): One embedding row per key.
+        """
+        rows = dict(list(zip(keys, vectors))[-self.max_entries :])
+        if not rows:
+            return
+        with self._lock, self._file_lock():
+            slots = self._slots_of(list(rows))
+            new_keys = [key for key in rows if key not in slots]
+            if new_keys:
+                count = self._connection.execute(
+                    "SELECT COUNT(*) FROM entries"
+                ).fetchone()[0]
+                # Slots are handed out in order and only reused after an eviction
+                free = list(range(count, min(count + len(new_keys), self.max_entries)))
+                # Keys being stored again keep their slots
+                evicted = [
+                    (key, slot)
+                    for key, slot in self._connection.execute(
+                        "SELECT key, slot FROM entries ORDER BY used_at LIMIT ?",
+                        (len(new_keys) - len(free) + len(slots),),
+                    )
+                    if key not in slots
+                ][: len(new_keys) - len(free)]
+                free.extend(slot for _, slot in evicted)
+                slots.update(zip(new_keys, free))
+            now = time.time_ns()
+            with self._connection:
+                if new_keys:
+                    self._connection.executemany(
+                        "DELETE FROM entries WHERE key = ?",
+                        [(key,) for key, _ in evicted],
+                    )
+                for key, vector in rows.items():
+                    self._vectors[slots[key]] = vector
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, used_at) "
+                    "VALUES (?, ?, ?)",
+                    [(key, slots[key], now) for key in rows],
+                )
+
+
+class _FileLock:
+    """Advisory lock on a file, held for the duration of a with-block."""
+
+    def __init__(self, path: str, shared: bool = False) -> None:
+        self.path = path
+        self.shared = shared
+        self._file: Optional[Any] = None
+
+    def __enter__(self) -> "_FileLock":
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            fcntl.flock(self._file.fileno(), mode)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,248 @@
+import http.client
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from src.constants import EMBEDDING_SERVER_START_TIMEOUT, EMBEDDING_SERVICE_TIMEOUT
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class EmbeddingServiceClient:
+    """
+    Embeds texts with a shared embedding server (python -m src.embedding_server).
+
+    Provides the parts of the SentenceTransformer interface the app uses: `encode`,
+    `get_sentence_embedding_dimension` and `max_seq_length`, plus `count_tokens` in
+    place of a tokenizer. Each thread keeps its own keep-alive connection.
+
+    If the server stops answering, a local server is started again; if that fails,
+    texts are embedded with the model returned by `fallback` from then on.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = EMBEDDING_SERVICE_TIMEOUT,
+        fallback: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Unsupported embedding service URL: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.fallback = fallback
+        self._fallback_model: Any = None
+        self._recover_lock = threading.Lock()
+        self._local = threading.local()
+        self.info: Dict[str, Any] = json.loads(self._request("GET", "/info")[1])
+        self.max_seq_length = self.info["max_seq_length"]
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+            self._local.connection = connection
+        return connection
+
+    def _request(
+        self, method: str, path: str, payload: Optional[Dict[str, Any]] = None
+    ) -> Tuple[http.client.HTTPResponse, bytes]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server may have closed an idle keep-alive connection; retry once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(
+                f"Embedding server error {response.status}: "
+                f"{data.decode('utf-8', 'replace')}"
+            )
+        return response, data
+
+    def _post(self, path: str, texts: List[str]) -> Optional[bytes]:
+        """
+        Posts texts to the server, restarting it once if it stopped answering.
+
+        Returns:
+            Optional[bytes]: The response body, or None once the fallback model is used.
+        """
+        if self._fallback_model is not None:
+            return None
+        try:
+            return self._request("POST", path, {"texts": texts})[1]
+        except (OSError, http.client.HTTPException) as e:
+            error: Exception = e
+        with self._recover_lock:
+            if self._fallback_model is not None:
+                return None
+            try:
+                # Another thread may have restarted the server meanwhile
+                return self._request("POST", path, {"texts": texts})[1]
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            logger.warning(f"Embedding server at {self.url} stopped: {error}")
+            if start_embedding_server(self.url):
+                return self._request("POST", path, {"texts": texts})[1]
+            if self.fallback is None:
+                raise error
+            logger.warning("Embedding server unavailable, loading the model locally.")
+            self._fallback_model = self.fallback()
+            return None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.info["dimension"])
+
+    def encode(
+        self, sentences: List[str], batch_size: int = 32, **kwargs: Any
+    ) -> np.ndarray[Any, np.dtype[np.float32]]:
+        """
+        Embeds texts on the server, where they may be batched with other requests.
+
+        Args:
+            sentences (List[str]): The texts to embed.
+            batch_size (int): Accepted for compatibility with SentenceTransformer.encode.
+            **kwargs (Any): Accepted for compatibility with SentenceTransformer.encode.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per text.
+        """
+        if not sentences:
+            return np.empty(
+                (0, self.get_sentence_embedding_dimension()), dtype=np.float32
+            )
+        data = self._post("/embed", list(sentences))
+        if data is None:
+            return np.asarray(
+                self._fallback_model.encode(sentences, batch_size=batch_size, **kwargs),
+                dtype=np.float32,
+            )
+        return np.frombuffer(data, dtype=np.float32).reshape(len(sentences), -1).copy()
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Counts the server tokenizer's tokens of each text, without special tokens.
+
+        Args:
+            texts (List[str]): The texts to measure.
+
+        Returns:
+            List[int]: The token count of each text.
+
+        Raises:
+            RuntimeError: If the server's response is not one count per text.
+        """
+        data = self._post("/tokens", list(texts))
+        if data is None:
+            # Imported here as src.embeddings imports this module
+            from src.embeddings import count_model_tokens
+
+            return count_model_tokens(self._fallback_model, texts)
+        counts = json.loads(data).get("counts")
+        if not isinstance(counts, list) or len(counts) != len(texts):
+            raise RuntimeError(
+                f"Embedding server returned invalid token counts: {counts}"
+            )
+        return [int(count) for count in counts]
+
+
+def start_embedding_server(
+    url: str, start_timeout: float = EMBEDDING_SERVER_START_TIMEOUT
+) -> bool:
+    """
+    Starts the embedding server in the background if it runs on this machine.
+
+    Args:
+        url (str): Address of the server, eg. "http://127.0.0.1:9465".
+        start_timeout (float): Seconds to wait for the server to load its model.
+
+    Returns:
+        bool: True if the server answers requests.
+    """
+    parts = urlsplit(url)
+    if parts.hostname not in LOCAL_HOSTS or parts.port is None:
+        return False
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.embedding_server", "--port", str(parts.port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,  # Keeps running when the Streamlit server stops
+    )
+    logger.info(f"Started the embedding server on port {parts.port}.")
+
+    deadline = time.monotonic() + start_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.5)
+        if process.poll() not in (None, 0):
+            break  # The server failed to load; a duplicate exits with status 0
+        # /info answers once the model is loaded
+        connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=max(1.0, deadline - time.monotonic())
+        )
+        try:
+            connection.request("GET", "/info")
+            if connection.getresponse().status == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+    logger.error(f"Embedding server at {url} did not start.")
+    return False
+
+
+def connect_embedding_service(
+    url: str,
+    start_timeout: float = EMBEDDING_SERVER_START_TIMEOUT,
+    fallback: Optional[Callable[[], Any]] = None,
+) -> Optional[EmbeddingServiceClient]:
+    """
+    Connects to the embedding server, starting it in the background if it runs locally.
+
+    Args:
+        url (str): Address of the server, eg. "http://127.0.0.1:9465".
+        start_timeout (float): Seconds to wait for a started server to load its model.
+        fallback (Optional[Callable[[], Any]]): Loads a local model the client uses if
+            the server stops and cannot be started again.
+
+    Returns:
+        Optional[EmbeddingServiceClient]: The client, or None if the server is unavailable.
+    """
+    try:
+        return EmbeddingServiceClient(url, fallback=fallback)
+    except OSError as e:
+        error: Exception = e
+
+    if start_embedding_server(url, start_timeout):
+        try:
+            return EmbeddingServiceClient(url, fallback=fallback)
+        except OSError as e:
+            error = e
+    logger.error(f"Embedding server at {url} is unavailable: {error}")
+    return None
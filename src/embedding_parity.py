@@ -0,0 +1,154 @@
+"""
+Compares an embedding backend with the embeddings stored in the index.
+
+Usage:
+    python -m src.embedding_parity
+    python -m src.embedding_parity --backend onnx --sample 500 --min-cosine 0.99
+
+Chunks are sampled from the index and embedded again with the chosen backend (by
+default EMBEDDING_BACKEND). The report shows the cosine similarity between the new and
+the stored vectors, how often a chunk's new vector is still closest to its own stored
+vector among the sample, and the encoding throughput. The command exits with status 1
+when the mean cosine similarity is below --min-cosine.
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.constants import EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE
+from src.embeddings import load_local_embedding_model
+from src.retrieval import get_retrieval_backend
+
+PASSAGE_PREFIX = "passage: "
+
+
+def _normalize(vectors: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    return np.asarray(
+        vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    )
+
+
+def compare_embeddings(
+    stored: np.ndarray[Any, Any], embedded: np.ndarray[Any, Any]
+) -> Dict[str, float]:
+    """
+    Measures how far re-computed embeddings drifted from the stored ones.
+
+    Args:
+        stored (np.ndarray): Stored vectors, one row per chunk.
+        embedded (np.ndarray): Re-computed vectors of the same chunks, in the same order.
+
+    Returns:
+        Dict[str, float]: Mean, minimum and percentiles of the cosine similarity, and
+            'self_recall@1', the share of chunks whose new vector is closest to their
+            own stored vector.
+    """
+    stored = _normalize(stored.astype(np.float32))
+    embedded = _normalize(embedded.astype(np.float32))
+    cosines = (stored * embedded).sum(axis=1)
+    nearest = (embedded @ stored.T).argmax(axis=1)
+    return {
+        "mean": float(cosines.mean()),
+        "min": float(cosines.min()),
+        "p1": float(np.percentile(cosines, 1)),
+        "p5": float(np.percentile(cosines, 5)),
+        "p50": float(np.percentile(cosines, 50)),
+        "self_recall@1": float((nearest == np.arange(len(stored))).mean()),
+    }
+
+
+def embed_texts(model: Any, texts: List[str], batch_size: int) -> np.ndarray[Any, Any]:
+    """
+    Embeds texts directly with a model, bypassing the embedding cache.
+
+    Args:
+        model (Any): Model from load_local_embedding_model.
+        texts (List[str]): The texts to embed.
+        batch_size (int): Number of texts per forward pass.
+
+    Returns:
+        np.ndarray: One float32 row per text.
+    """
+    return np.asarray(
+        model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ),
+        dtype=np.float32,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--backend",
+        choices=["torch", "onnx"],
+        default=EMBEDDING_BACKEND,
+        help="Embedding backend to check (default: EMBEDDING_BACKEND).",
+    )
+    parser.add_argument(
+        "--sample", type=int, default=200, help="Number of chunks to compare."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the random chunk sample."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMBEDDING_BATCH_SIZE,
+        help="Number of chunks embedded together.",
+    )
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.99,
+        help="Lowest acceptable mean cosine similarity.",
+    )
+    args = parser.parse_args()
+
+    chunks = get_retrieval_backend().sample_chunks(args.sample, args.seed)
+    if not chunks:
+        print(
+            "No chunks with stored embeddings found in the index. Indices created "
+            "with INDEX_EMBEDDINGS_IN_SOURCE = False do not return their vectors."
+        )
+        sys.exit(1)
+    # Chunks are embedded without the "passage: " prefix stored with their text
+    texts = [
+        (
+            chunk["text"][len(PASSAGE_PREFIX) :]
+            if chunk["text"].startswith(PASSAGE_PREFIX)
+            else chunk["text"]
+        )
+        for chunk in chunks
+    ]
+    stored = np.array([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+
+    model = load_local_embedding_model(args.backend)
+    embed_texts(model, texts[:1], 1)  # Warm-up, not timed
+    start = time.perf_counter()
+    embedded = embed_texts(model, texts, args.batch_size)
+    seconds = time.perf_counter() - start
+    if embedded.shape != stored.shape:
+        print(f"Dimension mismatch: stored {stored.shape}, embedded {embedded.shape}.")
+        sys.exit(1)
+
+    drift = compare_embeddings(stored, embedded)
+    print(f"Backend: {args.backend}, {len(chunks)} chunks")
+    print(
+        f"Cosine similarity: mean {drift['mean']:.5f}, min {drift['min']:.5f}, "
+        f"p1 {drift['p1']:.5f}, p5 {drift['p5']:.5f}, p50 {drift['p50']:.5f}"
+    )
+    print(f"Self recall@1: {drift['self_recall@1']:.3f}")
+    print(f"Throughput: {len(texts) / seconds:.1f} chunks/s ({seconds:.2f}s)")
+    sys.exit(0 if drift["mean"] >= args.min_cosine else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Serves the embedding model to every app process from one shared server.
+
+Usage:
+    python -m src.embedding_server
+    python -m src.embedding_server --port 9465 --max-batch 64 --max-wait-ms 5 \
+        --max-age-ms 200
+
+The server listens on localhost and holds a single copy of the embedding model. Texts
+from concurrent requests, eg. chat queries of several sessions and ingestion batches,
+are encoded together in micro-batches of up to --max-batch texts; a batch waits at
+most --max-wait-ms for more requests once the first one arrives, and a request that
+has waited --max-age-ms is encoded next, however large it is. Set
+EMBEDDING_SERVICE_URL to use it; the app starts it itself if it is not running.
+
+Endpoints:
+    GET /info       Model name, backend, dimension and max_seq_length (JSON).
+    POST /embed     {"texts": [...]} -> float32 rows, little-endian, row-major.
+    POST /tokens    {"texts": [...]} -> {"counts": [...]} without special tokens.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from src.constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_SERVER_MAX_AGE_MS,
+    EMBEDDING_SERVER_MAX_BATCH,
+    EMBEDDING_SERVER_MAX_WAIT_MS,
+    EMBEDDING_SERVICE_URL,
+)
+from src.embeddings import count_model_tokens, load_local_embedding_model
+from src.metrics import record_span, register_gauges, start_metrics_server
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9465
+
+
+class _EmbedRequest:
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray[Any, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Encodes the texts of concurrent requests together in one background thread.
+
+    A batch is started once the oldest waiting request has waited `max_wait` seconds
+    or `max_batch` texts are waiting. Smaller requests are taken first, so single chat
+    queries are not held up behind ingestion batches; a request larger than
+    `max_batch` is encoded on its own. Requests that have waited `max_age` seconds
+    are taken before all others, oldest first, so a steady stream of small requests
+    cannot starve a large one.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray[Any, Any]],
+        max_batch: int = EMBEDDING_SERVER_MAX_BATCH,
+        max_wait: float = EMBEDDING_SERVER_MAX_WAIT_MS / 1000,
+        max_age: float = EMBEDDING_SERVER_MAX_AGE_MS / 1000,
+    ) -> None:
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_age = max_age
+        self._pending: List[_EmbedRequest] = []
+        self._condition = threading.Condition()
+        self._stats = {"batches": 0.0, "requests": 0.0, "texts": 0.0, "queued": 0.0}
+        threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        ).start()
+
+    def submit(self, texts: List[str]) -> np.ndarray[Any, Any]:
+        """
+        Embeds texts, waiting until the batch holding them has been encoded.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per text.
+        """
+        request = _EmbedRequest(texts)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        assert request.result is not None
+        return request.result
+
+    def stats(self) -> Dict[str, float]:
+        """Returns batching counters, exported as gauges on the metrics endpoint."""
+        with self._condition:
+            return {**self._stats, "queued": float(len(self._pending))}
+
+    def _take_batch(self) -> List[_EmbedRequest]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0].enqueued + self.max_wait
+            while sum(len(r.texts) for r in self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            overdue = time.monotonic() - self.max_age
+            order = sorted(
+                self._pending,
+                key=lambda r: (
+                    (0, r.enqueued) if r.enqueued <= overdue else (1, len(r.texts))
+                ),
+            )
+            batch: List[_EmbedRequest] = []
+            size = 0
+            for request in order:
+                if batch and size + len(request.texts) > self.max_batch:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._pending = [r for r in self._pending if r not in batch]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            texts = [text for request in batch for text in request.texts]
+            waited = time.monotonic() - min(request.enqueued for request in batch)
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.encode(texts), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Embedding a batch of {len(texts)} texts failed: {e}")
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                record_span(
+                    "embedding_server_batch", time.perf_counter() - start, "error"
+                )
+                continue
+            offset = 0
+            for request in batch:
+                request.result = vectors[offset : offset + len(request.texts)]
+                offset += len(request.texts)
+                request.done.set()
+            with self._condition:
+                self._stats["batches"] += 1
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += len(texts)
+            record_span(
+                "embedding_server_batch",
+                time.perf_counter() - start,
+                requests=len(batch),
+                texts=len(texts),
+                waited_ms=round(waited * 1000, 3),
+            )
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keeps client connections open between requests
+    server: "EmbeddingServer"
+
+    def _send(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        self._send(json.dumps(payload).encode("utf-8"), "application/json", status)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path != "/info":
+            self._send_json({"error": "not found"}, 404)
+            return
+        self.server.ready.wait()
+        self._send_json(self.server.info)
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            texts = json.loads(self.rfile.read(length))["texts"]
+        except (ValueError, KeyError, TypeError):
+            self._send_json({"error": 'expected {"texts": [...]}'}, 400)
+            return
+        self.server.ready.wait()
+        assert self.server.batcher is not None  # Set by load before ready
+        try:
+            if self.path == "/embed":
+                vectors = self.server.batcher.submit([str(text) for text in texts])
+                self._send(vectors.astype("<f4").tobytes(), "application/octet-stream")
+            elif self.path == "/tokens":
+                # The batcher thread shares the model's tokenizer, which is not
+                # safe to use from two threads at once
+                with self.server.model_lock:
+                    counts = count_model_tokens(self.server.model, texts)
+                self._send_json({"counts": counts})
+            else:
+                self._send_json({"error": "not found"}, 404)
+        except Exception as e:
+            self._send_json({"error": str(e)}, 500)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Every query would otherwise add a log line
+
+
+class EmbeddingServer(ThreadingHTTPServer):
+    """
+    HTTP server holding the embedding model and its micro-batcher.
+
+    The port is bound before the model is loaded, so a second server started for the
+    same port fails fast instead of loading another copy. Requests arriving before
+    `load` finished wait for it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int) -> None:
+        super().__init__(("127.0.0.1", port), _EmbeddingHandler)
+        self.ready = threading.Event()
+        self.model: Any = None
+        self.model_lock = threading.Lock()
+        self.batcher: Optional[MicroBatcher] = None
+        self.info: Dict[str, Any] = {}
+
+    def load(self, max_batch: int, max_wait: float, max_age: float) -> None:
+        """
+        Loads the embedding model and starts batching.
+
+        Args:
+            max_batch (int): Most texts encoded together.
+            max_wait (float): Seconds a batch waits for more requests.
+            max_age (float): Seconds after which a request is encoded next.
+        """
+        self.model = load_local_embedding_model()
+
+        def encode(texts: List[str]) -> np.ndarray[Any, Any]:
+            with self.model_lock:
+                return self.model.encode(  # type: ignore[no-any-return]
+                    texts,
+                    batch_size=max_batch,
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                )
+
+        self.batcher = MicroBatcher(
+            encode,
+            max_batch,
+            max_wait,
+            max_age,
+        )
+        self.info = {
+            "model": EMBEDDING_MODEL_PATH,
+            "backend": EMBEDDING_BACKEND,
+            "dimension": self.model.get_sentence_embedding_dimension(),
+            "max_seq_length": getattr(self.model, "max_seq_length", None),
+        }
+        register_gauges("rag_embedding_server", self.batcher.stats)
+        self.ready.set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=urlsplit(EMBEDDING_SERVICE_URL or "").port or DEFAULT_PORT,
+        help="Port to listen on (default: the port of EMBEDDING_SERVICE_URL).",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=EMBEDDING_SERVER_MAX_BATCH,
+        help="Most texts encoded together.",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=EMBEDDING_SERVER_MAX_WAIT_MS,
+        help="Milliseconds a batch waits for more requests.",
+    )
+    parser.add_argument(
+        "--max-age-ms",
+        type=float,
+        default=EMBEDDING_SERVER_MAX_AGE_MS,
+        help="Milliseconds after which a waiting request is encoded next.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Also serve /metrics on this port.",
+    )
+    args = parser.parse_args()
+
+    try:
+        server = EmbeddingServer(args.port)
+    except OSError as e:
+        logger.info(f"Embedding server not started on port {args.port}: {e}")
+        return
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    def load() -> None:
+        try:
+            server.load(args.max_batch, args.max_wait_ms / 1000, args.max_age_ms / 1000)
+        except Exception as e:
+            logger.error(f"Embedding server could not load the model: {e}")
+            server.shutdown()
+
+    threading.Thread(
+        target=load,
+        name="embedding-model-loader",
+        daemon=True,
+    ).start()
+    logger.info(f"Serving embeddings on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+    if not server.ready.is_set():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,304 @@
 import logging
-from typing import Any, List
+import time
+from typing import TYPE_CHECKING, Any, List, Optional, Union
 
 import numpy as np
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 
-from src.constants import EMBEDDING_MODEL_PATH
+from src.constants import (
+    ASSYMETRIC_EMBEDDING,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_ONNX_THREADS,
+    EMBEDDING_SERVICE_URL,
+)
+from src.embedding_cache import EmbeddingCache, make_cache_key
+from src.embedding_client import EmbeddingServiceClient, connect_embedding_service
+from src.metrics import traced
 from src.utils import setup_logging
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+    from src.onnx_embeddings import OnnxSentenceEncoder
+
 # Initialize logger
 setup_logging()  # Configures logging for the application
 logger = logging.getLogger(__name__)
 
+# Threads for CPU inference set by set_inference_threads, eg. in ingestion workers
+_inference_threads: Optional[int] = None
+
+
+def set_inference_threads(threads: int) -> None:
+    """
+    Caps the threads the embedding model uses for CPU inference.
+
+    Call it before the model is loaded: the "onnx" backend reads it when creating its
+    session.
+
+    Args:
+        threads (int): Maximum number of inference threads.
+    """
+    global _inference_threads
+    _inference_threads = threads
+    if EMBEDDING_BACKEND == "torch":
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def select_device() -> str:
+    """
+    Picks the device the embedding model should run on.
+
+    Returns:
+        str: The configured device, or the best available one ("cuda", "mps" or "cpu").
+    """
+    if EMBEDDING_DEVICE:
+        return EMBEDDING_DEVICE
+
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def load_local_embedding_model(
+    backend: str = EMBEDDING_BACKEND,
+) -> Union["SentenceTransformer", "OnnxSentenceEncoder"]:
+    """
+    Loads the embedding model into the current process.
+
+    With the "onnx" backend, an int8-quantized ONNX export of the model is run with
+    ONNX Runtime on the CPU, and exported first if needed. Otherwise
+    sentence_transformers (and torch) are used; they are imported here rather than at
+    module import, so pages render without waiting for them.
+
+    Args:
+        backend (str): "torch" or "onnx". Defaults to EMBEDDING_BACKEND.
+
+    Returns:
+        Union[SentenceTransformer, OnnxSentenceEncoder]: The loaded embedding model.
+    """
+    if backend == "onnx":
+        from src.onnx_embeddings import load_onnx_encoder
+
+        logger.info(f"Loading ONNX embedding model for: {EMBEDDING_MODEL_PATH}")
+        return load_onnx_encoder(_inference_threads or EMBEDDING_ONNX_THREADS)
+
+    from sentence_transformers import SentenceTransformer
+
+    device = select_device()
+    logger.info(
+        f"Loading embedding model from path: {EMBEDDING_MODEL_PATH} on device {device}"
+    )
+    return SentenceTransformer(EMBEDDING_MODEL_PATH, device=device)
+
 
 @st.cache_resource(show_spinner=False)
-def get_embedding_model() -> SentenceTransformer:
+def get_embedding_model() -> (
+    Union["SentenceTransformer", "OnnxSentenceEncoder", EmbeddingServiceClient]
+):
     """
     Loads and caches the embedding model.
 
+    With EMBEDDING_SERVICE_URL set, texts are embedded by the shared embedding server
+    instead, which is started if it runs locally and is not up yet. The model is only
+    loaded into this process if the server is unavailable, or stops and cannot be
+    started again.
+
+    Returns:
+        Union[SentenceTransformer, OnnxSentenceEncoder, EmbeddingServiceClient]: The
+            embedding model, or a client with the same interface.
+    """
+    if EMBEDDING_SERVICE_URL:
+        client = connect_embedding_service(
+            EMBEDDING_SERVICE_URL, fallback=load_local_embedding_model
+        )
+        if client is not None:
+            logger.info(f"Using the embedding server at {EMBEDDING_SERVICE_URL}.")
+            return client
+        logger.warning("Embedding server unavailable, loading the model locally.")
+    return load_local_embedding_model()
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_cache(dimension: int) -> Optional[EmbeddingCache]:
+    """
+    Opens and caches the on-disk embedding cache.
+
+    Args:
+        dimension (int): Embedding dimension of the loaded model.
+
     Returns:
-        SentenceTransformer: The loaded embedding model.
+        Optional[EmbeddingCache]: The cache, or None if caching is disabled or unavailable.
     """
-    logger.info(f"Loading embedding model from path: {EMBEDDING_MODEL_PATH}")
-    return SentenceTransformer(EMBEDDING_MODEL_PATH)
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    try:
+        return EmbeddingCache(
+            EMBEDDING_CACHE_DIR, dimension, EMBEDDING_CACHE_MAX_ENTRIES
+        )
+    except OSError as e:
+        logger.error(f"Embedding cache unavailable, continuing without it: {e}")
+        return None
 
 
-def generate_embeddings(chunks: List[str]) -> List[np.ndarray[Any, Any]]:
+def count_model_tokens(model: Any, texts: List[str]) -> List[int]:
     """
-    Generates embeddings for a list of text chunks.
+    Counts a model tokenizer's tokens of each text, without special tokens.
+
+    Args:
+        model (Any): A loaded embedding model.
+        texts (List[str]): The texts to measure.
+
+    Returns:
+        List[int]: The token count of each text.
+    """
+    if not texts:
+        return []
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        # Rough fallback for models without a Hugging Face tokenizer
+        return [len(text.split()) * 4 // 3 + 1 for text in texts]
+    encoded = tokenizer(
+        texts,
+        add_special_tokens=False,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        verbose=False,
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """
+    Counts the embedding tokenizer's tokens of each text, without special tokens.
+
+    Args:
+        texts (List[str]): The texts to measure.
+
+    Returns:
+        List[int]: The token count of each text.
+    """
+    if not texts:
+        return []
+    model = get_embedding_model()
+    if isinstance(model, EmbeddingServiceClient):
+        return model.count_tokens(texts)
+    return count_model_tokens(model, texts)
+
+
+def get_max_chunk_tokens(limit: int) -> int:
+    """
+    Returns the number of text tokens a chunk may have without being truncated.
+
+    The model's window also holds its special tokens and, for asymmetric models, the
+    "passage: " prefix, so those are subtracted.
+
+    Args:
+        limit (int): The configured chunk size in tokens.
+
+    Returns:
+        int: The chunk size, capped by what fits the embedding model's window.
+    """
+    model = get_embedding_model()
+    window = getattr(model, "max_seq_length", None) or limit
+    reserved = 2  # Eg. [CLS] and [SEP] or <s> and </s>
+    if ASSYMETRIC_EMBEDDING:
+        reserved += count_tokens(["passage: "])[0]
+    return max(1, min(limit, window - reserved))
+
+
+@traced("generate_embeddings")
+def generate_embeddings(
+    chunks: List[str],
+    batch_size: Optional[int] = None,
+    prefix: str = "",
+    use_cache: bool = True,
+) -> np.ndarray[Any, np.dtype[np.float32]]:
+    """
+    Generates embeddings for a list of text chunks in batches.
+
+    Chunks already present in the embedding cache are not re-encoded. The remaining
+    chunks are sorted by length before batching so that each batch pads to a similar
+    length, and the results are written back in the original order.
 
     Args:
         chunks (List[str]): List of text chunks.
+        batch_size (Optional[int]): Number of chunks per forward pass. Defaults to EMBEDDING_BATCH_SIZE.
+        prefix (str): Prefix prepended to every chunk before encoding (eg. "passage: ").
+        use_cache (bool): Whether to read and fill the embedding cache. Defaults to True.
 
     Returns:
-        List[np.ndarray[Any, Any]]: List of embeddings as numpy arrays for each chunk.
+        np.ndarray: A contiguous float32 matrix with one row per chunk.
     """
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
     model = get_embedding_model()
-    embeddings = [np.array(model.encode(chunk)) for chunk in chunks]
-    logger.info(f"Generated embeddings for {len(chunks)} text chunks.")
+    dimension = model.get_sentence_embedding_dimension() or 0
+    embeddings = np.empty((len(chunks), dimension), dtype=np.float32)
+    if not chunks:
+        return embeddings
+
+    cache = get_embedding_cache(dimension) if use_cache else None
+    pending = list(range(len(chunks)))
+    keys: List[str] = []
+    if cache is not None:
+        keys = [make_cache_key(chunk, prefix) for chunk in chunks]
+        hit_positions, hit_vectors = cache.lookup(keys)
+        if hit_positions:
+            embeddings[hit_positions] = hit_vectors
+            hits = set(hit_positions)
+            pending = [i for i in pending if i not in hits]
+
+    start_time = time.perf_counter()
+    pending.sort(key=lambda i: len(chunks[i]))
+    for start in range(0, len(pending), batch_size):
+        batch_indices = pending[start : start + batch_size]
+        embeddings[batch_indices] = model.encode(
+            [f"{prefix}{chunks[i]}" for i in batch_indices],
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+    elapsed = time.perf_counter() - start_time
+
+    if cache is not None and pending:
+        cache.store([keys[i] for i in pending], embeddings[pending])
+
+    logger.info(
+        f"Generated embeddings for {len(chunks)} text chunks "
+        f"({len(chunks) - len(pending)} from cache) in {elapsed:.2f}s "
+        f"({len(pending) / max(elapsed, 1e-9):.1f} chunks/sec, batch size {batch_size})."
+    )
     return embeddings
+
+
+@traced("embed_query")
+def generate_query_embedding(
+    query: str, use_cache: bool = True
+) -> np.ndarray[Any, np.dtype[np.float32]]:
+    """
+    Generates the embedding of a search query.
+
+    Args:
+        query (str): The user's query.
+        use_cache (bool): Whether to read and fill the embedding cache. Defaults to True.
+
+    Returns:
+        np.ndarray: The query embedding as a float32 vector.
+    """
+    prefix = "passage: " if ASSYMETRIC_EMBEDDING else ""
+    embedding: np.ndarray[Any, np.dtype[np.float32]] = generate_embeddings(
+        [query], prefix=prefix, use_cache=use_cache
+    )[0]
+    return embedding
@@ -0,0 +1,199 @@
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.constants import HYBRID_KNN_DEPTH, HYBRID_TEXT_DEPTH
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Floor applied to min-max normalised scores, as in the OpenSearch normalization processor
+MIN_NORMALIZED_SCORE = 0.001
+
+# Rank constant of reciprocal rank fusion, as in the OpenSearch score-ranker processor
+RRF_RANK_CONSTANT = 60
+
+FUSION_STRATEGIES = ("min_max", "z_score", "rrf")
+
+
+def resolve_leg_depths(
+    top_k: int, text_depth: Optional[int] = None, knn_depth: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Returns how many candidates the BM25 and k-NN legs should fetch.
+
+    Deeper legs give fusion more overlap to work with (better recall) at the cost of
+    larger responses. A leg never fetches fewer than top_k candidates.
+
+    Args:
+        top_k (int): Number of fused results wanted.
+        text_depth (Optional[int]): BM25 depth; defaults to HYBRID_TEXT_DEPTH, then top_k.
+        knn_depth (Optional[int]): k-NN depth; defaults to HYBRID_KNN_DEPTH, then top_k.
+
+    Returns:
+        Tuple[int, int]: The BM25 and k-NN depths.
+    """
+    text_depth = text_depth or HYBRID_TEXT_DEPTH or top_k
+    knn_depth = knn_depth or HYBRID_KNN_DEPTH or top_k
+    return max(text_depth, top_k), max(knn_depth, top_k)
+
+
+def min_max_normalize(scores: List[float]) -> List[float]:
+    """
+    Scales scores to [0, 1] the way the OpenSearch min_max normalization technique does.
+
+    Args:
+        scores (List[float]): Raw scores of one result list.
+
+    Returns:
+        List[float]: Normalised scores in the same order.
+    """
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0 for _ in scores]
+    return [max((score - low) / (high - low), MIN_NORMALIZED_SCORE) for score in scores]
+
+
+def z_score_normalize(scores: List[float]) -> List[float]:
+    """
+    Standardises scores to zero mean and unit variance.
+
+    Args:
+        scores (List[float]): Raw scores of one result list.
+
+    Returns:
+        List[float]: Normalised scores in the same order.
+    """
+    if not scores:
+        return []
+    mean = sum(scores) / len(scores)
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+    if deviation == 0:
+        return [0.0 for _ in scores]
+    return [(score - mean) / deviation for score in scores]
+
+
+def _fuse_normalized(
+    legs: List[List[Dict[str, Any]]],
+    normalized_legs: List[List[float]],
+    weights: Sequence[float],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """Combines normalised leg scores with a weighted arithmetic mean."""
+    total_weight = sum(weights) or 1.0
+    combined: Dict[str, float] = {}
+    hits_by_id: Dict[str, Dict[str, Any]] = {}
+    for hits, normalized, weight in zip(legs, normalized_legs, weights):
+        for hit, score in zip(hits, normalized):
+            hits_by_id.setdefault(hit["_id"], hit)
+            combined[hit["_id"]] = combined.get(hit["_id"], 0.0) + weight * score
+
+    ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [
+        {**hits_by_id[doc_id], "_score": score / total_weight}
+        for doc_id, score in ranked
+    ]
+
+
+def fuse_min_max(
+    legs: List[List[Dict[str, Any]]], weights: Sequence[float], top_k: int
+) -> List[Dict[str, Any]]:
+    """
+    Combines result lists with min-max normalisation and a weighted arithmetic mean.
+
+    Mirrors the `nlp-search-pipeline` normalization processor: every leg is normalised
+    on its own, a hit missing from a leg scores 0 there, and the combined score is the
+    weighted mean over all legs.
+
+    Args:
+        legs (List[List[Dict[str, Any]]]): Hits of each query leg, eg. [bm25_hits, knn_hits].
+        weights (Sequence[float]): Weight of each leg.
+        top_k (int): Number of fused hits to return.
+
+    Returns:
+        List[Dict[str, Any]]: Hits ordered by combined score, with '_score' replaced.
+    """
+    normalized = [min_max_normalize([hit["_score"] for hit in hits]) for hits in legs]
+    return _fuse_normalized(legs, normalized, weights, top_k)
+
+
+def fuse_z_score(
+    legs: List[List[Dict[str, Any]]], weights: Sequence[float], top_k: int
+) -> List[Dict[str, Any]]:
+    """
+    Combines result lists with z-score normalisation and a weighted arithmetic mean.
+
+    Less sensitive than min-max to a single outlier, which squeezes every other hit of
+    its leg towards 0. A hit missing from a leg scores 0 (the leg mean) there.
+
+    Args:
+        legs (List[List[Dict[str, Any]]]): Hits of each query leg, eg. [bm25_hits, knn_hits].
+        weights (Sequence[float]): Weight of each leg.
+        top_k (int): Number of fused hits to return.
+
+    Returns:
+        List[Dict[str, Any]]: Hits ordered by combined score, with '_score' replaced.
+    """
+    normalized = [z_score_normalize([hit["_score"] for hit in hits]) for hits in legs]
+    return _fuse_normalized(legs, normalized, weights, top_k)
+
+
+def fuse_rrf(
+    legs: List[List[Dict[str, Any]]],
+    weights: Sequence[float],
+    top_k: int,
+    rank_constant: int = RRF_RANK_CONSTANT,
+) -> List[Dict[str, Any]]:
+    """
+    Combines result lists with weighted reciprocal rank fusion.
+
+    Only ranks are used, so the legs need no score normalisation: a hit scores
+    weight / (rank_constant + rank) in every leg it appears in, ranks starting at 1.
+
+    Args:
+        legs (List[List[Dict[str, Any]]]): Hits of each query leg, eg. [bm25_hits, knn_hits].
+        weights (Sequence[float]): Weight of each leg.
+        top_k (int): Number of fused hits to return.
+        rank_constant (int, optional): Dampens the weight of top ranks. Defaults to 60.
+
+    Returns:
+        List[Dict[str, Any]]: Hits ordered by combined score, with '_score' replaced.
+    """
+    reciprocal_ranks = [
+        [1.0 / (rank_constant + rank) for rank in range(1, len(hits) + 1)]
+        for hits in legs
+    ]
+    return _fuse_normalized(legs, reciprocal_ranks, weights, top_k)
+
+
+def fuse(
+    legs: List[List[Dict[str, Any]]],
+    strategy: str,
+    weights: Sequence[float],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """
+    Combines result lists with the given fusion strategy.
+
+    Args:
+        legs (List[List[Dict[str, Any]]]): Hits of each query leg, eg. [bm25_hits, knn_hits].
+        strategy (str): One of "min_max", "z_score" or "rrf".
+        weights (Sequence[float]): Weight of each leg.
+        top_k (int): Number of fused hits to return.
+
+    Returns:
+        List[Dict[str, Any]]: Hits ordered by combined score, with '_score' replaced.
+    """
+    if strategy == "min_max":
+        return fuse_min_max(legs, weights, top_k)
+    if strategy == "z_score":
+        return fuse_z_score(legs, weights, top_k)
+    if strategy == "rrf":
+        return fuse_rrf(legs, weights, top_k)
+    raise ValueError(
+        f"Unknown fusion strategy '{strategy}', expected one of {FUSION_STRATEGIES}."
+    )
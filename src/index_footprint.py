@@ -0,0 +1,236 @@
+"""
+Compares how embeddings are stored and sent: bytes on the wire, index size and speed.
+
+Usage:
+    python -m src.index_footprint
+    python -m src.index_footprint --documents 20000 --decimals 5 --output footprint.json
+
+The same synthetic chunks, with random unit vectors of EMBEDDING_DIMENSION, are bulk
+indexed into a scratch index per storage mode:
+
+    json      Embeddings sent as float64 JSON numbers and kept in _source (the old
+              behaviour).
+    orjson    Embeddings written straight from float32 with orjson, rounded to
+              --decimals, and kept in _source.
+    compact   As orjson, with 'embedding' excluded from _source, so vectors are only
+              stored for k-NN search.
+
+For each mode the report lists the bulk payload size, the time spent serialising it,
+the indexing throughput and the index size on disk after a force merge.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.constants import (
+    EMBEDDING_DIMENSION,
+    INGEST_BULK_THREADS,
+    INGEST_VECTOR_DECIMALS,
+    OPENSEARCH_INDEX,
+)
+from src.ingestion import (
+    build_index_action,
+    bulk_load_settings,
+    create_index,
+    delete_index,
+    stream_index_documents,
+)
+from src.opensearch import create_opensearch_client
+
+# Serializer, rounding and _source setting of each storage mode
+MODES: Dict[str, Dict[str, Any]] = {
+    "json": {"fast_json": False, "round": False, "source_embeddings": True},
+    "orjson": {"fast_json": True, "round": True, "source_embeddings": True},
+    "compact": {"fast_json": True, "round": True, "source_embeddings": False},
+}
+
+
+def make_documents(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Builds synthetic chunks with random unit embeddings.
+
+    Args:
+        count (int): Number of chunks.
+        seed (int): Seed of the random text and vectors. Defaults to 0.
+
+    Returns:
+        List[Dict[str, Any]]: Documents in the format of the ingestion pipeline.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, EMBEDDING_DIMENSION), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    documents = []
+    for i in range(count):
+        text = " ".join(rng.choice(vocabulary, size=200))
+        documents.append(
+            {
+                "doc_id": f"footprint-{i}",
+                "text": text,
+                "embedding": vectors[i],
+                "document_name": f"footprint-{i // 100}.pdf",
+                "chunk_hash": f"{i:064x}",
+                "char_start": 0,
+                "char_end": len(text),
+            }
+        )
+    return documents
+
+
+def measure_payload(
+    serializer: Any, documents: List[Dict[str, Any]], decimals: Optional[int]
+) -> Dict[str, float]:
+    """
+    Serialises the bulk request lines of documents as the bulk helpers do.
+
+    Args:
+        serializer (Any): The client's serializer.
+        documents (List[Dict[str, Any]]): Documents to index.
+        decimals (Optional[int]): Decimals embeddings are rounded to.
+
+    Returns:
+        Dict[str, float]: 'payload_bytes' and 'serialize_seconds'.
+    """
+    size = 0
+    start = time.perf_counter()
+    for doc in documents:
+        action = build_index_action(doc, decimals=decimals)
+        header = {"index": {"_index": action["_index"], "_id": action["_id"]}}
+        for line in (header, action["_source"]):
+            size += len(serializer.dumps(line).encode("utf-8")) + 1
+    return {"payload_bytes": size, "serialize_seconds": time.perf_counter() - start}
+
+
+def measure_mode(
+    mode: str,
+    documents: List[Dict[str, Any]],
+    decimals: Optional[int],
+    profile: Optional[str] = None,
+    keep: bool = False,
+) -> Dict[str, Any]:
+    """
+    Indexes documents into a scratch index with one storage mode and measures it.
+
+    Args:
+        mode (str): Name of the mode in MODES.
+        documents (List[Dict[str, Any]]): Documents to index.
+        decimals (Optional[int]): Decimals of the rounded modes.
+        profile (Optional[str]): Index profile. Defaults to INDEX_PROFILE.
+        keep (bool): Keep the scratch index afterwards. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: Payload, throughput and size measurements of the mode.
+    """
+    settings = MODES[mode]
+    decimals = decimals if settings["round"] else None
+    client = create_opensearch_client(fast_json=settings["fast_json"])
+    index_name = f"{OPENSEARCH_INDEX}-footprint-{mode}"
+    delete_index(client, index_name)
+    create_index(
+        client,
+        profile,
+        index_name=index_name,
+        source_embeddings=settings["source_embeddings"],
+    )
+
+    result: Dict[str, Any] = {"mode": mode, "decimals": decimals}
+    result.update(measure_payload(client.transport.serializer, documents, decimals))
+    try:
+        start = time.perf_counter()
+        with bulk_load_settings(client, index_name):
+            indexed, errors = stream_index_documents(
+                documents,
+                thread_count=INGEST_BULK_THREADS,
+                index_name=index_name,
+                client=client,
+                decimals=decimals,
+            )
+        seconds = time.perf_counter() - start
+        client.indices.forcemerge(index=index_name, max_num_segments=1)
+        client.indices.flush(index=index_name)
+        stats = client.indices.stats(index=index_name, metric="store")
+        result.update(
+            {
+                "indexed": indexed,
+                "errors": len(errors),
+                "index_seconds": seconds,
+                "docs_per_second": indexed / seconds,
+                "store_bytes": stats["_all"]["primaries"]["store"]["size_in_bytes"],
+            }
+        )
+    finally:
+        if not keep:
+            delete_index(client, index_name)
+    return result
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    """Prints the measurements of every mode, relative to the first one."""
+    base = results[0]
+    print(
+        f"{'mode':<8} {'payload MB':>10} {'bytes/doc':>9} {'serialize s':>11} "
+        f"{'docs/s':>8} {'store MB':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['mode']:<8} "
+            f"{result['payload_bytes'] / 1e6:10.1f} "
+            f"{result['payload_bytes'] / max(result['indexed'], 1):9.0f} "
+            f"{result['serialize_seconds']:11.2f} "
+            f"{result['docs_per_second']:8.0f} "
+            f"{result['store_bytes'] / 1e6:9.1f}"
+        )
+    for result in results[1:]:
+        print(
+            f"{result['mode']} vs {base['mode']}: "
+            f"payload {result['payload_bytes'] / base['payload_bytes']:.0%}, "
+            f"serialize time {result['serialize_seconds'] / base['serialize_seconds']:.0%}, "
+            f"throughput {result['docs_per_second'] / base['docs_per_second']:.2f}x, "
+            f"store {result['store_bytes'] / base['store_bytes']:.0%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--documents", type=int, default=5000, help="Number of chunks to index."
+    )
+    parser.add_argument(
+        "--decimals",
+        type=int,
+        default=INGEST_VECTOR_DECIMALS,
+        help="Decimals of embeddings in the orjson and compact modes "
+        "(default: INGEST_VECTOR_DECIMALS, exact float32 if unset).",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(MODES),
+        default=list(MODES),
+        help="Storage modes to compare; the first one is the baseline.",
+    )
+    parser.add_argument("--profile", help="Index profile of the scratch indices.")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the scratch indices afterwards."
+    )
+    parser.add_argument("--output", help="Write the measurements to a JSON file.")
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    results = [
+        measure_mode(mode, documents, args.decimals, args.profile, args.keep)
+        for mode in args.modes
+    ]
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
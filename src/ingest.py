@@ -0,0 +1,280 @@
+"""
+Ingests every PDF of a directory tree, glob or manifest without the Streamlit app.
+
+Usage:
+    python -m src.ingest ~/papers
+    python -m src.ingest "reports/**/*.pdf" --workers 2 --batch-size 64
+    python -m src.ingest --manifest files.txt --update --dry-run
+    python -m src.ingest contracts/ --tags "legal, 2024"
+
+Files whose content is already indexed are skipped, and files sharing their name with
+an indexed document are skipped unless --update is given, in which case only their
+changed chunks are re-embedded. Documents are ingested by a pool of worker processes,
+each with its own embedding model. While loading into OpenSearch, the index refresh
+and replicas are switched off and restored afterwards.
+"""
+
+import argparse
+import contextlib
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from src.catalog import find_document_by_hash, get_document, hash_file, parse_tags
+from src.constants import EMBEDDING_BATCH_SIZE, INGEST_BULK_THREADS, OPENSEARCH_INDEX
+from src.ingestion import bulk_load_settings
+from src.opensearch import get_opensearch_client
+from src.pipeline import ingest_pdf
+from src.retrieval import get_retrieval_backend
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def find_files(patterns: List[str], manifest: Optional[str] = None) -> List[str]:
+    """
+    Expands directories, glob patterns and a manifest into a list of PDF paths.
+
+    Args:
+        patterns (List[str]): Directories (searched recursively), glob patterns or files.
+        manifest (Optional[str]): File listing one path per line; '#' starts a comment.
+
+    Returns:
+        List[str]: Sorted, distinct paths of existing PDF files.
+    """
+    if manifest:
+        with open(manifest, "r") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    patterns.append(line)
+
+    paths = set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.pdf")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(".pdf"):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def plan_ingestion(paths: List[str], update: bool) -> List[Dict[str, Any]]:
+    """
+    Decides what to do with each file, comparing content hashes with the catalog.
+
+    Args:
+        paths (List[str]): Paths of the PDF files.
+        update (bool): Whether files named like an indexed document are updated.
+
+    Returns:
+        List[Dict[str, Any]]: One task per file with 'path', 'document_name', 'size_bytes' and 'action' ("ingest", "update" or a reason to skip).
+    """
+    tasks = []
+    names = set()
+    hashes = set()
+    for path in paths:
+        document_name = os.path.basename(path)
+        content_hash = hash_file(path)
+        if content_hash in hashes or find_document_by_hash(content_hash):
+            action = "skip: already indexed"
+        elif document_name in names:
+            action = "skip: duplicate name"
+        elif get_document(document_name):
+            action = "update" if update else "skip: name already indexed"
+        else:
+            action = "ingest"
+        hashes.add(content_hash)
+        names.add(document_name)
+        tasks.append(
+            {
+                "path": path,
+                "document_name": document_name,
+                "size_bytes": os.path.getsize(path),
+                "action": action,
+            }
+        )
+    return tasks
+
+
+def ingest_file(
+    task: Dict[str, Any],
+    extraction_workers: Optional[int],
+    batch_size: int,
+    bulk_threads: int,
+    tags: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Ingests one planned file; runs in a worker process.
+
+    Args:
+        task (Dict[str, Any]): Task from plan_ingestion.
+        extraction_workers (Optional[int]): Processes used for page extraction and OCR.
+        batch_size (int): Number of chunks embedded together.
+        bulk_threads (int): Number of concurrent bulk requests.
+        tags (Optional[List[str]]): Tags recorded for the document. None keeps the tags
+            of an updated document.
+
+    Returns:
+        Dict[str, Any]: The task with the ingestion statistics, or an 'error'.
+    """
+    try:
+        stats = ingest_pdf(
+            task["path"],
+            task["document_name"],
+            extraction_workers=extraction_workers,
+            batch_size=batch_size,
+            bulk_threads=bulk_threads,
+            update=task["action"] == "update",
+            tags=tags,
+        )
+    except Exception as e:
+        logger.exception(f"Ingesting {task['path']} failed.")
+        return {**task, "error": str(e) or type(e).__name__}
+    errors = stats.pop("errors")
+    return {**task, **stats, "index_errors": len(errors)}
+
+
+def print_report(results: List[Dict[str, Any]], skipped: int, seconds: float) -> None:
+    """
+    Prints totals and throughput of a run.
+
+    Args:
+        results (List[Dict[str, Any]]): Results of the ingested files.
+        skipped (int): Number of files that were skipped.
+        seconds (float): Wall-clock duration of the run.
+    """
+    done = [result for result in results if "error" not in result]
+    failed = [result for result in results if "error" in result]
+    totals = {
+        key: sum(result[key] for result in done)
+        for key in ("pages", "chunks", "embedded", "indexed", "index_errors")
+    }
+    megabytes = sum(result["size_bytes"] for result in done) / 1024 / 1024
+    rate = 1 / seconds if seconds else 0.0
+
+    print(
+        f"Files: {len(done)} ingested, {skipped} skipped, {len(failed)} failed "
+        f"in {seconds:.1f}s"
+    )
+    print(
+        f"Totals: {totals['pages']} pages, {totals['chunks']} chunks, "
+        f"{totals['embedded']} embedded, {totals['indexed']} indexed, "
+        f"{totals['index_errors']} index errors, {megabytes:.1f} MB"
+    )
+    print(
+        f"Throughput: {len(done) * rate:.2f} files/s, {totals['pages'] * rate:.1f} "
+        f"pages/s, {totals['chunks'] * rate:.1f} chunks/s, {megabytes * rate:.2f} MB/s"
+    )
+    for result in sorted(done, key=lambda result: -result["seconds"])[:5]:
+        print(
+            f"  {result['seconds']:7.1f}s  {result['pages']:5d} pages  "
+            f"{result['document_name']}"
+        )
+    for result in failed:
+        print(f"  FAILED  {result['document_name']}: {result['error']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "paths", nargs="*", help="Directories, glob patterns or PDF files."
+    )
+    parser.add_argument("--manifest", help="File listing one PDF path per line.")
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update documents with the same name but different content.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of documents ingested at the same time.",
+    )
+    parser.add_argument(
+        "--extraction-workers",
+        type=int,
+        default=None,
+        help="Page extraction processes per document (default: PDF_EXTRACTION_WORKERS).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMBEDDING_BATCH_SIZE,
+        help="Number of chunks embedded together.",
+    )
+    parser.add_argument(
+        "--bulk-threads",
+        type=int,
+        default=INGEST_BULK_THREADS,
+        help="Concurrent bulk requests per document.",
+    )
+    parser.add_argument(
+        "--tags",
+        help="Comma-separated tags recorded for every ingested document, eg. for "
+        "filtering searches.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only list what would be ingested.",
+    )
+    args = parser.parse_args()
+    if not args.paths and not args.manifest:
+        parser.error("give at least one path or --manifest")
+
+    tasks = plan_ingestion(find_files(args.paths, args.manifest), args.update)
+    pending = [task for task in tasks if not task["action"].startswith("skip")]
+    for task in tasks:
+        print(f"{task['action']:>26}  {task['path']}")
+    if args.dry_run or not pending:
+        return
+
+    backend = get_retrieval_backend()
+    backend.ensure_index()
+    if backend.name == "opensearch":
+        index_name = getattr(backend, "index_name", OPENSEARCH_INDEX)
+        settings: Any = bulk_load_settings(get_opensearch_client(), index_name)
+    else:
+        settings = contextlib.nullcontext()
+    options = (
+        args.extraction_workers,
+        args.batch_size,
+        args.bulk_threads,
+        parse_tags(args.tags) if args.tags is not None else None,
+    )
+
+    start = time.perf_counter()
+    results = []
+    with settings:
+        if args.workers <= 1:
+            for task in pending:
+                results.append(ingest_file(task, *options))
+                print(f"[{len(results)}/{len(pending)}] {task['document_name']}")
+        else:
+            # Spawned so each worker loads its own embedding model
+            with ProcessPoolExecutor(
+                max_workers=args.workers, mp_context=get_context("spawn")
+            ) as executor:
+                futures = [
+                    executor.submit(ingest_file, task, *options) for task in pending
+                ]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    print(
+                        f"[{len(results)}/{len(pending)}] "
+                        f"{results[-1]['document_name']}"
+                    )
+    print_report(results, len(tasks) - len(pending), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,86 @@
 import json
 import logging
-from typing import Any, Dict, List, Tuple
+import os
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from opensearchpy import OpenSearch, helpers
+import numpy as np
 
-from src.constants import ASSYMETRIC_EMBEDDING, EMBEDDING_DIMENSION, OPENSEARCH_INDEX
-from src.opensearch import get_opensearch_client
+from src.catalog import get_document, hash_file, upsert_document
+from src.chunking import POSITION_FIELDS
+from src.constants import (
+    ASSYMETRIC_EMBEDDING,
+    EMBEDDING_DIMENSION,
+    INDEX_EMBEDDINGS_IN_SOURCE,
+    INDEX_PROFILE,
+    INGEST_BULK_CHUNK_SIZE,
+    INGEST_BULK_MAX_BYTES,
+    INGEST_BULK_THREADS,
+    INGEST_VECTOR_DECIMALS,
+    OPENSEARCH_INDEX,
+)
+from src.metrics import traced
+from src.opensearch import (
+    get_opensearch_client,
+    index_exists,
+    resolve_index_names,
+    set_index_exists,
+)
+from src.query_cache import mark_index_changed
 from src.utils import setup_logging
 
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
+
 # Initialize logger
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def load_index_config() -> Dict[str, Any]:
+def load_index_profiles() -> Dict[str, Dict[str, Any]]:
+    """
+    Loads the named index profiles from a JSON file.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Profile settings by profile name.
+    """
+    with open("src/index_profiles.json", "r") as f:
+        profiles = json.load(f)
+    return profiles if isinstance(profiles, dict) else {}
+
+
+def profile_requires_training(profile: Dict[str, Any]) -> bool:
+    """
+    Tells whether a profile's k-NN method needs a trained model (eg. IVF or PQ).
+
+    Args:
+        profile (Dict[str, Any]): Profile settings.
+
+    Returns:
+        bool: True if the index can only be created from a trained model.
     """
-    Loads the index configuration from a JSON file.
+    method = profile["method"]
+    encoder = method.get("parameters", {}).get("encoder", {})
+    return bool(method["name"] == "ivf" or encoder.get("name") == "pq")
+
+
+def load_index_config(
+    profile_name: Optional[str] = None,
+    model_id: Optional[str] = None,
+    source_embeddings: bool = INDEX_EMBEDDINGS_IN_SOURCE,
+) -> Dict[str, Any]:
+    """
+    Loads the index configuration from a JSON file and applies an index profile.
+
+    The profile sets the k-NN method (engine, space type, HNSW graph parameters and
+    quantization encoder), the query-time ef_search and the shard count.
+
+    Args:
+        profile_name (Optional[str]): Name of the index profile. Defaults to INDEX_PROFILE.
+        model_id (Optional[str]): Trained k-NN model, required by IVF and PQ profiles.
+        source_embeddings (bool): Keep embeddings in _source. Without them they are only
+            stored for k-NN search, but the index cannot be reindexed. Defaults to
+            INDEX_EMBEDDINGS_IN_SOURCE.
 
     Returns:
         Dict[str, Any]: The index configuration as a dictionary.
@@ -23,90 +88,310 @@ def load_index_config() -> Dict[str, Any]:
     with open("src/index_config.json", "r") as f:
         config = json.load(f)
 
-    # Replace the placeholder with the actual embedding dimension
-    config["mappings"]["properties"]["embedding"]["dimension"] = EMBEDDING_DIMENSION
-    logger.info("Index configuration loaded from src/index_config.json.")
+    profile_name = profile_name or INDEX_PROFILE
+    profiles = load_index_profiles()
+    if profile_name not in profiles:
+        raise ValueError(
+            f"Unknown index profile '{profile_name}', expected one of {sorted(profiles)}."
+        )
+    profile = profiles[profile_name]
+
+    index_settings = config["settings"]["index"]
+    index_settings["number_of_shards"] = profile.get("number_of_shards", 1)
+    if profile.get("ef_search"):
+        index_settings["knn.algo_param.ef_search"] = profile["ef_search"]
+
+    embedding = config["mappings"]["properties"]["embedding"]
+    if profile_requires_training(profile):
+        if not model_id:
+            raise ValueError(
+                f"Index profile '{profile_name}' needs a trained model; "
+                "create it with `python -m src.migrate_index`."
+            )
+        config["mappings"]["properties"]["embedding"] = {
+            "type": "knn_vector",
+            "model_id": model_id,
+        }
+    else:
+        # Replace the placeholder with the actual embedding dimension
+        embedding["dimension"] = EMBEDDING_DIMENSION
+        embedding["method"] = profile["method"]
+    if not source_embeddings:
+        config["mappings"]["_source"] = {"excludes": ["embedding"]}
+    logger.info(f"Index configuration loaded with profile '{profile_name}'.")
     return config if isinstance(config, dict) else {}
 
 
-def create_index(client: OpenSearch) -> None:
+def create_index(
+    client: "OpenSearch",
+    profile_name: Optional[str] = None,
+    index_name: str = OPENSEARCH_INDEX,
+    model_id: Optional[str] = None,
+    source_embeddings: bool = INDEX_EMBEDDINGS_IN_SOURCE,
+) -> None:
     """
     Creates an index in OpenSearch using settings and mappings from the configuration file.
 
     Args:
         client (OpenSearch): OpenSearch client instance.
+        profile_name (Optional[str]): Name of the index profile. Defaults to INDEX_PROFILE.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+        model_id (Optional[str]): Trained k-NN model, required by IVF and PQ profiles.
+        source_embeddings (bool): Keep embeddings in _source. Defaults to INDEX_EMBEDDINGS_IN_SOURCE.
     """
-    index_body = load_index_config()
-    if not client.indices.exists(index=OPENSEARCH_INDEX):
-        response = client.indices.create(index=OPENSEARCH_INDEX, body=index_body)
-        logger.info(f"Created index {OPENSEARCH_INDEX}: {response}")
+    if not index_exists(client, index_name):
+        index_body = load_index_config(profile_name, model_id, source_embeddings)
+        response = client.indices.create(index=index_name, body=index_body)
+        set_index_exists(True, index_name)
+        logger.info(f"Created index {index_name}: {response}")
     else:
-        logger.info(f"Index {OPENSEARCH_INDEX} already exists.")
+        logger.info(f"Index {index_name} already exists.")
+
+
+def source_has_embeddings(
+    client: "OpenSearch", index_name: str = OPENSEARCH_INDEX
+) -> bool:
+    """
+    Tells whether an index keeps the embeddings in _source.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        index_name (str): Name of the index or alias. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        bool: False if any index behind the name excludes 'embedding' from _source.
+    """
+    mappings = client.indices.get_mapping(index=index_name)
+    return not any(
+        "embedding" in mapping["mappings"].get("_source", {}).get("excludes", [])
+        for mapping in mappings.values()
+    )
+
+
+def refresh_and_mark_changed(
+    client: "OpenSearch", index_name: str = OPENSEARCH_INDEX
+) -> None:
+    """
+    Makes recent writes searchable, then invalidates cached search results.
+
+    Bumping the index generation before the refresh would let a search that still sees
+    the old documents cache them under the new generation.
 
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+    """
+    try:
+        client.indices.refresh(index=index_name)
+    except Exception as e:
+        logger.warning(f"Refreshing index {index_name} failed: {e}")
+    mark_index_changed()
 
-def delete_index(client: OpenSearch) -> None:
+
+def delete_index(client: "OpenSearch", index_name: str = OPENSEARCH_INDEX) -> None:
     """
     Deletes the index in OpenSearch if it exists.
 
+    If the name is an alias (eg. after a migration), the indices behind it are deleted.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+    """
+    index_names = resolve_index_names(client, index_name)
+    if index_names:
+        response = client.indices.delete(index=",".join(index_names))
+        set_index_exists(False, index_name)
+        mark_index_changed()
+        logger.info(f"Deleted index {', '.join(index_names)}: {response}")
+    else:
+        logger.info(f"Index {index_name} does not exist.")
+
+
+@contextmanager
+def bulk_load_settings(
+    client: "OpenSearch", index_name: str = OPENSEARCH_INDEX
+) -> Iterator[None]:
+    """
+    Disables refreshes and replicas of an index for the duration of a bulk load.
+
+    The previous settings are restored and the index refreshed afterwards, also when
+    the load fails. An unset refresh interval is restored to the cluster default. An
+    index whose refreshes are already disabled, eg. by a concurrent bulk load, is left
+    alone so its settings are not restored to the disabled ones.
+
     Args:
         client (OpenSearch): OpenSearch client instance.
+        index_name (str): Name of the index or alias. Defaults to OPENSEARCH_INDEX.
+    """
+    keys = ["index.refresh_interval", "index.number_of_replicas"]
+    previous: Dict[str, Dict[str, Any]] = {}
+    for index in resolve_index_names(client, index_name):
+        response = client.indices.get_settings(
+            index=index, name=",".join(keys), flat_settings=True
+        )
+        settings = response.get(index, {}).get("settings", {})
+        if str(settings.get("index.refresh_interval")) == "-1":
+            logger.warning(
+                f"Refreshes of {index} are already disabled; leaving its settings."
+            )
+            continue
+        previous[index] = {key: settings.get(key) for key in keys}
+        client.indices.put_settings(
+            index=index,
+            body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}},
+        )
+    logger.info(f"Bulk load settings applied to {', '.join(previous) or 'no index'}.")
+    try:
+        yield
+    finally:
+        for index, settings in previous.items():
+            client.indices.put_settings(index=index, body=settings)
+            client.indices.refresh(index=index)
+        if previous:
+            mark_index_changed()
+        logger.info(f"Index settings restored on {', '.join(previous) or 'no index'}.")
+
+
+def build_index_action(
+    doc: Dict[str, Any],
+    index_name: str = OPENSEARCH_INDEX,
+    decimals: Optional[int] = INGEST_VECTOR_DECIMALS,
+) -> Dict[str, Any]:
+    """
+    Builds the bulk index action for a single document chunk.
+
+    Args:
+        doc (Dict[str, Any]): Document dictionary with 'doc_id', 'text', 'embedding', and 'document_name',
+            and optionally the chunk's 'chunk_hash' and position fields. The embedding may be a list of floats or a numpy row; rows are serialised
+            when the bulk request is sent.
+        index_name (str): Name of the target index. Defaults to OPENSEARCH_INDEX.
+        decimals (Optional[int]): Decimals the embedding is rounded to, shortening the
+            bulk request. None keeps it exact. Defaults to INGEST_VECTOR_DECIMALS.
+
+    Returns:
+        Dict[str, Any]: The bulk action.
     """
-    if client.indices.exists(index=OPENSEARCH_INDEX):
-        response = client.indices.delete(index=OPENSEARCH_INDEX)
-        logger.info(f"Deleted index {OPENSEARCH_INDEX}: {response}")
+    # Prefix each document's text with "passage: " for the asymmetric embedding model
+    if ASSYMETRIC_EMBEDDING:
+        prefixed_text = f"passage: {doc['text']}"
     else:
-        logger.info(f"Index {OPENSEARCH_INDEX} does not exist.")
+        prefixed_text = f"{doc['text']}"
+
+    embedding = doc["embedding"]  # Precomputed embedding
+    if decimals is not None:
+        embedding = np.round(np.asarray(embedding, dtype=np.float32), decimals)
 
+    source = {
+        "text": prefixed_text,
+        "embedding": embedding,
+        "document_name": doc["document_name"],
+    }
+    for field in ("chunk_hash", *POSITION_FIELDS):
+        if field in doc:
+            source[field] = doc[field]
 
+    return {"_index": index_name, "_id": doc["doc_id"], "_source": source}
+
+
+@traced("bulk_index_documents")
 def bulk_index_documents(documents: List[Dict[str, Any]]) -> Tuple[int, List[Any]]:
     """
     Indexes multiple documents into OpenSearch in bulk.
 
     Args:
         documents (List[Dict[str, Any]]): List of document dictionaries with 'doc_id', 'text', 'embedding', and 'document_name'.
+            The embedding may be a list of floats or a numpy row.
 
     Returns:
         Tuple[int, List[Any]]: Tuple with the number of successfully indexed documents and a list of any errors.
     """
-    actions = []
-    client = get_opensearch_client()
-
-    for doc in documents:
-        doc_id = doc["doc_id"]
-        embedding_list = doc["embedding"].tolist()
-        document_name = doc["document_name"]
+    from opensearchpy import helpers
 
-        # Prefix each document's text with "passage: " for the asymmetric embedding model
-        if ASSYMETRIC_EMBEDDING:
-            prefixed_text = f"passage: {doc['text']}"
-        else:
-            prefixed_text = f"{doc['text']}"
-
-        action = {
-            "_index": OPENSEARCH_INDEX,
-            "_id": doc_id,
-            "_source": {
-                "text": prefixed_text,
-                "embedding": embedding_list,  # Precomputed embedding
-                "document_name": document_name,
-            },
-        }
-        actions.append(action)
+    client = get_opensearch_client()
+    actions = [build_index_action(doc) for doc in documents]
 
     # Perform bulk indexing and capture response details explicitly
     success, errors = helpers.bulk(client, actions)
+    refresh_and_mark_changed(client)
     logger.info(
         f"Bulk indexed {len(documents)} documents into index {OPENSEARCH_INDEX} with {len(errors)} errors."
     )
     return success, errors
 
 
-def delete_documents_by_document_name(document_name: str) -> Dict[str, Any]:
+def stream_index_documents(
+    documents: Iterable[Dict[str, Any]],
+    thread_count: int = INGEST_BULK_THREADS,
+    chunk_size: int = INGEST_BULK_CHUNK_SIZE,
+    index_name: str = OPENSEARCH_INDEX,
+    client: Optional["OpenSearch"] = None,
+    decimals: Optional[int] = INGEST_VECTOR_DECIMALS,
+) -> Tuple[int, List[Any]]:
+    """
+    Indexes a stream of documents into OpenSearch without materialising it.
+
+    Documents are pulled from the iterable only as bulk requests are sent, so a lazy
+    producer (eg. the ingestion pipeline) is throttled by indexing speed. With more than
+    one thread, bulk requests are sent concurrently while the next batch is produced.
+
+    Args:
+        documents (Iterable[Dict[str, Any]]): Document dictionaries with 'doc_id', 'text', 'embedding', and 'document_name'.
+        thread_count (int): Number of concurrent bulk requests. Defaults to INGEST_BULK_THREADS.
+        chunk_size (int): Number of documents per bulk request. Defaults to INGEST_BULK_CHUNK_SIZE.
+        index_name (str): Name of the target index. Defaults to OPENSEARCH_INDEX.
+        client (Optional[OpenSearch]): Client to send the requests with. Defaults to the shared client.
+        decimals (Optional[int]): Decimals embeddings are rounded to. Defaults to INGEST_VECTOR_DECIMALS.
+
+    Returns:
+        Tuple[int, List[Any]]: Tuple with the number of successfully indexed documents and a list of any errors.
+    """
+    from opensearchpy import helpers
+
+    client = client or get_opensearch_client()
+    actions = (build_index_action(doc, index_name, decimals) for doc in documents)
+    options: Dict[str, Any] = {
+        "chunk_size": chunk_size,
+        "max_chunk_bytes": INGEST_BULK_MAX_BYTES,
+        "raise_on_error": False,
+    }
+    if thread_count > 1:
+        results = helpers.parallel_bulk(
+            client,
+            actions,
+            thread_count=thread_count,
+            queue_size=thread_count,
+            **options,
+        )
+    else:
+        results = helpers.streaming_bulk(client, actions, **options)
+
+    success = 0
+    errors = []
+    try:
+        for ok, item in results:
+            if ok:
+                success += 1
+            else:
+                errors.append(item)
+    finally:
+        refresh_and_mark_changed(client, index_name)
+
+    logger.info(
+        f"Stream indexed {success + len(errors)} documents into index {index_name} with {len(errors)} errors."
+    )
+    return success, errors
+
+
+def delete_documents_by_document_name(
+    document_name: str, index_name: str = OPENSEARCH_INDEX
+) -> Dict[str, Any]:
     """
     Deletes documents from OpenSearch where 'document_name' matches the provided value.
 
     Args:
         document_name (str): Name of the document to delete.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
 
     Returns:
         Dict[str, Any]: Response from the delete-by-query operation.
@@ -114,9 +399,173 @@ def delete_documents_by_document_name(document_name: str) -> Dict[str, Any]:
     client = get_opensearch_client()
     query = {"query": {"term": {"document_name": document_name}}}
     response: Dict[str, Any] = client.delete_by_query(
-        index=OPENSEARCH_INDEX, body=query
+        index=index_name, body=query, refresh=True
     )
+    mark_index_changed()
     logger.info(
-        f"Deleted documents with name '{document_name}' from index {OPENSEARCH_INDEX}."
+        f"Deleted documents with name '{document_name}' from index {index_name}."
     )
     return response
+
+
+def get_document_chunks(
+    client: "OpenSearch", document_name: str, index_name: str = OPENSEARCH_INDEX
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetches the content hash and position of every indexed chunk of a document.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        document_name (str): Name of the document.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 'chunk_hash' and the position fields by chunk id.
+    """
+    from opensearchpy import helpers
+
+    query = {
+        "query": {"term": {"document_name": document_name}},
+        "_source": ["chunk_hash", *POSITION_FIELDS],
+    }
+    return {
+        hit["_id"]: hit.get("_source", {})
+        for hit in helpers.scan(client, query=query, index=index_name)
+    }
+
+
+def sample_chunks(
+    client: "OpenSearch", count: int, seed: int = 0, index_name: str = OPENSEARCH_INDEX
+) -> List[Dict[str, Any]]:
+    """
+    Fetches a reproducible random sample of indexed chunks with their embeddings.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        count (int): Maximum number of chunks.
+        seed (int): Seed of the random order. Defaults to 0.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        List[Dict[str, Any]]: Chunks with '_id', 'text' and 'embedding'.
+    """
+    response = client.search(
+        index=index_name,
+        body={
+            "size": count,
+            "_source": ["text", "embedding"],
+            "query": {
+                "function_score": {
+                    "query": {"match_all": {}},
+                    "random_score": {"seed": seed, "field": "_seq_no"},
+                }
+            },
+        },
+    )
+    return [
+        {"_id": hit["_id"], **hit["_source"]}
+        for hit in response["hits"]["hits"]
+        if "embedding" in hit.get("_source", {})
+    ]
+
+
+def apply_chunk_changes(
+    client: "OpenSearch",
+    deleted_ids: List[str],
+    offsets: Dict[str, Dict[str, Any]],
+    index_name: str = OPENSEARCH_INDEX,
+) -> Tuple[int, List[Any]]:
+    """
+    Deletes chunks and updates the position of chunks that moved, in one bulk request.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        deleted_ids (List[str]): Ids of the chunks to delete.
+        offsets (Dict[str, Dict[str, Any]]): New position fields by chunk id.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        Tuple[int, List[Any]]: Tuple with the number of successful actions and a list of any errors.
+    """
+    from opensearchpy import helpers
+
+    actions: List[Dict[str, Any]] = [
+        {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+        for doc_id in deleted_ids
+    ]
+    actions.extend(
+        {
+            "_op_type": "update",
+            "_index": index_name,
+            "_id": doc_id,
+            "doc": fields,
+        }
+        for doc_id, fields in offsets.items()
+    )
+    if not actions:
+        return 0, []
+
+    success, errors = helpers.bulk(client, actions, raise_on_error=False)
+    refresh_and_mark_changed(client, index_name)
+    logger.info(
+        f"Deleted {len(deleted_ids)} and moved {len(offsets)} chunks in index {index_name} with {len(errors)} errors."
+    )
+    return success, list(errors)
+
+
+def get_document_chunk_counts(
+    client: "OpenSearch", index_name: str = OPENSEARCH_INDEX
+) -> Dict[str, int]:
+    """
+    Counts the indexed chunks of every document.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        Dict[str, int]: Number of chunks per document name.
+    """
+    query = {
+        "size": 0,
+        "aggs": {"unique_docs": {"terms": {"field": "document_name", "size": 10000}}},
+    }
+    response = client.search(index=index_name, body=query)
+    buckets = response["aggregations"]["unique_docs"]["buckets"]
+    return {bucket["key"]: bucket["doc_count"] for bucket in buckets}
+
+
+def backfill_catalog(chunk_counts: Dict[str, int], upload_dir: str) -> int:
+    """
+    Adds documents that are in the index but missing from the catalog.
+
+    Used once for indexes built before the catalog existed. Counts that would require
+    re-extracting the PDF are left empty.
+
+    Args:
+        chunk_counts (Dict[str, int]): Number of indexed chunks per document name.
+        upload_dir (str): Directory the uploaded PDFs are stored in.
+
+    Returns:
+        int: Number of documents added to the catalog.
+    """
+    added = 0
+    for document_name, chunk_count in chunk_counts.items():
+        if get_document(document_name):
+            continue
+        file_path = os.path.join(upload_dir, document_name)
+        record: Dict[str, Any] = {
+            "document_name": document_name,
+            "chunk_count": chunk_count,
+        }
+        if os.path.exists(file_path):
+            record["file_path"] = file_path
+            record["size_bytes"] = os.path.getsize(file_path)
+            record["content_hash"] = hash_file(file_path)
+        else:
+            logger.warning(f"File '{document_name}' does not exist locally.")
+        upsert_document(record)
+        added += 1
+
+    logger.info(f"Backfilled {added} documents into the catalog.")
+    return added
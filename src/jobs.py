@@ -0,0 +1,416 @@
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.constants import (
+    INGEST_JOB_MAX_ATTEMPTS,
+    INGEST_QUEUE_DB_PATH,
+    INGEST_WORKER_PROCESSES,
+)
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Jobs in these states still have work to do
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def connect_queue() -> sqlite3.Connection:
+    """
+    Opens the ingestion job queue, creating it if needed.
+
+    Returns:
+        sqlite3.Connection: Connection whose rows can be read as dictionaries.
+    """
+    os.makedirs(os.path.dirname(INGEST_QUEUE_DB_PATH) or ".", exist_ok=True)
+    connection = sqlite3.connect(INGEST_QUEUE_DB_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    # Lets the upload page read progress while a worker is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            update_existing INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker_pid INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            pages_total INTEGER,
+            pages_done INTEGER NOT NULL DEFAULT 0,
+            chunks_indexed INTEGER,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+        CREATE TABLE IF NOT EXISTS job_pages (
+            job_id INTEGER NOT NULL,
+            page_num INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (job_id, page_num)
+        );
+        CREATE TABLE IF NOT EXISTS workers (
+            pid INTEGER PRIMARY KEY,
+            started_at TEXT NOT NULL
+        );
+        """)
+    # Queues created by earlier versions lack the newer columns
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    for column in ("tags", "target_path"):
+        if column not in columns:
+            connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+    return connection
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Checks whether a process with the given id is running on this machine.
+
+    Args:
+        pid (int): Process id.
+
+    Returns:
+        bool: True if the process exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but belongs to another user
+    return True
+
+
+def enqueue_job(
+    document_name: str,
+    file_path: str,
+    update: bool = False,
+    tags: Optional[List[str]] = None,
+    target_path: Optional[str] = None,
+) -> int:
+    """
+    Adds an ingestion job, unless the document already has one waiting or running.
+
+    Args:
+        document_name (str): Name the chunks are indexed under.
+        file_path (str): Path to the PDF file.
+        update (bool): Whether to only apply the differences to an indexed version of the document. Defaults to False.
+        tags (Optional[List[str]]): Tags recorded for the document in the catalog. None
+            keeps the tags of an updated document.
+        target_path (Optional[str]): Where the worker moves file_path once the document
+            is indexed, so a file being read is never overwritten. Defaults to keeping
+            file_path in place.
+
+    Returns:
+        int: Id of the new job, or of the document's active job.
+    """
+    with closing(connect_queue()) as connection, connection:
+        row = connection.execute(
+            "SELECT job_id FROM jobs WHERE document_name = ? AND status IN (?, ?)",
+            (document_name, *ACTIVE_STATUSES),
+        ).fetchone()
+        if row:
+            return int(row["job_id"])
+        cursor = connection.execute(
+            "INSERT INTO jobs "
+            "(document_name, file_path, update_existing, tags, target_path, "
+            "created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                document_name,
+                file_path,
+                int(update),
+                json.dumps(tags) if tags is not None else None,
+                target_path,
+                _now(),
+            ),
+        )
+        job_id = int(cursor.lastrowid or 0)
+    logger.info(f"Queued ingestion job {job_id} for '{document_name}'.")
+    return job_id
+
+
+def get_active_job(document_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up the queued or running job of a document.
+
+    Args:
+        document_name (str): Name of the document.
+
+    Returns:
+        Optional[Dict[str, Any]]: The active job, or None if the document has none.
+    """
+    with closing(connect_queue()) as connection:
+        row = connection.execute(
+            "SELECT * FROM jobs WHERE document_name = ? AND status IN (?, ?)",
+            (document_name, *ACTIVE_STATUSES),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def claim_job(worker_pid: int) -> Optional[Dict[str, Any]]:
+    """
+    Takes the oldest queued job, first requeueing jobs whose worker has died.
+
+    A job whose worker died INGEST_JOB_MAX_ATTEMPTS times (eg. killed for running out of
+    memory) is marked as failed instead.
+
+    Args:
+        worker_pid (int): Process id of the claiming worker.
+
+    Returns:
+        Optional[Dict[str, Any]]: The claimed job, or None if the queue is empty.
+    """
+    with closing(connect_queue()) as connection:
+        connection.isolation_level = None
+        # Write lock up front so two workers cannot claim the same job
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            running = connection.execute(
+                "SELECT job_id, worker_pid, attempts FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            for row in running:
+                if row["worker_pid"] and is_process_alive(row["worker_pid"]):
+                    continue
+                status = (
+                    "failed" if row["attempts"] >= INGEST_JOB_MAX_ATTEMPTS else "queued"
+                )
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL, error = ? "
+                    "WHERE job_id = ?",
+                    (
+                        status,
+                        "Worker died" if status == "failed" else None,
+                        row["job_id"],
+                    ),
+                )
+                logger.warning(f"Job {row['job_id']} of a dead worker is now {status}.")
+
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY job_id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, "
+                "attempts = attempts + 1, started_at = COALESCE(started_at, ?), "
+                "updated_at = ? WHERE job_id = ?",
+                (worker_pid, _now(), _now(), row["job_id"]),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    job = dict(row)
+    job["attempts"] += 1
+    logger.info(
+        f"Worker {worker_pid} claimed job {job['job_id']} for '{job['document_name']}'."
+    )
+    return job
+
+
+def update_job_progress(
+    job_id: int, pages_done: int, pages_total: Optional[int] = None
+) -> None:
+    """
+    Records how many pages of a job have been processed.
+
+    Args:
+        job_id (int): Id of the job.
+        pages_done (int): Number of pages processed so far.
+        pages_total (Optional[int]): Number of pages in the document, if known.
+    """
+    with closing(connect_queue()) as connection, connection:
+        connection.execute(
+            "UPDATE jobs SET pages_done = ?, "
+            "pages_total = COALESCE(?, pages_total), updated_at = ? WHERE job_id = ?",
+            (pages_done, pages_total, _now(), job_id),
+        )
+
+
+def finish_job(job_id: int, chunks_indexed: int, error: Optional[str] = None) -> None:
+    """
+    Marks a job as done, or failed if an error is given, and drops its checkpoints.
+
+    Args:
+        job_id (int): Id of the job.
+        chunks_indexed (int): Number of chunks the document has in the index.
+        error (Optional[str]): Description of the failure, if the job failed.
+    """
+    with closing(connect_queue()) as connection, connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, chunks_indexed = ?, error = ?, "
+            "worker_pid = NULL, updated_at = ?, finished_at = ? WHERE job_id = ?",
+            (
+                "failed" if error else "done",
+                chunks_indexed,
+                error,
+                _now(),
+                _now(),
+                job_id,
+            ),
+        )
+        connection.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+    logger.info(f"Job {job_id} {'failed: ' + error if error else 'done'}.")
+
+
+def release_job(job_id: int) -> None:
+    """
+    Puts a job back in the queue (eg. when its worker is stopped), keeping checkpoints.
+
+    Args:
+        job_id (int): Id of the job.
+    """
+    with closing(connect_queue()) as connection, connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? "
+            "WHERE job_id = ? AND status = 'running'",
+            (_now(), job_id),
+        )
+    logger.info(f"Job {job_id} released back to the queue.")
+
+
+def save_job_pages(job_id: int, first_page: int, texts: List[str]) -> None:
+    """
+    Checkpoints extracted page texts so a resumed job does not extract them again.
+
+    Args:
+        job_id (int): Id of the job.
+        first_page (int): Number of the first page in texts.
+        texts (List[str]): Raw text of consecutive pages.
+    """
+    with closing(connect_queue()) as connection, connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO job_pages (job_id, page_num, text) "
+            "VALUES (?, ?, ?)",
+            [(job_id, first_page + i, text) for i, text in enumerate(texts)],
+        )
+
+
+def load_job_pages(job_id: int) -> List[str]:
+    """
+    Loads the checkpointed page texts of a job.
+
+    Args:
+        job_id (int): Id of the job.
+
+    Returns:
+        List[str]: Raw text of the leading pages that were checkpointed, in page order.
+    """
+    with closing(connect_queue()) as connection:
+        rows = connection.execute(
+            "SELECT page_num, text FROM job_pages WHERE job_id = ? ORDER BY page_num",
+            (job_id,),
+        ).fetchall()
+    texts: List[str] = []
+    for row in rows:
+        if row["page_num"] != len(texts):
+            break  # Only a gapless prefix can be resumed from
+        texts.append(row["text"])
+    return texts
+
+
+def list_jobs(limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Lists the most recent jobs, newest first.
+
+    Args:
+        limit (int): Maximum number of jobs returned. Defaults to 20.
+
+    Returns:
+        List[Dict[str, Any]]: The jobs with their status and progress.
+    """
+    with closing(connect_queue()) as connection:
+        rows = connection.execute(
+            "SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def register_worker(pid: int, max_workers: int = INGEST_WORKER_PROCESSES) -> bool:
+    """
+    Registers a worker process unless max_workers live workers are already running.
+
+    Args:
+        pid (int): Process id of the worker.
+        max_workers (int): Maximum number of concurrent workers. Defaults to INGEST_WORKER_PROCESSES.
+
+    Returns:
+        bool: True if the worker may run.
+    """
+    with closing(connect_queue()) as connection:
+        connection.isolation_level = None
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            live = 0
+            for row in connection.execute("SELECT pid FROM workers").fetchall():
+                if row["pid"] != pid and is_process_alive(row["pid"]):
+                    live += 1
+                else:
+                    connection.execute(
+                        "DELETE FROM workers WHERE pid = ?", (row["pid"],)
+                    )
+            allowed = live < max_workers
+            if allowed:
+                connection.execute(
+                    "INSERT INTO workers (pid, started_at) VALUES (?, ?)", (pid, _now())
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    return allowed
+
+
+def unregister_worker(pid: int) -> None:
+    """
+    Removes a worker process from the registry.
+
+    Args:
+        pid (int): Process id of the worker.
+    """
+    with closing(connect_queue()) as connection, connection:
+        connection.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+
+def count_live_workers() -> int:
+    """
+    Counts the registered worker processes that are still running.
+
+    Returns:
+        int: Number of live workers.
+    """
+    with closing(connect_queue()) as connection:
+        rows = connection.execute("SELECT pid FROM workers").fetchall()
+    return sum(1 for row in rows if is_process_alive(row["pid"]))
+
+
+def ensure_workers_running() -> None:
+    """
+    Starts `python -m src.worker` in the background if no worker is running.
+    """
+    if count_live_workers():
+        return
+    subprocess.Popen(
+        [sys.executable, "-m", "src.worker"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,  # Keeps running when the Streamlit server stops
+    )
+    logger.info("Started background ingestion workers.")
@@ -0,0 +1,607 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chunking import POSITION_FIELDS
+from src.constants import (
+    HYBRID_FUSION_STRATEGY,
+    HYBRID_SEARCH_WEIGHTS,
+    INGEST_BULK_CHUNK_SIZE,
+    LOCAL_INDEX_IVF_MIN_ROWS,
+    LOCAL_INDEX_IVF_NPROBE,
+)
+from src.fusion import fuse, resolve_leg_depths
+from src.ingestion import build_index_action
+from src.metrics import traced
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Lucene BM25 defaults used by OpenSearch
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Approximates the OpenSearch standard analyzer: lowercased unicode word tokens
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Rows scored per block in exact k-NN search, bounding temporary memory
+KNN_BLOCK_ROWS = 65536
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercased word tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The tokens, in order.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LocalHybridIndex:
+    """
+    In-process hybrid index: BM25 over an inverted index plus k-NN over a memory-mapped
+    float32 embedding matrix, fused client-side (by default like `nlp-search-pipeline`).
+
+    Chunk sources live in SQLite and each chunk owns one row of the matrix. Deleted or
+    replaced chunks are tombstoned rather than moved. k-NN search is exact until the
+    index holds LOCAL_INDEX_IVF_MIN_ROWS live rows, after which an IVF partition
+    (k-means centroids, probing the nearest LOCAL_INDEX_IVF_NPROBE lists) is trained
+    on first use. Writes from other processes are picked up on the next search.
+    """
+
+    def __init__(self, directory: str, dimension: int) -> None:
+        self.directory = directory
+        self.dimension = dimension
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(directory, "chunks.sqlite3"),
+            timeout=30,
+            check_same_thread=False,
+        )
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                document_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id);
+            CREATE INDEX IF NOT EXISTS chunks_document_name ON chunks (document_name);
+            """)
+        self._load()
+
+    def _data_version(self) -> int:
+        return int(self._connection.execute("PRAGMA data_version").fetchone()[0])
+
+    def _load(self) -> None:
+        """Rebuilds the in-memory state from SQLite and the vector file."""
+        rows = self._connection.execute(
+            "SELECT row, doc_id, source, deleted FROM chunks ORDER BY row"
+        ).fetchall()
+        self._size = rows[-1][0] + 1 if rows else 0
+        self._alive = np.zeros(self._size, dtype=bool)
+        self._doc_lengths = np.zeros(self._size, dtype=np.float32)
+        self._row_by_id: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._posting_arrays: Dict[str, Tuple[np.ndarray[Any, Any], ...]] = {}
+        for row, doc_id, source, deleted in rows:
+            self._add_postings(row, json.loads(source)["text"])
+            if not deleted:
+                self._alive[row] = True
+                self._row_by_id[doc_id] = row
+
+        self._vectors = self._open_vectors(self._size)
+        self._centroids: Optional[np.ndarray[Any, Any]] = None
+        self._assignments = np.full(self._size, -1, dtype=np.int32)
+        self._version = self._data_version()
+        logger.info(
+            f"Loaded local index from {self.directory} with {len(self._row_by_id)} chunks."
+        )
+
+    def _maybe_reload(self) -> None:
+        """Reloads the index if another process committed changes."""
+        if self._data_version() != self._version:
+            self._load()
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[None]:
+        """
+        Runs the with-block as one SQLite write transaction on an up-to-date index.
+
+        The transaction takes the database write lock up front, so writers in other
+        processes wait until it commits instead of allocating the same rows.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._maybe_reload()
+                yield
+                self._connection.commit()
+            except BaseException:
+                self._connection.rollback()
+                self._load()  # Drops the in-memory changes of the failed write
+                raise
+            self._version = self._data_version()
+
+    def _open_vectors(self, rows: int) -> np.memmap[Any, Any]:
+        """Maps the vector file, growing it (by doubling) to hold at least `rows`."""
+        row_bytes = 4 * self.dimension
+        current = (
+            os.path.getsize(self.vectors_path) // row_bytes
+            if os.path.exists(self.vectors_path)
+            else 0
+        )
+        capacity = max(current, 1024)
+        while capacity < rows:
+            capacity *= 2
+        if capacity != current:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        return np.memmap(
+            self.vectors_path,
+            dtype=np.float32,
+            mode="r+",
+            shape=(capacity, self.dimension),
+        )
+
+    def _add_postings(self, row: int, text: str) -> None:
+        tokens = tokenize(text)
+        self._doc_lengths[row] = len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            rows, frequencies = self._postings.setdefault(token, ([], []))
+            rows.append(row)
+            frequencies.append(count)
+            self._posting_arrays.pop(token, None)
+
+    def add_documents(
+        self, documents: Iterable[Dict[str, Any]]
+    ) -> Tuple[int, List[Any]]:
+        """
+        Adds or replaces document chunks.
+
+        Args:
+            documents (Iterable[Dict[str, Any]]): Document dictionaries with 'doc_id', 'text', 'embedding', and 'document_name'.
+
+        Returns:
+            Tuple[int, List[Any]]: Tuple with the number of indexed documents and a list of any errors.
+        """
+        indexed = 0
+        batch: List[Dict[str, Any]] = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= INGEST_BULK_CHUNK_SIZE:
+                indexed += self._add_batch(batch)
+                batch = []
+        if batch:
+            indexed += self._add_batch(batch)
+        logger.info(f"Indexed {indexed} chunks into the local index.")
+        return indexed, []
+
+    def _add_batch(self, batch: List[Dict[str, Any]]) -> int:
+        with self._write():
+            start = self._connection.execute(
+                "SELECT COALESCE(MAX(row), -1) + 1 FROM chunks"
+            ).fetchone()[0]
+            grown = start + len(batch) - self._size
+            self._size += grown
+            self._alive = np.concatenate([self._alive, np.zeros(grown, dtype=bool)])
+            self._doc_lengths = np.concatenate(
+                [self._doc_lengths, np.zeros(grown, dtype=np.float32)]
+            )
+            self._assignments = np.concatenate(
+                [self._assignments, np.full(grown, -1, dtype=np.int32)]
+            )
+            if self._size > self._vectors.shape[0]:
+                self._vectors.flush()
+                self._vectors = self._open_vectors(self._size)
+
+            records = []
+            replaced = []
+            for offset, doc in enumerate(batch):
+                row = start + offset
+                source = dict(build_index_action(doc, decimals=None)["_source"])
+                embedding = np.asarray(source.pop("embedding"), dtype=np.float32)
+                self._vectors[row] = embedding
+                previous = self._row_by_id.get(doc["doc_id"])
+                if previous is not None:
+                    self._alive[previous] = False
+                    replaced.append((previous,))
+                self._row_by_id[doc["doc_id"]] = row
+                self._alive[row] = True
+                self._add_postings(row, source["text"])
+                records.append(
+                    (row, doc["doc_id"], doc["document_name"], json.dumps(source))
+                )
+            self._vectors.flush()
+            if self._centroids is not None:
+                self._assign(np.arange(start, self._size))
+
+            self._connection.executemany(
+                "INSERT INTO chunks (row, doc_id, document_name, source) "
+                "VALUES (?, ?, ?, ?)",
+                records,
+            )
+            self._connection.executemany(
+                "UPDATE chunks SET deleted = 1 WHERE row = ?", replaced
+            )
+        return len(batch)
+
+    def delete_document(self, document_name: str) -> int:
+        """
+        Deletes every chunk of a document.
+
+        Args:
+            document_name (str): Name of the document.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        with self._write():
+            rows = self._connection.execute(
+                "SELECT row, doc_id FROM chunks WHERE document_name = ? AND deleted = 0",
+                (document_name,),
+            ).fetchall()
+            self._connection.execute(
+                "UPDATE chunks SET deleted = 1 WHERE document_name = ?",
+                (document_name,),
+            )
+            for row, doc_id in rows:
+                self._alive[row] = False
+                self._row_by_id.pop(doc_id, None)
+        logger.info(
+            f"Deleted {len(rows)} chunks of '{document_name}' from local index."
+        )
+        return len(rows)
+
+    def document_chunk_counts(self) -> Dict[str, int]:
+        """
+        Counts the live chunks of every document.
+
+        Returns:
+            Dict[str, int]: Number of chunks per document name.
+        """
+        rows = self._connection.execute(
+            "SELECT document_name, COUNT(*) FROM chunks WHERE deleted = 0 "
+            "GROUP BY document_name"
+        ).fetchall()
+        return {name: count for name, count in rows}
+
+    def document_chunks(self, document_name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the content hash and position of every live chunk of a document.
+
+        Args:
+            document_name (str): Name of the document.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 'chunk_hash' and the position fields by chunk id.
+        """
+        rows = self._connection.execute(
+            "SELECT doc_id, source FROM chunks WHERE document_name = ? AND deleted = 0",
+            (document_name,),
+        ).fetchall()
+        chunks = {}
+        for doc_id, source in rows:
+            fields = json.loads(source)
+            chunks[doc_id] = {
+                field: fields.get(field) for field in ("chunk_hash", *POSITION_FIELDS)
+            }
+        return chunks
+
+    def apply_chunk_changes(
+        self, deleted_ids: List[str], offsets: Dict[str, Dict[str, Any]]
+    ) -> int:
+        """
+        Deletes chunks and updates the position of chunks that moved.
+
+        Args:
+            deleted_ids (List[str]): Ids of the chunks to delete.
+            offsets (Dict[str, Dict[str, Any]]): New position fields by chunk id.
+
+        Returns:
+            int: Number of chunks deleted or updated.
+        """
+        with self._write():
+            deleted = [
+                self._row_by_id.pop(doc_id)
+                for doc_id in deleted_ids
+                if doc_id in self._row_by_id
+            ]
+            moved = {
+                self._row_by_id[doc_id]: fields
+                for doc_id, fields in offsets.items()
+                if doc_id in self._row_by_id
+            }
+            updates = []
+            sources = self._sources(list(moved)) if moved else {}
+            for row, record in sources.items():
+                source = record["_source"]
+                source.update(moved[row])
+                updates.append((json.dumps(source), row))
+            self._connection.executemany(
+                "UPDATE chunks SET deleted = 1 WHERE row = ?",
+                [(row,) for row in deleted],
+            )
+            self._connection.executemany(
+                "UPDATE chunks SET source = ? WHERE row = ?", updates
+            )
+            self._alive[deleted] = False
+        logger.info(
+            f"Deleted {len(deleted)} and moved {len(updates)} chunks in local index."
+        )
+        return len(deleted) + len(updates)
+
+    def sample_chunks(self, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+        """
+        Returns a reproducible random sample of live chunks with their embeddings.
+
+        Args:
+            count (int): Maximum number of chunks.
+            seed (int): Seed of the random choice. Defaults to 0.
+
+        Returns:
+            List[Dict[str, Any]]: Chunks with '_id', 'text' and 'embedding'.
+        """
+        with self._lock:
+            self._maybe_reload()
+            live = np.flatnonzero(self._alive)
+            rows = np.random.default_rng(seed).choice(
+                live, size=min(count, len(live)), replace=False
+            )
+            sources = self._sources(rows.tolist()) if len(rows) else {}
+            return [
+                {
+                    "_id": sources[row]["_id"],
+                    "text": sources[row]["_source"]["text"],
+                    "embedding": np.array(self._vectors[row]),
+                }
+                for row in rows.tolist()
+                if row in sources
+            ]
+
+    def _sources(self, rows: List[int]) -> Dict[int, Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in rows)
+        records = self._connection.execute(
+            f"SELECT row, doc_id, source FROM chunks WHERE row IN ({placeholders})",
+            rows,
+        ).fetchall()
+        return {
+            row: {"_id": doc_id, "_source": json.loads(source)}
+            for row, doc_id, source in records
+        }
+
+    def _posting_array(self, token: str) -> Optional[Tuple[np.ndarray[Any, Any], ...]]:
+        arrays = self._posting_arrays.get(token)
+        if arrays is None:
+            posting = self._postings.get(token)
+            if posting is None:
+                return None
+            arrays = (
+                np.asarray(posting[0], dtype=np.int64),
+                np.asarray(posting[1], dtype=np.float32),
+            )
+            self._posting_arrays[token] = arrays
+        return arrays
+
+    def _filter_mask(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Optional[np.ndarray[Any, Any]]:
+        """Returns the live rows matching resolve_search_filters filters, if any."""
+        conditions = ["deleted = 0"]
+        parameters: List[Any] = []
+        if filters and filters.get("document_names") is not None:
+            names = list(filters["document_names"])
+            conditions.append(f"document_name IN ({', '.join('?' for _ in names)})")
+            parameters.extend(names)
+        if filters and filters.get("page_from") is not None:
+            # Chunks indexed without page numbers match any page range
+            conditions.append("coalesce(json_extract(source, '$.page_end') >= ?, 1)")
+            parameters.append(filters["page_from"])
+        if filters and filters.get("page_to") is not None:
+            conditions.append("coalesce(json_extract(source, '$.page_start') <= ?, 1)")
+            parameters.append(filters["page_to"])
+        if len(conditions) == 1:
+            return None
+        rows = self._connection.execute(
+            f"SELECT row FROM chunks WHERE {' AND '.join(conditions)}", parameters
+        ).fetchall()
+        mask = np.zeros(self._size, dtype=bool)
+        mask[[row for row, in rows]] = True
+        return mask & self._alive
+
+    def _bm25(
+        self,
+        query_text: str,
+        top_k: int,
+        allowed: Optional[np.ndarray[Any, Any]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores live rows with Lucene's BM25 and returns the top_k (row, score).
+
+        Only rows set in `allowed` are scored; term statistics still cover every live
+        row, as with a filter in OpenSearch.
+        """
+        live = int(self._alive.sum())
+        if live == 0:
+            return []
+        lengths = self._doc_lengths[: self._size]
+        average_length = float(lengths[self._alive].mean()) or 1.0
+        scores = np.zeros(self._size, dtype=np.float32)
+        for token in tokenize(query_text):
+            arrays = self._posting_array(token)
+            if arrays is None:
+                continue
+            rows, frequencies = arrays
+            mask = self._alive[rows]
+            rows, frequencies = rows[mask], frequencies[mask]
+            if len(rows) == 0:
+                continue
+            idf = math.log(1 + (live - len(rows) + 0.5) / (len(rows) + 0.5))
+            if allowed is not None:
+                mask = allowed[rows]
+                rows, frequencies = rows[mask], frequencies[mask]
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average_length)
+            np.add.at(scores, rows, idf * frequencies / (frequencies + norms))
+        return _top_rows(scores, top_k, scores > 0)
+
+    def _knn(
+        self,
+        query: np.ndarray[Any, Any],
+        top_k: int,
+        allowed: Optional[np.ndarray[Any, Any]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the top_k (row, score) by L2 distance, scored 1 / (1 + d^2).
+
+        Only rows set in `allowed` are searched, exactly if there are fewer than
+        LOCAL_INDEX_IVF_MIN_ROWS of them.
+        """
+        candidates = np.flatnonzero(self._alive if allowed is None else allowed)
+        if len(candidates) >= LOCAL_INDEX_IVF_MIN_ROWS:
+            if self._centroids is None:
+                self._train_ivf(np.flatnonzero(self._alive))
+            assert self._centroids is not None
+            centroid_distances = ((self._centroids - query) ** 2).sum(axis=1)
+            probes = np.argsort(centroid_distances)[:LOCAL_INDEX_IVF_NPROBE]
+            candidates = candidates[np.isin(self._assignments[candidates], probes)]
+
+        scores = np.zeros(self._size, dtype=np.float32)
+        for start in range(0, len(candidates), KNN_BLOCK_ROWS):
+            block = candidates[start : start + KNN_BLOCK_ROWS]
+            distances = ((self._vectors[block] - query) ** 2).sum(axis=1)
+            scores[block] = 1 / (1 + distances)
+        mask = np.zeros(self._size, dtype=bool)
+        mask[candidates] = True
+        return _top_rows(scores, top_k, mask)
+
+    def _train_ivf(self, rows: np.ndarray[Any, Any], iterations: int = 10) -> None:
+        """Trains IVF centroids with k-means on a sample of rows and assigns every row."""
+        nlist = max(1, int(math.sqrt(len(rows))))
+        rng = np.random.default_rng(0)
+        sample = rng.choice(rows, size=min(len(rows), 64 * nlist), replace=False)
+        data = np.asarray(self._vectors[np.sort(sample)])
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(data, centroids)
+            for cluster in range(nlist):
+                members = data[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+        self._centroids = centroids
+        self._assign(np.flatnonzero(self._alive))
+        logger.info(f"Trained local IVF index with {nlist} lists on {len(data)} rows.")
+
+    def _assign(self, rows: np.ndarray[Any, Any]) -> None:
+        assert self._centroids is not None
+        for start in range(0, len(rows), KNN_BLOCK_ROWS):
+            block = rows[start : start + KNN_BLOCK_ROWS]
+            self._assignments[block] = _nearest(
+                np.asarray(self._vectors[block]), self._centroids
+            )
+
+    @traced("hybrid_search")
+    def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        strategy: Optional[str] = None,
+        weights: Optional[Sequence[float]] = None,
+        text_depth: Optional[int] = None,
+        knn_depth: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Performs a hybrid search combining BM25 and k-NN results.
+
+        Filters are applied before scoring, so both legs only consider matching chunks.
+
+        Args:
+            query_text (str): The text query for text-based search.
+            query_embedding (List[float]): Embedding vector for vector-based search.
+            top_k (int, optional): Number of top results to retrieve. Defaults to 5.
+            strategy (Optional[str]): Fusion strategy. Defaults to HYBRID_FUSION_STRATEGY.
+            weights (Optional[Sequence[float]]): BM25 and k-NN weights. Defaults to HYBRID_SEARCH_WEIGHTS.
+            text_depth (Optional[int]): Candidates fetched by the BM25 leg.
+            knn_depth (Optional[int]): Candidates fetched by the k-NN leg.
+            filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters.
+
+        Returns:
+            List[Dict[str, Any]]: Search results in the same shape as OpenSearch hits.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        text_depth, knn_depth = resolve_leg_depths(top_k, text_depth, knn_depth)
+        with self._lock:
+            self._maybe_reload()
+            allowed = self._filter_mask(filters)
+            legs = [
+                [
+                    {"_id": row, "_score": score}
+                    for row, score in self._bm25(query_text, text_depth, allowed)
+                ],
+                [
+                    {"_id": row, "_score": score}
+                    for row, score in self._knn(query, knn_depth, allowed)
+                ],
+            ]
+            fused = fuse(
+                legs,
+                strategy or HYBRID_FUSION_STRATEGY,
+                weights or HYBRID_SEARCH_WEIGHTS,
+                top_k,
+            )
+            sources = self._sources([hit["_id"] for hit in fused]) if fused else {}
+
+        hits = [
+            {"_index": "local", "_score": hit["_score"], **sources[hit["_id"]]}
+            for hit in fused
+        ]
+        logger.info(
+            f"Local hybrid search completed for query '{query_text}' with top_k={top_k}."
+        )
+        return hits
+
+
+def _top_rows(
+    scores: np.ndarray[Any, Any], top_k: int, mask: np.ndarray[Any, Any]
+) -> List[Tuple[int, float]]:
+    """Returns the top_k (row, score) pairs among rows where mask is set."""
+    rows = np.flatnonzero(mask)
+    if len(rows) > top_k:
+        rows = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return [(int(row), float(scores[row])) for row in rows]
+
+
+def _nearest(
+    data: np.ndarray[Any, Any], centroids: np.ndarray[Any, Any]
+) -> np.ndarray[Any, Any]:
+    """Returns the index of the nearest centroid of every row of data."""
+    distances = (
+        (data**2).sum(axis=1)[:, None]
+        - 2 * data @ centroids.T
+        + (centroids**2).sum(axis=1)[None, :]
+    )
+    nearest: np.ndarray[Any, Any] = np.argmin(distances, axis=1)
+    return nearest
@@ -0,0 +1,606 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from src.constants import METRICS_ENABLED, METRICS_PORT
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+
+# Bucket upper bounds in seconds, from sub-millisecond lookups to long PDF extractions
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+TOKEN_RATE_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 200.0)
+PROMPT_TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with one series per label value set.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float],
+        label_names: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Records one observation.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): Value of every label of the histogram.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        """Returns a copy of every series."""
+        with self._lock:
+            return {
+                key: {**series, "counts": list(series["counts"])}
+                for key, series in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        """Renders the histogram in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, series in sorted(self.snapshot().items()):
+            labels = [f'{name}="{value}"' for name, value in zip(self.label_names, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            bucket_labels = ",".join(labels + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {series['count']}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series['sum']}")
+            lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return lines
+
+
+def estimate_quantile(
+    buckets: Sequence[float], counts: Sequence[int], quantile: float
+) -> Optional[float]:
+    """
+    Estimates a quantile from histogram buckets by linear interpolation, like
+    Prometheus' histogram_quantile.
+
+    Args:
+        buckets (Sequence[float]): Bucket upper bounds.
+        counts (Sequence[int]): Non-cumulative count of every bucket.
+        quantile (float): The quantile, between 0 and 1.
+
+    Returns:
+        Optional[float]: The estimate, or None without observations.
+    """
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    # Beyond the last bucket: report its bound, as Prometheus does
+    return buckets[-1]
+
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Duration of traced pipeline stages.",
+    LATENCY_BUCKETS,
+    ("stage", "status"),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_llm_time_to_first_token_seconds",
+    "Time from sending the prompt to the first streamed token.",
+    LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second",
+    "Generation speed of streamed LLM responses.",
+    TOKEN_RATE_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Estimated tokens of each prompt sent to the LLM, per part.",
+    PROMPT_TOKEN_BUCKETS,
+    ("part",),
+)
+LLM_PREFILL_DURATION = Histogram(
+    "rag_llm_prefill_seconds",
+    "Time Ollama spent evaluating the prompt, as reported in its response.",
+    LATENCY_BUCKETS,
+)
+LLM_PREFILL_TOKENS = Histogram(
+    "rag_llm_prefill_tokens",
+    "Prompt tokens Ollama evaluated; tokens reused from its prompt cache are not "
+    "counted.",
+    PROMPT_TOKEN_BUCKETS,
+)
+HISTOGRAMS = [
+    STAGE_DURATION,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS_PER_SECOND,
+    LLM_PREFILL_DURATION,
+    LLM_PREFILL_TOKENS,
+    PROMPT_TOKENS,
+]
+
+# Functions returning extra gauges for the endpoint, eg. connection pool statistics
+_gauge_sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def register_gauges(prefix: str, source: Callable[[], Dict[str, float]]) -> None:
+    """
+    Exports the values returned by a function as gauges named '<prefix>_<key>'.
+
+    Args:
+        prefix (str): Metric name prefix.
+        source (Callable[[], Dict[str, float]]): Returns the current values.
+    """
+    _gauge_sources[prefix] = source
+
+
+def log_span(
+    stage: str, duration: float, status: str, attributes: Dict[str, Any]
+) -> None:
+    """Writes one span as a structured JSON log line."""
+    record = {
+        "span": stage,
+        "duration_ms": round(duration * 1000, 3),
+        "status": status,
+        **attributes,
+    }
+    logger.info(f"trace {json.dumps(record, default=str)}")
+
+
+def record_span(
+    stage: str, duration: float, status: str = "ok", **attributes: Any
+) -> None:
+    """
+    Records a span whose duration was measured elsewhere.
+
+    Args:
+        stage (str): Name of the stage.
+        duration (float): Duration in seconds.
+        status (str): "ok" or "error".
+        **attributes (Any): Extra fields for the log line.
+    """
+    if METRICS_ENABLED:
+        STAGE_DURATION.observe(duration, stage=stage, status=status)
+        log_span(stage, duration, status, attributes)
+
+
+def record_prompt_usage(usage: Dict[str, int]) -> None:
+    """
+    Records the token usage of a prompt.
+
+    Args:
+        usage (Dict[str, int]): Token counts with 'total', 'context' and 'history'.
+    """
+    if METRICS_ENABLED:
+        for part in ("total", "context", "history"):
+            PROMPT_TOKENS.observe(usage[part], part=part)
+
+
+@contextmanager
+def trace_span(stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times a block of code, recording it in the stage histogram and the log.
+
+    Args:
+        stage (str): Name of the stage.
+        **attributes (Any): Extra fields for the log line; the block may add more to the yielded dict.
+
+    Yields:
+        Dict[str, Any]: The span attributes.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except GeneratorExit:
+        raise  # A traced generator closed early by its consumer
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - start, status, **attributes)
+
+
+def traced(stage: str) -> Callable[[F], F]:
+    """
+    Decorator tracing every call of a function as a span.
+
+    Generator functions are traced until the generator is exhausted or closed, and
+    coroutine functions until they return.
+
+    Args:
+        stage (str): Name of the stage.
+
+    Returns:
+        Callable[[F], F]: The decorator.
+    """
+
+    def decorator(function: F) -> F:
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def generator_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with trace_span(stage):
+                    yield from function(*args, **kwargs)
+
+            return generator_wrapper  # type: ignore[return-value]
+
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with trace_span(stage):
+                    return await function(*args, **kwargs)
+
+            return coroutine_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace_span(stage):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class IteratorTimer:
+    """
+    Accumulates the time spent producing the items of an iterator.
+
+    Only time inside the iterator's `next` counts, not time the consumer spends on an
+    item. In a chain of lazy stages each stage's time includes the stages it pulls
+    from, so the exclusive time of a stage is its time minus its upstream's.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.items = 0
+
+    def wrap(self, iterable: Iterable[T]) -> Iterator[T]:
+        """
+        Passes the items of an iterable through while timing their production.
+
+        Args:
+            iterable (Iterable[T]): The iterable to time.
+
+        Yields:
+            T: The items, unchanged.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds += time.perf_counter() - start
+                return
+            self.seconds += time.perf_counter() - start
+            self.items += 1
+            yield item
+
+
+class LLMStreamRecorder:
+    """
+    Measures a streamed LLM response: time to first token, prefill and decode.
+
+    Feed every chunk to `on_chunk` and call `finish` once the stream ends. The token
+    rate comes from Ollama's eval_count/eval_duration in the final chunk when present,
+    otherwise from the number of streamed chunks. Prefill (prompt evaluation) comes from
+    prompt_eval_count/prompt_eval_duration; Ollama only counts prompt tokens it did not
+    reuse from its cache, so a small prefill on a long prompt shows the prefix reuse.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.chunks = 0
+        self.eval_count: Optional[int] = None
+        self.eval_duration: Optional[float] = None
+        self.prompt_eval_count: Optional[int] = None
+        self.prompt_eval_duration: Optional[float] = None
+        self.load_duration: Optional[float] = None
+
+    def on_chunk(self, chunk: Any) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        eval_count = _field(chunk, "eval_count")
+        eval_duration = _field(chunk, "eval_duration")
+        if eval_count and eval_duration:
+            self.eval_count = int(eval_count)
+            self.eval_duration = float(eval_duration) / 1e9  # Ollama reports ns
+        prompt_eval_duration = _field(chunk, "prompt_eval_duration")
+        if prompt_eval_duration:
+            self.prompt_eval_count = int(_field(chunk, "prompt_eval_count") or 0)
+            self.prompt_eval_duration = float(prompt_eval_duration) / 1e9
+        load_duration = _field(chunk, "load_duration")
+        if load_duration:
+            self.load_duration = float(load_duration) / 1e9
+
+    def finish(self, status: str = "ok") -> Dict[str, Any]:
+        """
+        Records the measurements of the finished stream.
+
+        Args:
+            status (str): "ok", or "error" if the stream failed.
+
+        Returns:
+            Dict[str, Any]: The measurements.
+        """
+        end = time.perf_counter()
+        measurements: Dict[str, Any] = {"chunks": self.chunks}
+        if self.first_token_at is not None:
+            ttft = self.first_token_at - self.start
+            if self.eval_count and self.eval_duration:
+                tokens, seconds = self.eval_count, self.eval_duration
+            else:
+                tokens, seconds = self.chunks, end - self.first_token_at
+            measurements["ttft_ms"] = round(ttft * 1000, 3)
+            measurements["tokens"] = tokens
+            if METRICS_ENABLED:
+                LLM_TIME_TO_FIRST_TOKEN.observe(ttft)
+            if seconds > 0:
+                measurements["tokens_per_second"] = round(tokens / seconds, 2)
+                if METRICS_ENABLED:
+                    LLM_TOKENS_PER_SECOND.observe(tokens / seconds)
+        if self.eval_duration is not None:
+            measurements["decode_ms"] = round(self.eval_duration * 1000, 3)
+        if self.prompt_eval_duration is not None:
+            measurements["prefill_ms"] = round(self.prompt_eval_duration * 1000, 3)
+            measurements["prefill_tokens"] = self.prompt_eval_count
+            if METRICS_ENABLED:
+                LLM_PREFILL_DURATION.observe(self.prompt_eval_duration)
+                LLM_PREFILL_TOKENS.observe(self.prompt_eval_count or 0)
+        if self.load_duration is not None:
+            measurements["load_ms"] = round(self.load_duration * 1000, 3)
+        record_span("llm_stream", end - self.start, status, **measurements)
+        return measurements
+
+
+def _field(chunk: Any, name: str) -> Any:
+    """Reads a field of a stream chunk, which may be a dict or a response object."""
+    if isinstance(chunk, dict):
+        return chunk.get(name)
+    return getattr(chunk, name, None)
+
+
+def record_llm_stream(stream: Any) -> Iterator[Any]:
+    """
+    Passes a synchronous LLM stream through while recording its metrics.
+
+    Args:
+        stream (Any): The chunk iterator returned by `ollama.chat(stream=True)`.
+
+    Yields:
+        Any: The chunks, unchanged.
+    """
+    recorder = LLMStreamRecorder()
+    status = "ok"
+    try:
+        for chunk in stream:
+            recorder.on_chunk(chunk)
+            yield chunk
+    except GeneratorExit:
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        recorder.finish(status)
+
+
+def render_metrics() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for prefix, source in list(_gauge_sources.items()):
+        try:
+            values = source()
+        except Exception as e:
+            logger.warning(f"Could not collect {prefix} gauges: {e}")
+            continue
+        for key, value in values.items():
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Scrapes would flood the application log
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """
+    Serves /metrics on localhost from a daemon thread, once per process.
+
+    Args:
+        port (int): Port to listen on. Defaults to METRICS_PORT.
+    """
+    global _server
+    if not METRICS_ENABLED:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+            return
+        threading.Thread(
+            target=_server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+    logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+
+def summarize_stages() -> List[Dict[str, Any]]:
+    """
+    Summarises the stage histogram for display.
+
+    Returns:
+        List[Dict[str, Any]]: One row per stage with count, mean, p50, p95 and errors.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for (stage, status), series in STAGE_DURATION.snapshot().items():
+        row = rows.setdefault(
+            stage,
+            {
+                "stage": stage,
+                "count": 0,
+                "errors": 0,
+                "sum": 0.0,
+                "counts": [0] * len(STAGE_DURATION.buckets),
+            },
+        )
+        row["count"] += series["count"]
+        row["sum"] += series["sum"]
+        row["counts"] = [a + b for a, b in zip(row["counts"], series["counts"])]
+        if status == "error":
+            row["errors"] += series["count"]
+
+    summaries = []
+    for row in sorted(rows.values(), key=lambda row: row["stage"]):
+        p50 = estimate_quantile(STAGE_DURATION.buckets, row["counts"], 0.5)
+        p95 = estimate_quantile(STAGE_DURATION.buckets, row["counts"], 0.95)
+        summaries.append(
+            {
+                "stage": row["stage"],
+                "count": row["count"],
+                "errors": row["errors"],
+                "mean_ms": row["sum"] / row["count"] * 1000 if row["count"] else None,
+                "p50_ms": p50 * 1000 if p50 is not None else None,
+                "p95_ms": p95 * 1000 if p95 is not None else None,
+            }
+        )
+    return summaries
+
+
+def summarize_llm() -> Dict[str, Optional[float]]:
+    """
+    Summarises time to first token, prefill and generation speed for display.
+
+    Returns:
+        Dict[str, Optional[float]]: Median and p95 TTFT in ms, median prefill time in
+            ms and prefill tokens, and median tokens/sec.
+    """
+    ttft = LLM_TIME_TO_FIRST_TOKEN.snapshot().get((), {})
+    rate = LLM_TOKENS_PER_SECOND.snapshot().get((), {})
+    prefill = LLM_PREFILL_DURATION.snapshot().get((), {})
+    prefill_tokens = LLM_PREFILL_TOKENS.snapshot().get((), {})
+    ttft_counts = ttft.get("counts", [])
+    rate_counts = rate.get("counts", [])
+    p50 = estimate_quantile(LLM_TIME_TO_FIRST_TOKEN.buckets, ttft_counts, 0.5)
+    p95 = estimate_quantile(LLM_TIME_TO_FIRST_TOKEN.buckets, ttft_counts, 0.95)
+    prefill_p50 = estimate_quantile(
+        LLM_PREFILL_DURATION.buckets, prefill.get("counts", []), 0.5
+    )
+    return {
+        "responses": ttft.get("count", 0),
+        "ttft_p50_ms": p50 * 1000 if p50 is not None else None,
+        "ttft_p95_ms": p95 * 1000 if p95 is not None else None,
+        "prefill_p50_ms": prefill_p50 * 1000 if prefill_p50 is not None else None,
+        "prefill_tokens_p50": estimate_quantile(
+            LLM_PREFILL_TOKENS.buckets, prefill_tokens.get("counts", []), 0.5
+        ),
+        "tokens_per_second_p50": estimate_quantile(
+            LLM_TOKENS_PER_SECOND.buckets, rate_counts, 0.5
+        ),
+    }
@@ -0,0 +1,233 @@
+"""
+Reindexes the documents index into a new index profile behind an alias.
+
+Usage:
+    python -m src.migrate_index --profile high-recall
+    python -m src.migrate_index --list
+
+Searches keep being served by the current index until the alias is swapped atomically
+to the new one. Writes to the current index are blocked while it is copied, so no
+chunk indexed during the migration can be lost; uploads fail until it completes.
+Indices created with INDEX_EMBEDDINGS_IN_SOURCE = False cannot be migrated, as the
+copy is made from _source.
+"""
+
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from opensearchpy import OpenSearch
+
+from src.constants import EMBEDDING_DIMENSION, OPENSEARCH_INDEX
+from src.ingestion import (
+    create_index,
+    load_index_profiles,
+    profile_requires_training,
+    source_has_embeddings,
+)
+from src.opensearch import get_opensearch_client, resolve_index_names, set_index_exists
+from src.query_cache import mark_index_changed
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of long-running reindex and training tasks
+POLL_INTERVAL = 2.0
+
+
+def train_model(
+    client: OpenSearch,
+    model_id: str,
+    profile: Dict[str, Any],
+    training_index: str,
+) -> None:
+    """
+    Trains the k-NN model an IVF or PQ profile needs on the vectors of an index.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        model_id (str): ID to create the model under.
+        profile (Dict[str, Any]): Profile settings.
+        training_index (str): Index whose 'embedding' vectors are used for training.
+    """
+    body = {
+        "training_index": training_index,
+        "training_field": "embedding",
+        "dimension": EMBEDDING_DIMENSION,
+        "max_training_vector_count": profile.get("max_training_vector_count", 20000),
+        "description": profile.get("description", ""),
+        "method": profile["method"],
+    }
+    client.transport.perform_request(
+        "POST", f"/_plugins/_knn/models/{model_id}/_train", body=body
+    )
+    logger.info(f"Training k-NN model {model_id} on {training_index}.")
+    while True:
+        model = client.transport.perform_request(
+            "GET", f"/_plugins/_knn/models/{model_id}"
+        )
+        if model["state"] == "created":
+            logger.info(f"k-NN model {model_id} trained.")
+            return
+        if model["state"] == "failed":
+            raise RuntimeError(
+                f"Training k-NN model {model_id} failed: {model.get('error')}"
+            )
+        time.sleep(POLL_INTERVAL)
+
+
+def reindex(client: OpenSearch, source: List[str], target: str) -> Dict[str, Any]:
+    """
+    Copies every document of the source indices into the target index.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        source (List[str]): Concrete source indices.
+        target (str): Target index.
+
+    Returns:
+        Dict[str, Any]: Response of the completed reindex task.
+    """
+    response = client.reindex(
+        body={"source": {"index": source}, "dest": {"index": target}},
+        wait_for_completion=False,
+        refresh=True,
+    )
+    task_id = response["task"]
+    while True:
+        task = client.tasks.get(task_id=task_id)
+        status = task["task"]["status"]
+        logger.info(
+            f"Reindexed {status['created'] + status['updated']}/{status['total']} "
+            f"documents into {target}."
+        )
+        if task["completed"]:
+            break
+        time.sleep(POLL_INTERVAL)
+
+    result: Dict[str, Any] = task.get("response", {})
+    if task.get("error") or result.get("failures"):
+        raise RuntimeError(
+            f"Reindex into {target} failed: {task.get('error') or result['failures']}"
+        )
+    return result
+
+
+def set_write_block(client: OpenSearch, indices: List[str], blocked: bool) -> None:
+    """Blocks or unblocks writes to indices while leaving them searchable."""
+    client.indices.put_settings(
+        index=",".join(indices), body={"index": {"blocks": {"write": blocked}}}
+    )
+
+
+def migrate_index(client: OpenSearch, profile_name: str, keep_old: bool = False) -> str:
+    """
+    Reindexes OPENSEARCH_INDEX into a new index built with an index profile.
+
+    The new index is named '<OPENSEARCH_INDEX>-<profile>-<timestamp>' and
+    OPENSEARCH_INDEX becomes an alias of it. If OPENSEARCH_INDEX is still a concrete
+    index, it is removed in the same atomic alias update that creates the alias.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        profile_name (str): Name of the target index profile.
+        keep_old (bool): Keep the previous indices when OPENSEARCH_INDEX is already an alias.
+
+    Returns:
+        str: Name of the new index.
+    """
+    profiles = load_index_profiles()
+    if profile_name not in profiles:
+        raise ValueError(
+            f"Unknown index profile '{profile_name}', expected one of {sorted(profiles)}."
+        )
+    profile = profiles[profile_name]
+
+    source = resolve_index_names(client)
+    if not source:
+        raise RuntimeError(f"Index {OPENSEARCH_INDEX} does not exist.")
+    if not source_has_embeddings(client):
+        # Reindexing copies _source, so the new index would have no vectors
+        raise RuntimeError(
+            f"{OPENSEARCH_INDEX} keeps no embeddings in _source and cannot be "
+            "reindexed; delete it and ingest the documents again instead."
+        )
+    is_alias = source != [OPENSEARCH_INDEX]
+    target = f"{OPENSEARCH_INDEX}-{profile_name}-{time.strftime('%Y%m%d%H%M%S')}"
+
+    model_id: Optional[str] = None
+    if profile_requires_training(profile):
+        model_id = target
+        train_model(client, model_id, profile, ",".join(source))
+
+    create_index(client, profile_name, index_name=target, model_id=model_id)
+    set_write_block(client, source, True)
+    try:
+        result = reindex(client, source, target)
+        source_count = client.count(index=",".join(source))["count"]
+        target_count = client.count(index=target)["count"]
+        if source_count != target_count:
+            raise RuntimeError(
+                f"Reindex copied {target_count} of {source_count} documents."
+            )
+
+        actions: List[Dict[str, Any]] = [
+            {"add": {"index": target, "alias": OPENSEARCH_INDEX}}
+        ]
+        if is_alias:
+            actions += [
+                {"remove": {"index": index, "alias": OPENSEARCH_INDEX}}
+                for index in source
+            ]
+        else:
+            actions.append({"remove_index": {"index": OPENSEARCH_INDEX}})
+        client.indices.update_aliases(body={"actions": actions})
+    except Exception:
+        set_write_block(client, source, False)
+        client.indices.delete(index=target)
+        raise
+
+    set_index_exists(True)
+    set_index_exists(True, target)
+    mark_index_changed()
+    logger.info(
+        f"Migrated {result.get('total', 0)} documents to {target} "
+        f"(profile '{profile_name}') in {result.get('took', 0) / 1000:.1f}s."
+    )
+
+    if is_alias:
+        if keep_old:
+            set_write_block(client, source, False)
+        else:
+            client.indices.delete(index=",".join(source))
+            logger.info(f"Deleted previous index {', '.join(source)}.")
+    return target
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--profile", help="Name of the target index profile.")
+    parser.add_argument(
+        "--keep-old",
+        action="store_true",
+        help="Keep the previous index when the documents index is already an alias.",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the available index profiles."
+    )
+    args = parser.parse_args()
+
+    if args.list or not args.profile:
+        for name, profile in load_index_profiles().items():
+            print(f"{name}: {profile.get('description', '')}")
+        return
+
+    target = migrate_index(get_opensearch_client(), args.profile, args.keep_old)
+    print(f"{OPENSEARCH_INDEX} now points to {target}.")
+
+
+if __name__ == "__main__":
+    main()
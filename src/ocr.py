@@ -1,50 +1,192 @@
 import io
 import logging
-from typing import Optional
+import multiprocessing
+import os
+from collections import deque
+from multiprocessing.pool import AsyncResult, Pool
+from typing import Deque, Iterator, Optional, Tuple
 
-import pytesseract
-from PIL import Image
 from PyPDF2 import PageObject, PdfReader
 
-from src.constants import LOG_FILE_PATH
+from src.constants import LOG_FILE_PATH, PDF_EXTRACTION_WORKERS, PDF_PAGE_TIMEOUT
+from src.metrics import traced
 from src.utils import clean_text, setup_logging
 
 # Configure logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Documents shorter than this are extracted in-process; starting a pool costs more
+MIN_PAGES_FOR_POOL = 4
 
-def extract_text_from_pdf(file_path: str) -> str:
+# Reader reused by a worker process across the pages of the same file
+_worker_reader: Optional[Tuple[Tuple[str, float], PdfReader]] = None
+
+
+@traced("extract_text_from_pdf")
+def extract_text_from_pdf(
+    file_path: str,
+    max_workers: Optional[int] = None,
+    page_timeout: Optional[float] = None,
+) -> str:
     """
     Extracts text from a PDF file. Uses OCR if text extraction fails for any page.
 
     Args:
         file_path (str): Path to the PDF file.
+        max_workers (Optional[int]): Number of extraction processes. Defaults to PDF_EXTRACTION_WORKERS.
+        page_timeout (Optional[float]): Seconds to wait for a page before skipping it. Defaults to PDF_PAGE_TIMEOUT.
 
     Returns:
         str: Extracted and cleaned text from the PDF.
     """
-    text = ""
+    text = "".join(iter_pdf_pages(file_path, max_workers, page_timeout))
+    cleaned_text = clean_text(text)
+    logger.info(f"Completed text extraction for {file_path}")
+    return cleaned_text
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """
+    Counts the pages of a PDF file without extracting them.
+
+    Args:
+        file_path (str): Path to the PDF file.
+
+    Returns:
+        int: Number of pages.
+    """
+    with open(file_path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+def iter_pdf_pages(
+    file_path: str,
+    max_workers: Optional[int] = None,
+    page_timeout: Optional[float] = None,
+    start_page: int = 0,
+) -> Iterator[str]:
+    """
+    Yields the raw text of each page of a PDF file in page order.
+
+    Pages are fanned out across a process pool, with at most two pages per worker in
+    flight. A page that is not finished `page_timeout` seconds after it becomes the next
+    page to yield is skipped; the pool is then replaced, so the worker stuck on it does
+    not hold up the remaining pages, and the unfinished pages are submitted again.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        max_workers (Optional[int]): Number of extraction processes. Defaults to PDF_EXTRACTION_WORKERS.
+        page_timeout (Optional[float]): Seconds to wait for a page before skipping it. Defaults to PDF_PAGE_TIMEOUT.
+        start_page (int): Number of the first page to extract. Defaults to 0.
+
+    Yields:
+        str: Extracted text of each page, or an empty string for pages that failed.
+    """
+    workers = max_workers or PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+    timeout = page_timeout if page_timeout is not None else PDF_PAGE_TIMEOUT
+
     with open(file_path, "rb") as f:
         pdf_reader = PdfReader(f)
+        page_count = len(pdf_reader.pages)
         logger.info(f"Opened PDF file for text extraction: {file_path}")
 
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
+        if workers <= 1 or page_count - start_page < MIN_PAGES_FOR_POOL:
+            for page_num in range(start_page, page_count):
+                yield extract_page_text(pdf_reader, page_num)
+            return
+
+    processes = min(workers, page_count - start_page)
+    pool = _start_pool(processes)
+    pending: Deque[Tuple[int, "AsyncResult[str]"]] = deque()
+    next_page = start_page
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < 2 * workers:
+                pending.append(
+                    (
+                        next_page,
+                        pool.apply_async(
+                            _extract_page_in_worker, (file_path, next_page)
+                        ),
+                    )
+                )
+                next_page += 1
+
+            page_num, result = pending.popleft()
             try:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-                    logger.info(f"Extracted text from page {page_num} without OCR.")
-                else:
-                    logger.info(f"No text found on page {page_num}; attempting OCR.")
-                    text += extract_text_from_images(page)
-            except Exception as e:
-                logger.error(f"Error processing page {page_num}: {e}")
+                yield result.get(timeout=timeout)
+            except multiprocessing.TimeoutError:
+                logger.error(
+                    f"Timed out after {timeout}s extracting page {page_num}; skipping it "
+                    "and restarting the extraction workers."
+                )
+                finished = [result.ready() for _, result in pending]
+                pool.terminate()
+                pool.join()
+                pool = _start_pool(processes)
+                pending = deque(
+                    (
+                        num,
+                        (
+                            queued
+                            if done
+                            else pool.apply_async(
+                                _extract_page_in_worker, (file_path, num)
+                            )
+                        ),
+                    )
+                    for (num, queued), done in zip(pending, finished)
+                )
+                yield ""
+    finally:
+        pool.terminate()
+        pool.join()
 
-    cleaned_text = clean_text(text)
-    logger.info(f"Completed text extraction for {file_path}")
-    return cleaned_text
+
+def _start_pool(processes: int) -> Pool:
+    """Starts a pool of page extraction processes."""
+    # Spawned workers do not inherit the torch/model state of the parent process
+    return multiprocessing.get_context("spawn").Pool(processes=processes)
+
+
+def extract_page_text(pdf_reader: PdfReader, page_num: int) -> str:
+    """
+    Extracts the text of a single PDF page, falling back to OCR for image-only pages.
+
+    Args:
+        pdf_reader (PdfReader): Reader of the open PDF file.
+        page_num (int): Zero-based page number.
+
+    Returns:
+        str: Extracted text of the page, or an empty string if processing fails.
+    """
+    try:
+        page = pdf_reader.pages[page_num]
+        page_text = page.extract_text()
+        if page_text:
+            logger.info(f"Extracted text from page {page_num} without OCR.")
+            return page_text
+        logger.info(f"No text found on page {page_num}; attempting OCR.")
+        return extract_text_from_images(page)
+    except Exception as e:
+        logger.error(f"Error processing page {page_num}: {e}")
+        return ""
+
+
+def _extract_page_in_worker(file_path: str, page_num: int) -> str:
+    """
+    Extraction worker entry point; reuses one reader for consecutive pages of a file.
+    """
+    global _worker_reader
+    try:
+        file_key = (file_path, os.path.getmtime(file_path))
+        if _worker_reader is None or _worker_reader[0] != file_key:
+            _worker_reader = (file_key, PdfReader(file_path))
+    except Exception as e:
+        logger.error(f"Error opening {file_path} in extraction worker: {e}")
+        return ""
+    return extract_page_text(_worker_reader[1], page_num)
 
 
 def extract_text_from_images(page: PageObject) -> str:
@@ -57,13 +199,16 @@ def extract_text_from_images(page: PageObject) -> str:
     Returns:
         str: Extracted text from images using OCR.
     """
-    text = ""
+    # Only documents with images need the OCR libraries, so they are loaded here
+    import pytesseract
+    from PIL import Image
+
+    parts = []
     for image_file_object in page.images:
         try:
             image = Image.open(io.BytesIO(image_file_object.data))
-            ocr_text = pytesseract.image_to_string(image)
-            text += ocr_text
+            parts.append(pytesseract.image_to_string(image))
             logger.info("Extracted text from image using OCR.")
         except Exception as e:
             logger.error(f"Error processing image for OCR: {e}")
-    return text
+    return "".join(parts)
@@ -0,0 +1,264 @@
+"""
+Exports the embedding model to ONNX with dynamic int8 quantization.
+
+Usage:
+    python -m src.onnx_embeddings
+    python -m src.onnx_embeddings --force
+
+The transformer is exported from the SentenceTransformer model at EMBEDDING_MODEL_PATH,
+its weights are quantized to int8, and the tokenizer and pooling settings are saved
+next to it under EMBEDDING_ONNX_DIR. With EMBEDDING_BACKEND = "onnx" the app exports
+the model on first use if it is missing; this command does it ahead of time.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.constants import EMBEDDING_MODEL_PATH, EMBEDDING_ONNX_DIR
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model_int8.onnx"
+# Inputs a Hugging Face encoder may take, in the order they are exported
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+SUPPORTED_POOLING = ("mean", "cls", "max", "mean_sqrt_len_tokens")
+
+
+def get_onnx_model_dir(model_path: str = EMBEDDING_MODEL_PATH) -> str:
+    """
+    Returns the directory holding the exported copy of a model.
+
+    Args:
+        model_path (str): Path or Hugging Face name of the SentenceTransformer model.
+
+    Returns:
+        str: Directory under EMBEDDING_ONNX_DIR.
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", model_path.strip("/"))
+    return os.path.join(EMBEDDING_ONNX_DIR, name)
+
+
+def _cpu_has_vnni() -> bool:
+    """Tells whether the CPU has int8 dot-product instructions (VNNI)."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_vnni" in flags or "avx_vnni" in flags
+
+
+def export_onnx_model(
+    model_path: str = EMBEDDING_MODEL_PATH, output_dir: Optional[str] = None
+) -> str:
+    """
+    Exports a SentenceTransformer model to ONNX and quantizes its weights to int8.
+
+    Needs torch, sentence_transformers and onnx, which are only imported here.
+
+    Args:
+        model_path (str): Path or Hugging Face name of the model. Defaults to EMBEDDING_MODEL_PATH.
+        output_dir (Optional[str]): Target directory. Defaults to get_onnx_model_dir(model_path).
+
+    Returns:
+        str: The directory of the exported model.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    output_dir = output_dir or get_onnx_model_dir(model_path)
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_path, device="cpu")
+    transformer = model[0]
+    pooling = next(module for module in model if isinstance(module, Pooling))
+    pooling_mode = pooling.get_pooling_mode_str()
+    if pooling_mode not in SUPPORTED_POOLING:
+        raise ValueError(f"Pooling mode '{pooling_mode}' is not supported for ONNX.")
+
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["Export sample"], return_tensors="pt")
+    input_names = [name for name in INPUT_NAMES if name in sample]
+
+    class TokenEmbeddings(torch.nn.Module):  # type: ignore[misc]
+        def __init__(self, encoder: torch.nn.Module) -> None:
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+            return self.encoder(**dict(zip(input_names, inputs)))[0]
+
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+    logger.info(f"Exporting {model_path} to ONNX in {output_dir}.")
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    # Without VNNI, int8 products can saturate; 7-bit weights avoid it
+    quantize_dynamic(
+        fp32_path,
+        os.path.join(output_dir, MODEL_FILE),
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        reduce_range=not _cpu_has_vnni(),
+    )
+    os.remove(fp32_path)
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        "source_model": model_path,
+        "inputs": input_names,
+        "pooling": pooling_mode,
+        "normalize": any(isinstance(module, Normalize) for module in model),
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Exported int8 ONNX embedding model to {output_dir}.")
+    return output_dir
+
+
+class OnnxSentenceEncoder:
+    """
+    Runs an exported, int8-quantized SentenceTransformer model with ONNX Runtime on CPU.
+
+    Provides the parts of the SentenceTransformer interface the app uses: `encode`,
+    `get_sentence_embedding_dimension`, `tokenizer` and `max_seq_length`.
+    """
+
+    def __init__(self, model_dir: str, threads: int = 0) -> None:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r") as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = int(self.config["max_seq_length"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        logger.info(
+            f"Loaded ONNX embedding model from {model_dir} ({threads} threads)."
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.config["dimension"])
+
+    def _pool(
+        self,
+        token_embeddings: np.ndarray[Any, Any],
+        attention_mask: np.ndarray[Any, Any],
+    ) -> np.ndarray[Any, Any]:
+        mode = self.config["pooling"]
+        if mode == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        if mode == "max":
+            return np.asarray(np.where(mask > 0, token_embeddings, -1e9).max(axis=1))
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return np.asarray(
+            summed / (np.sqrt(counts) if mode == "mean_sqrt_len_tokens" else counts)
+        )
+
+    def encode(
+        self, sentences: List[str], batch_size: int = 32, **kwargs: Any
+    ) -> np.ndarray[Any, np.dtype[np.float32]]:
+        """
+        Embeds texts batch by batch.
+
+        Args:
+            sentences (List[str]): The texts to embed.
+            batch_size (int): Number of texts per inference call. Defaults to 32.
+            **kwargs (Any): Accepted for compatibility with SentenceTransformer.encode.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per text.
+        """
+        embeddings = np.empty(
+            (len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32
+        )
+        for start in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(
+                sentences[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            inputs = {
+                name: encoded[name].astype(np.int64) for name in self.config["inputs"]
+            }
+            token_embeddings = self.session.run(None, inputs)[0]
+            pooled = self._pool(token_embeddings, encoded["attention_mask"])
+            if self.config["normalize"]:
+                pooled /= np.clip(
+                    np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None
+                )
+            embeddings[start : start + len(pooled)] = pooled
+        return embeddings
+
+
+def load_onnx_encoder(threads: int = 0) -> OnnxSentenceEncoder:
+    """
+    Loads the ONNX copy of EMBEDDING_MODEL_PATH, exporting it first if it is missing.
+
+    Args:
+        threads (int): Intra-op threads for inference; 0 lets ONNX Runtime decide.
+
+    Returns:
+        OnnxSentenceEncoder: The loaded encoder.
+    """
+    model_dir = get_onnx_model_dir()
+    if not os.path.exists(os.path.join(model_dir, CONFIG_FILE)):
+        export_onnx_model(EMBEDDING_MODEL_PATH, model_dir)
+    return OnnxSentenceEncoder(model_dir, threads)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Export again even if an exported model exists.",
+    )
+    args = parser.parse_args()
+
+    model_dir = get_onnx_model_dir()
+    if os.path.exists(os.path.join(model_dir, CONFIG_FILE)) and not args.force:
+        print(f"Already exported: {model_dir} (use --force to export again)")
+        return
+    print(f"Exported to {export_onnx_model(EMBEDDING_MODEL_PATH, model_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,454 @@
 import logging
-from typing import Any, Dict, List
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from opensearchpy import OpenSearch
+import numpy as np
 
-from src.constants import OPENSEARCH_HOST, OPENSEARCH_INDEX, OPENSEARCH_PORT
+from src.constants import (
+    HYBRID_FUSION_MODE,
+    HYBRID_FUSION_STRATEGY,
+    HYBRID_SEARCH_WEIGHTS,
+    OPENSEARCH_HEALTH_CHECK_TTL,
+    OPENSEARCH_HOST,
+    OPENSEARCH_HTTP_COMPRESS,
+    OPENSEARCH_INDEX,
+    OPENSEARCH_KEEP_ALIVE,
+    OPENSEARCH_POOL_MAXSIZE,
+    OPENSEARCH_PORT,
+)
+from src.fusion import fuse, resolve_leg_depths
+from src.metrics import register_gauges, traced
 from src.utils import setup_logging
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the client's json serializer is used instead
+    orjson = None  # type: ignore
+
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
+
 # Initialize logger
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def get_opensearch_client() -> OpenSearch:
+# Process-wide client shared by every caller, created on first use
+_client: Optional["OpenSearch"] = None
+_client_lock = threading.Lock()
+_client_requests = 0
+
+# Cached health checks: key -> (result, time of the check)
+_health_cache: Dict[str, Tuple[Any, float]] = {}
+
+
+def _to_json(data: Any) -> Any:
+    """Converts the values orjson cannot write itself, eg. non-contiguous arrays."""
+    if isinstance(data, np.ndarray):
+        return data.tolist()
+    if isinstance(data, np.generic):
+        return data.item()
+    raise TypeError(f"Unable to serialize {data!r} (type: {type(data)})")
+
+
+class OrjsonSerializer:
+    """
+    Serializes request and response bodies with orjson.
+
+    Embeddings given as numpy float32 rows are written straight from the array, with
+    the shortest digits that read back as the same float32, instead of being converted
+    to lists of Python floats and written with float64 precision.
     """
-    Initializes and returns an OpenSearch client.
+
+    mimetype = "application/json"
+
+    def dumps(self, data: Any) -> str:
+        if isinstance(data, str):
+            return data
+        try:
+            return orjson.dumps(
+                data, default=_to_json, option=orjson.OPT_SERIALIZE_NUMPY
+            ).decode("utf-8")
+        except TypeError as e:
+            from opensearchpy.exceptions import SerializationError
+
+            raise SerializationError(data, e)
+
+    def loads(self, s: str) -> Any:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            from opensearchpy.exceptions import SerializationError
+
+            raise SerializationError(s, e)
+
+
+def create_opensearch_client(fast_json: bool = True) -> "OpenSearch":
+    """
+    Creates a new OpenSearch client with a tuned connection pool.
+
+    Args:
+        fast_json (bool): Serialize bodies with orjson if it is installed. Defaults to True.
 
     Returns:
         OpenSearch: Configured OpenSearch client instance.
     """
+    from opensearchpy import OpenSearch
+
+    options: Dict[str, Any] = {}
+    if fast_json and orjson is not None:
+        options["serializer"] = OrjsonSerializer()
     client = OpenSearch(
         hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
-        http_compress=True,
+        http_compress=OPENSEARCH_HTTP_COMPRESS,
+        pool_maxsize=OPENSEARCH_POOL_MAXSIZE,
+        headers={"Connection": "keep-alive" if OPENSEARCH_KEEP_ALIVE else "close"},
         timeout=30,
         max_retries=3,
         retry_on_timeout=True,
+        **options,
+    )
+    logger.info(
+        f"OpenSearch client initialized with pool size {OPENSEARCH_POOL_MAXSIZE}."
     )
-    logger.info("OpenSearch client initialized.")
     return client
 
 
+def get_opensearch_client() -> "OpenSearch":
+    """
+    Returns the shared OpenSearch client, initializing it on first use.
+
+    The client is thread-safe and keeps its HTTP connections open, so every search,
+    bulk request and page render in the process reuses the same connection pool.
+
+    Returns:
+        OpenSearch: Configured OpenSearch client instance.
+    """
+    global _client, _client_requests
+    with _client_lock:
+        _client_requests += 1
+        if _client is None:
+            _client = create_opensearch_client()
+        return _client
+
+
+def _cached_check(key: str, check: Callable[[], Any]) -> Any:
+    """
+    Runs a health check at most once every OPENSEARCH_HEALTH_CHECK_TTL seconds.
+
+    Args:
+        key (str): Cache key of the check.
+        check (Callable[[], Any]): Function performing the check.
+
+    Returns:
+        Any: The fresh or cached result of the check.
+    """
+    cached = _health_cache.get(key)
+    if (
+        cached is not None
+        and time.monotonic() - cached[1] < OPENSEARCH_HEALTH_CHECK_TTL
+    ):
+        return cached[0]
+    result = check()
+    _health_cache[key] = (result, time.monotonic())
+    return result
+
+
+def index_exists(client: "OpenSearch", index: str = OPENSEARCH_INDEX) -> bool:
+    """
+    Checks whether an index exists, reusing recent answers.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        index (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        bool: True if the index exists.
+    """
+    return bool(
+        _cached_check(
+            f"index_exists:{index}", lambda: client.indices.exists(index=index)
+        )
+    )
+
+
+def set_index_exists(exists: bool, index: str = OPENSEARCH_INDEX) -> None:
+    """
+    Records the existence of an index after creating or deleting it.
+
+    Args:
+        exists (bool): Whether the index now exists.
+        index (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+    """
+    _health_cache[f"index_exists:{index}"] = (exists, time.monotonic())
+
+
+def resolve_index_names(
+    client: "OpenSearch", name: str = OPENSEARCH_INDEX
+) -> List[str]:
+    """
+    Returns the concrete indices behind a name, which may be an index or an alias.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+        name (str): Index or alias name. Defaults to OPENSEARCH_INDEX.
+
+    Returns:
+        List[str]: The concrete index names; empty if nothing exists under the name.
+    """
+    if client.indices.exists_alias(name=name):
+        return sorted(client.indices.get_alias(name=name).keys())
+    if client.indices.exists(index=name):
+        return [name]
+    return []
+
+
+def get_cluster_health(client: "OpenSearch") -> Dict[str, Any]:
+    """
+    Returns the cluster health, reusing recent answers.
+
+    Args:
+        client (OpenSearch): OpenSearch client instance.
+
+    Returns:
+        Dict[str, Any]: Response of the cluster health API.
+    """
+    health: Dict[str, Any] = _cached_check(
+        "cluster_health", lambda: client.cluster.health()
+    )
+    return health
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """
+    Reports how well the shared client reuses its connections.
+
+    Returns:
+        Dict[str, Any]: Number of client lookups, HTTP requests sent, connections opened,
+        and the share of requests that reused an open connection.
+    """
+    stats: Dict[str, Any] = {
+        "client_requests": _client_requests,
+        "http_requests": 0,
+        "connections_opened": 0,
+    }
+    if _client is not None:
+        for connection in _client.transport.connection_pool.connections:
+            pool = getattr(connection, "pool", None)
+            if pool is not None:
+                stats["http_requests"] += pool.num_requests
+                stats["connections_opened"] += pool.num_connections
+    requests = stats["http_requests"]
+    stats["connection_reuse_ratio"] = (
+        1 - stats["connections_opened"] / requests if requests else 0.0
+    )
+    return stats
+
+
+def build_filter_clauses(filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Builds the filter clauses restricting a search to some documents and pages.
+
+    A chunk matches a page range if any of its pages lies in it. Chunks indexed
+    without page numbers, before they were recorded, match any page range.
+
+    Args:
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters, with
+            optional 'document_names', 'page_from' and 'page_to'.
+
+    Returns:
+        List[Dict[str, Any]]: Filter clauses; empty if nothing is filtered.
+    """
+    if not filters:
+        return []
+    clauses: List[Dict[str, Any]] = []
+    if filters.get("document_names") is not None:
+        clauses.append({"terms": {"document_name": list(filters["document_names"])}})
+    if filters.get("page_from") is not None:
+        clauses.append(_range_or_missing("page_end", {"gte": filters["page_from"]}))
+    if filters.get("page_to") is not None:
+        clauses.append(_range_or_missing("page_start", {"lte": filters["page_to"]}))
+    return clauses
+
+
+def _range_or_missing(field: str, bounds: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds a clause matching documents with `field` in `bounds` or without it."""
+    return {
+        "bool": {
+            "should": [
+                {"range": {field: bounds}},
+                {"bool": {"must_not": {"exists": {"field": field}}}},
+            ],
+            "minimum_should_match": 1,
+        }
+    }
+
+
+def build_text_query(
+    query_text: str, filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Builds the BM25 leg of a hybrid search.
+
+    Args:
+        query_text (str): The text query.
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters.
+
+    Returns:
+        Dict[str, Any]: The match query, within a bool query if filtered.
+    """
+    query = {"match": {"text": {"query": query_text}}}
+    clauses = build_filter_clauses(filters)
+    if clauses:
+        return {"bool": {"must": [query], "filter": clauses}}
+    return query
+
+
+def build_knn_query(
+    query_embedding: List[float], k: int, filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Builds the k-NN leg of a hybrid search.
+
+    Filters are applied inside the knn clause, so the engine only searches the vectors
+    of matching chunks (exactly, if few match) and still returns k of them, instead of
+    filtering the k nearest neighbours of the whole index afterwards.
+
+    Args:
+        query_embedding (List[float]): Embedding vector of the query.
+        k (int): Number of nearest neighbours to retrieve.
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters.
+
+    Returns:
+        Dict[str, Any]: The knn query.
+    """
+    knn: Dict[str, Any] = {"vector": query_embedding, "k": k}
+    clauses = build_filter_clauses(filters)
+    if clauses:
+        knn["filter"] = {"bool": {"filter": clauses}}
+    return {"knn": {"embedding": knn}}
+
+
+def build_hybrid_query(
+    query_text: str,
+    query_embedding: List[float],
+    knn_depth: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Builds the hybrid query combined on the cluster by `nlp-search-pipeline`.
+
+    Args:
+        query_text (str): The text query for text-based search.
+        query_embedding (List[float]): Embedding vector for vector-based search.
+        knn_depth (int): Candidates fetched by the k-NN leg.
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters.
+
+    Returns:
+        Dict[str, Any]: The hybrid query.
+    """
+    return {
+        "hybrid": {
+            "queries": [
+                build_text_query(query_text, filters),  # Text-based search
+                build_knn_query(query_embedding, knn_depth, filters),
+            ]
+        }
+    }
+
+
+@traced("hybrid_search")
 def hybrid_search(
-    query_text: str, query_embedding: List[float], top_k: int = 5
+    query_text: str,
+    query_embedding: List[float],
+    top_k: int = 5,
+    mode: Optional[str] = None,
+    strategy: Optional[str] = None,
+    weights: Optional[Sequence[float]] = None,
+    text_depth: Optional[int] = None,
+    knn_depth: Optional[int] = None,
+    index_name: str = OPENSEARCH_INDEX,
+    filters: Optional[Dict[str, Any]] = None,
 ) -> List[Dict[str, Any]]:
     """
     Performs a hybrid search combining text-based and vector-based queries.
 
+    In "pipeline" mode the legs are combined on the cluster by `nlp-search-pipeline`,
+    whose weights are fixed when the pipeline is created. In "client" mode both legs
+    are sent in one msearch round-trip and fused here, so the strategy and weights can
+    change per request.
+
     Args:
         query_text (str): The text query for text-based search.
         query_embedding (List[float]): Embedding vector for vector-based search.
         top_k (int, optional): Number of top results to retrieve. Defaults to 5.
+        mode (Optional[str]): "pipeline" or "client". Defaults to HYBRID_FUSION_MODE.
+        strategy (Optional[str]): Client-side fusion strategy. Defaults to HYBRID_FUSION_STRATEGY.
+        weights (Optional[Sequence[float]]): Client-side BM25 and k-NN weights. Defaults to HYBRID_SEARCH_WEIGHTS.
+        text_depth (Optional[int]): Candidates fetched by the BM25 leg.
+        knn_depth (Optional[int]): Candidates fetched by the k-NN leg.
+        index_name (str): Name of the index. Defaults to OPENSEARCH_INDEX.
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters, applied
+            to both legs.
 
     Returns:
         List[Dict[str, Any]]: List of search results from OpenSearch.
+
+    Raises:
+        RuntimeError: If a leg of a client-side fused search fails.
     """
     client = get_opensearch_client()
+    mode = mode or HYBRID_FUSION_MODE
+    text_depth, knn_depth = resolve_leg_depths(top_k, text_depth, knn_depth)
+    source_filter = {"exclude": ["embedding"]}  # Exclude embeddings from the results
 
-    query_body = {
-        "_source": {"exclude": ["embedding"]},  # Exclude embeddings from the results
-        "query": {
-            "hybrid": {
-                "queries": [
-                    {"match": {"text": {"query": query_text}}},  # Text-based search
-                    {
-                        "knn": {
-                            "embedding": {
-                                "vector": query_embedding,
-                                "k": top_k,
-                            }
-                        }
-                    },
-                ]
-            }
-        },
-        "size": top_k,
-    }
+    if mode == "client":
+        searches: List[Dict[str, Any]] = []
+        for query, size in (
+            (build_text_query(query_text, filters), text_depth),
+            (build_knn_query(query_embedding, knn_depth, filters), knn_depth),
+        ):
+            searches.append({"index": index_name})
+            searches.append({"_source": source_filter, "query": query, "size": size})
+        response = client.msearch(body=searches)
 
-    response = client.search(
-        index=OPENSEARCH_INDEX, body=query_body, search_pipeline="nlp-search-pipeline"
-    )
-    logger.info(f"Hybrid search completed for query '{query_text}' with top_k={top_k}.")
+        legs: List[List[Dict[str, Any]]] = []
+        for leg in response["responses"]:
+            if "error" in leg:
+                # Fusing the other leg alone would return, and cache, partial results
+                logger.error(f"Hybrid search leg failed: {leg['error']}")
+                raise RuntimeError(f"Hybrid search leg failed: {leg['error']}")
+            legs.append(leg["hits"]["hits"])
+        hits = fuse(
+            legs,
+            strategy or HYBRID_FUSION_STRATEGY,
+            weights or HYBRID_SEARCH_WEIGHTS,
+            top_k,
+        )
+    elif mode == "pipeline":
+        query_body = {
+            "_source": source_filter,
+            "query": build_hybrid_query(
+                query_text, query_embedding, knn_depth, filters
+            ),
+            "size": top_k,
+        }
+        response = client.search(
+            index=index_name,
+            body=query_body,
+            search_pipeline="nlp-search-pipeline",
+        )
+        # Type casting for compatibility with expected return type
+        hits = response["hits"]["hits"]
+    else:
+        raise ValueError(f"Unknown hybrid fusion mode: {mode}")
 
-    # Type casting for compatibility with expected return type
-    hits: List[Dict[str, Any]] = response["hits"]["hits"]
+    logger.info(
+        f"Hybrid search ({mode}) completed for query '{query_text}' with top_k={top_k}."
+    )
     return hits
+
+
+# Export connection reuse alongside the other metrics
+register_gauges("rag_opensearch", get_connection_stats)
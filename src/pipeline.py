@@ -0,0 +1,321 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from src.catalog import hash_file, upsert_document
+from src.chunking import POSITION_FIELDS, iter_text_chunks
+from src.constants import (
+    EMBEDDING_BATCH_SIZE,
+    INGEST_BULK_THREADS,
+    TEXT_CHUNK_OVERLAP,
+    TEXT_CHUNK_SIZE,
+)
+from src.embeddings import count_tokens, generate_embeddings, get_max_chunk_tokens
+from src.metrics import IteratorTimer, record_span
+from src.ocr import iter_pdf_pages
+from src.retrieval import get_retrieval_backend
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def iter_counted_pages(pages: Iterable[str], stats: Dict[str, Any]) -> Iterator[str]:
+    """
+    Passes pages through while counting them.
+
+    Args:
+        pages (Iterable[str]): Raw page texts.
+        stats (Dict[str, Any]): Ingestion statistics, updated with 'pages' and 'characters'.
+
+    Yields:
+        str: The unchanged page text.
+    """
+    for page in pages:
+        stats["pages"] += 1
+        stats["characters"] += len(page)
+        yield page
+
+
+def hash_chunk(text: str) -> str:
+    """
+    Computes the SHA-256 digest of a chunk's text.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: Hex digest of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_identified_chunks(
+    chunks: Iterable[Dict[str, Any]], document_name: str, stats: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Adds a content hash and a deterministic id to each chunk.
+
+    The id only depends on the document name, the chunk text and how many identical
+    chunks precede it, so a chunk keeps its id when the text around it changes.
+
+    Args:
+        chunks (Iterable[Dict[str, Any]]): Chunks from iter_text_chunks, in document order.
+        document_name (str): Name of the source document.
+        stats (Dict[str, Any]): Ingestion statistics, updated with 'chunks'.
+
+    Yields:
+        Dict[str, Any]: The chunks with 'chunk_hash' and 'doc_id' added.
+    """
+    occurrences: Dict[str, int] = {}
+    for chunk in chunks:
+        chunk_hash = hash_chunk(chunk["text"])
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+        doc_id = f"{document_name}_{chunk_hash[:20]}"
+        if occurrence:
+            doc_id = f"{doc_id}_{occurrence}"
+        stats["chunks"] += 1
+        yield {**chunk, "chunk_hash": chunk_hash, "doc_id": doc_id}
+
+
+def iter_new_chunks(
+    chunks: Iterable[Dict[str, Any]],
+    existing: Dict[str, Dict[str, Any]],
+    kept: Set[str],
+    moved: Dict[str, Dict[str, Any]],
+    resent: Optional[Set[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Passes through only the chunks that are not indexed yet.
+
+    Args:
+        chunks (Iterable[Dict[str, Any]]): Chunks from iter_identified_chunks.
+        existing (Dict[str, Dict[str, Any]]): Indexed chunks of the document by id.
+        kept (Set[str]): Updated with the ids of chunks that are already indexed and
+            are not sent again.
+        moved (Dict[str, Dict[str, Any]]): Updated with the new position fields of
+            indexed chunks whose position changed, or that were indexed without pages.
+        resent (Optional[Set[str]]): If given, moved chunks are passed through to be
+            indexed again instead, for indices that cannot update them in place, and
+            their ids are added to it. Their embeddings come from the embedding cache.
+
+    Yields:
+        Dict[str, Any]: Chunks that need to be embedded and indexed.
+    """
+    for chunk in chunks:
+        stored = existing.get(chunk["doc_id"])
+        if stored is None:
+            yield chunk
+            continue
+        position = {field: chunk[field] for field in POSITION_FIELDS if field in chunk}
+        if any(stored.get(field) != value for field, value in position.items()):
+            if resent is not None:
+                resent.add(chunk["doc_id"])
+                yield chunk
+                continue
+            moved[chunk["doc_id"]] = position
+        kept.add(chunk["doc_id"])
+
+
+def iter_embedded_documents(
+    chunks: Iterable[Dict[str, Any]],
+    document_name: str,
+    stats: Dict[str, Any],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    use_cache: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Embeds chunks one batch at a time and yields documents ready for indexing.
+
+    Args:
+        chunks (Iterable[Dict[str, Any]]): Chunks with ids from iter_new_chunks or
+            iter_identified_chunks, in document order.
+        document_name (str): Name of the source document.
+        stats (Dict[str, Any]): Ingestion statistics, updated with 'embedded'.
+        batch_size (int): Number of chunks embedded together. Defaults to EMBEDDING_BATCH_SIZE.
+        use_cache (bool): Whether to use the embedding cache. Defaults to True.
+
+    Yields:
+        Dict[str, Any]: Document dictionaries with 'doc_id', 'text', 'embedding', 'document_name',
+            'chunk_hash' and the position fields of the chunk.
+    """
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> Iterator[Dict[str, Any]]:
+        embeddings = generate_embeddings(
+            [chunk["text"] for chunk in batch],
+            batch_size=batch_size,
+            use_cache=use_cache,
+        )
+        for chunk, embedding in zip(batch, embeddings):
+            yield {
+                "doc_id": chunk["doc_id"],
+                "text": chunk["text"],
+                "embedding": embedding,
+                "document_name": document_name,
+                "chunk_hash": chunk["chunk_hash"],
+                **{field: chunk[field] for field in POSITION_FIELDS if field in chunk},
+            }
+            stats["embedded"] += 1
+        batch.clear()
+
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def ingest_pdf(
+    file_path: str,
+    document_name: str,
+    extraction_workers: Optional[int] = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    bulk_threads: int = INGEST_BULK_THREADS,
+    record_in_catalog: bool = True,
+    update: bool = False,
+    pages: Optional[Iterable[str]] = None,
+    tags: Optional[List[str]] = None,
+    stored_path: Optional[str] = None,
+    use_embedding_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Extracts, chunks, embeds and indexes a PDF as one streaming pipeline, then records
+    the document in the catalog.
+
+    Each stage pulls from the previous one, so only a few pages, one embedding batch and
+    the bulk requests in flight are held in memory regardless of document size. Bulk
+    requests are sent from worker threads while the next batch is being embedded.
+
+    Chunk ids are derived from their content. In update mode, chunks already indexed for
+    the document are neither embedded nor re-sent (only their offsets are corrected if
+    they moved), and indexed chunks that no longer occur in the file are deleted.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        document_name (str): Name the chunks are indexed under.
+        extraction_workers (Optional[int]): Processes used for page extraction and OCR.
+        batch_size (int): Number of chunks embedded together. Defaults to EMBEDDING_BATCH_SIZE.
+        bulk_threads (int): Number of concurrent bulk requests. Defaults to INGEST_BULK_THREADS.
+        record_in_catalog (bool): Whether to record the document in the catalog. Defaults to True.
+        update (bool): Whether to only apply the differences to an indexed version of the document. Defaults to False.
+        pages (Optional[Iterable[str]]): Raw page texts to use instead of extracting them from file_path.
+        tags (Optional[List[str]]): Tags recorded for the document in the catalog. None
+            keeps the tags it already has.
+        stored_path (Optional[str]): Path recorded in the catalog, where the file is
+            kept after ingestion. Defaults to file_path.
+        use_embedding_cache (bool): Whether to reuse and cache chunk embeddings.
+            Defaults to True.
+
+    Returns:
+        Dict[str, Any]: Ingestion statistics with 'pages', 'characters', 'chunks', 'embedded', 'indexed', 'unchanged', 'deleted', 'errors' and 'seconds'.
+    """
+    start_time = time.perf_counter()
+    stats: Dict[str, Any] = {"pages": 0, "characters": 0, "chunks": 0, "embedded": 0}
+    backend = get_retrieval_backend()
+    existing = backend.document_chunks(document_name) if update else {}
+    kept: Set[str] = set()
+    resent: Set[str] = set()
+    moved: Dict[str, Dict[str, Any]] = {}
+
+    # Stages run interleaved, so each one's own time is derived from nested timers
+    page_timer, chunk_timer, document_timer = (
+        IteratorTimer(),
+        IteratorTimer(),
+        IteratorTimer(),
+    )
+    pages = page_timer.wrap(
+        iter_counted_pages(
+            (
+                pages
+                if pages is not None
+                else iter_pdf_pages(file_path, extraction_workers)
+            ),
+            stats,
+        )
+    )
+    chunks = chunk_timer.wrap(
+        iter_new_chunks(
+            iter_identified_chunks(
+                iter_text_chunks(
+                    pages,
+                    max_tokens=get_max_chunk_tokens(TEXT_CHUNK_SIZE),
+                    overlap_tokens=TEXT_CHUNK_OVERLAP,
+                    count_tokens=count_tokens,
+                ),
+                document_name,
+                stats,
+            ),
+            existing,
+            kept,
+            moved,
+            resent if update and not backend.updates_in_place() else None,
+        )
+    )
+    documents = document_timer.wrap(
+        iter_embedded_documents(
+            chunks, document_name, stats, batch_size, use_embedding_cache
+        )
+    )
+    indexed, errors = backend.index_documents(documents, thread_count=bulk_threads)
+
+    # Chunks are only removed once their replacements are indexed
+    deleted = [
+        doc_id for doc_id in existing if doc_id not in kept and doc_id not in resent
+    ]
+    if deleted or moved:
+        _, change_errors = backend.apply_chunk_changes(deleted, moved)
+        errors = list(errors) + list(change_errors)
+
+    stats["indexed"] = indexed
+    stats["unchanged"] = len(kept)
+    stats["deleted"] = len(deleted)
+    stats["errors"] = errors
+    stats["seconds"] = time.perf_counter() - start_time
+
+    record_span("ingest.extract", page_timer.seconds, pages=stats["pages"])
+    record_span(
+        "ingest.chunk", chunk_timer.seconds - page_timer.seconds, chunks=stats["chunks"]
+    )
+    record_span(
+        "ingest.embed",
+        document_timer.seconds - chunk_timer.seconds,
+        embedded=stats["embedded"],
+    )
+    # Time spent waiting on indexing beyond what overlapped with the stages above
+    record_span(
+        "ingest.index", stats["seconds"] - document_timer.seconds, indexed=indexed
+    )
+    record_span(
+        "ingest_pdf",
+        stats["seconds"],
+        "error" if errors else "ok",
+        document=document_name,
+        pages=stats["pages"],
+        chunks=stats["chunks"],
+    )
+
+    if record_in_catalog:
+        upsert_document(
+            {
+                "document_name": document_name,
+                "file_path": stored_path or file_path,
+                "size_bytes": os.path.getsize(file_path),
+                "page_count": stats["pages"],
+                "char_count": stats["characters"],
+                "chunk_count": len(kept) + indexed,
+                "content_hash": hash_file(file_path),
+                "tags": tags,
+            }
+        )
+    logger.info(
+        f"Ingested '{document_name}': {stats['pages']} pages, {stats['chunks']} chunks, "
+        f"{indexed} indexed, {len(kept)} unchanged, {len(deleted)} deleted, "
+        f"{len(errors)} errors in {stats['seconds']:.2f}s."
+    )
+    return stats
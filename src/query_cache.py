@@ -0,0 +1,211 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.constants import (
+    INDEX_GENERATION_PATH,
+    QUERY_CACHE_ENABLED,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_SIMILARITY,
+    QUERY_CACHE_TTL,
+)
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalises a query for exact cache lookups (case and whitespace insensitive).
+
+    Args:
+        query (str): The user's query.
+
+    Returns:
+        str: The normalised query.
+    """
+    return " ".join(query.lower().split())
+
+
+def mark_index_changed() -> None:
+    """
+    Records that the index was written, invalidating cached search results.
+
+    The marker lives on disk so that writes from other processes (eg. ingestion
+    workers) invalidate the caches of every app process.
+    """
+    os.makedirs(os.path.dirname(INDEX_GENERATION_PATH) or ".", exist_ok=True)
+    with open(INDEX_GENERATION_PATH, "w") as f:
+        f.write(str(time.time_ns()))
+
+
+def read_index_generation() -> str:
+    """
+    Reads the marker written by mark_index_changed.
+
+    Returns:
+        str: The current index generation, or an empty string if none was recorded.
+    """
+    try:
+        with open(INDEX_GENERATION_PATH, "r") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+class QueryResultCache:
+    """
+    LRU cache of search results keyed by normalised query text and result count.
+
+    Entries also keep the unit-normalised query embedding, so a new query whose
+    embedding is within the cosine similarity threshold of a cached one can reuse its
+    results. Entries expire after a TTL, and the whole cache is dropped whenever the
+    index generation changes.
+    """
+
+    def __init__(
+        self, max_entries: int, ttl_seconds: float, similarity_threshold: float
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, Any], Dict[str, Any]]" = OrderedDict()
+        self._generation = read_index_generation()
+        self._lock = threading.Lock()
+
+    def _validate(self) -> None:
+        """Drops every entry if the index changed since they were stored."""
+        generation = read_index_generation()
+        if generation != self._generation:
+            if self._entries:
+                logger.info("Index changed; clearing the query result cache.")
+            self._entries.clear()
+            self._generation = generation
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return bool(time.monotonic() - entry["stored_at"] < self.ttl_seconds)
+
+    def get(self, query: str, params: Any) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the cached results of the same query.
+
+        Args:
+            query (str): The user's query.
+            params (Any): Hashable search parameters the results depend on (eg. top_k).
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The cached results, or None on a miss.
+        """
+        key = (normalize_query(query), params)
+        with self._lock:
+            self._validate()
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(entry):
+                return None
+            self._entries.move_to_end(key)
+        logger.info("Query result cache hit (exact).")
+        return list(entry["results"])
+
+    def get_similar(
+        self, embedding: np.ndarray[Any, Any], params: Any
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the cached results of the most similar query above the threshold.
+
+        Args:
+            embedding (np.ndarray): Embedding of the new query.
+            params (Any): Hashable search parameters the results depend on (eg. top_k).
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The cached results, or None on a miss.
+        """
+        vector = _unit(embedding)
+        with self._lock:
+            self._validate()
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if key[1] == params and self._is_fresh(entry)
+            ]
+            if not candidates:
+                return None
+            similarities = (
+                np.stack([entry["embedding"] for _, entry in candidates]) @ vector
+            )
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+        logger.info(
+            f"Query result cache hit (similarity {float(similarities[best]):.3f})."
+        )
+        return list(entry["results"])
+
+    def put(
+        self,
+        query: str,
+        params: Any,
+        embedding: np.ndarray[Any, Any],
+        results: List[Dict[str, Any]],
+        generation: Optional[str] = None,
+    ) -> None:
+        """
+        Stores the results of a query.
+
+        Args:
+            query (str): The user's query.
+            params (Any): Hashable search parameters the results depend on (eg. top_k).
+            embedding (np.ndarray): Embedding of the query.
+            results (List[Dict[str, Any]]): The search results.
+            generation (Optional[str]): Index generation read before the search started.
+                The results are not stored if the index changed since.
+        """
+        key = (normalize_query(query), params)
+        with self._lock:
+            self._validate()
+            if generation is not None and generation != self._generation:
+                logger.info("Index changed during the search; results not cached.")
+                return
+            self._entries[key] = {
+                "embedding": _unit(embedding),
+                "results": list(results),
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _unit(embedding: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    """Returns the embedding scaled to unit length."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+_query_cache = QueryResultCache(
+    QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL, QUERY_CACHE_SIMILARITY
+)
+
+
+def get_query_cache() -> Optional[QueryResultCache]:
+    """
+    Returns the process-wide query result cache.
+
+    Returns:
+        Optional[QueryResultCache]: The cache, or None if query caching is disabled.
+    """
+    return _query_cache if QUERY_CACHE_ENABLED else None
@@ -0,0 +1,135 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import numpy as np
+import streamlit as st
+
+from src.constants import (
+    RERANK_BATCH_SIZE,
+    RERANK_CANDIDATE_MULTIPLIER,
+    RERANK_LATENCY_BUDGET,
+    RERANK_MAX_CANDIDATES,
+    RERANK_MAX_LENGTH,
+    RERANK_MODEL_PATH,
+)
+from src.metrics import record_span
+from src.utils import setup_logging
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# One scoring thread: a query whose scoring overran its budget delays the next one,
+# which then falls back too, instead of piling more inference onto the CPU
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+
+@st.cache_resource(show_spinner=False)
+def get_reranker() -> "CrossEncoder":
+    """
+    Loads and caches the cross-encoder used for reranking.
+
+    Returns:
+        CrossEncoder: The loaded model, on the CPU.
+    """
+    from sentence_transformers import CrossEncoder
+
+    logger.info(f"Loading reranking model from path: {RERANK_MODEL_PATH}")
+    return CrossEncoder(RERANK_MODEL_PATH, max_length=RERANK_MAX_LENGTH, device="cpu")
+
+
+def get_candidate_count(top_k: int) -> int:
+    """
+    Returns how many hits to retrieve so that reranking can pick the best top_k.
+
+    Args:
+        top_k (int): Number of results wanted after reranking.
+
+    Returns:
+        int: Number of candidates to retrieve.
+    """
+    return max(top_k, min(top_k * RERANK_CANDIDATE_MULTIPLIER, RERANK_MAX_CANDIDATES))
+
+
+def _hit_text(hit: Dict[str, Any]) -> str:
+    text = str(hit["_source"]["text"])
+    return text[len("passage: ") :] if text.startswith("passage: ") else text
+
+
+def _score(query: str, texts: List[str], deadline: float) -> Optional[np.ndarray]:
+    """Scores (query, text) pairs batch by batch; None once the deadline has passed."""
+    model = get_reranker()
+    scores = []
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        if time.monotonic() >= deadline:
+            return None
+        pairs = [[query, text] for text in texts[start : start + RERANK_BATCH_SIZE]]
+        scores.append(
+            np.asarray(
+                model.predict(
+                    pairs,
+                    batch_size=RERANK_BATCH_SIZE,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                ),
+                dtype=np.float32,
+            )
+        )
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+
+def rerank_hits(
+    query: str,
+    hits: List[Dict[str, Any]],
+    top_k: int,
+    budget: float = RERANK_LATENCY_BUDGET,
+) -> List[Dict[str, Any]]:
+    """
+    Reorders search hits by cross-encoder relevance and keeps the best top_k.
+
+    Candidates are scored in batches on a background thread. If scoring has not
+    finished within the budget (eg. while the model is still loading, or under load)
+    or fails, the first top_k hits are returned in their original order.
+
+    Args:
+        query (str): The user's query.
+        hits (List[Dict[str, Any]]): Candidate hits, best first.
+        top_k (int): Number of hits to keep.
+        budget (float): Seconds reranking may add to the query. Defaults to RERANK_LATENCY_BUDGET.
+
+    Returns:
+        List[Dict[str, Any]]: The kept hits, with the cross-encoder score as '_rerank_score' if reranked.
+    """
+    if len(hits) <= 1:
+        return hits[:top_k]
+
+    start = time.monotonic()
+    future = _executor.submit(
+        _score, query, [_hit_text(hit) for hit in hits], start + budget
+    )
+    try:
+        scores = future.result(timeout=budget)
+    except FutureTimeoutError:
+        scores = None
+    except Exception as e:
+        logger.error(f"Reranking failed, keeping the retrieval order: {e}")
+        record_span("rerank", time.monotonic() - start, "error")
+        return hits[:top_k]
+
+    if scores is None:
+        logger.warning(
+            f"Reranking exceeded its {budget}s budget; keeping the retrieval order."
+        )
+        record_span("rerank", time.monotonic() - start, "timeout")
+        return hits[:top_k]
+
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    reranked = [{**hits[i], "_rerank_score": float(scores[i])} for i in order]
+    record_span("rerank", time.monotonic() - start, candidates=len(hits))
+    return reranked
@@ -0,0 +1,271 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+from src.constants import (
+    EMBEDDING_DIMENSION,
+    INGEST_BULK_THREADS,
+    LOCAL_INDEX_DIR,
+    OPENSEARCH_INDEX,
+    RETRIEVAL_BACKEND,
+)
+from src.ingestion import (
+    apply_chunk_changes,
+    create_index,
+    delete_documents_by_document_name,
+    get_document_chunk_counts,
+    get_document_chunks,
+    sample_chunks,
+    source_has_embeddings,
+    stream_index_documents,
+)
+from src.local_index import LocalHybridIndex
+from src.opensearch import get_cluster_health, get_opensearch_client, hybrid_search
+from src.query_cache import mark_index_changed
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class RetrievalBackend(Protocol):
+    """Storage and hybrid search of document chunks."""
+
+    name: str
+
+    def ensure_index(self) -> None:
+        """Creates the index if it does not exist yet."""
+
+    def status(self) -> str:
+        """Returns "green", "yellow" or "red"."""
+
+    def index_documents(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        thread_count: int = INGEST_BULK_THREADS,
+    ) -> Tuple[int, List[Any]]:
+        """Indexes document chunks; returns the success count and any errors."""
+
+    def delete_document(self, document_name: str) -> None:
+        """Deletes every chunk of a document."""
+
+    def document_chunk_counts(self) -> Dict[str, int]:
+        """Returns the number of indexed chunks per document name."""
+
+    def document_chunks(self, document_name: str) -> Dict[str, Dict[str, Any]]:
+        """Returns 'chunk_hash' and the position fields of a document's chunks by id."""
+
+    def apply_chunk_changes(
+        self, deleted_ids: List[str], offsets: Dict[str, Dict[str, Any]]
+    ) -> Tuple[int, List[Any]]:
+        """Deletes chunks by id and sets new position fields on chunks that moved."""
+
+    def updates_in_place(self) -> bool:
+        """Tells whether apply_chunk_changes keeps the embeddings of moved chunks."""
+
+    def sample_chunks(self, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+        """Returns up to count random chunks with their '_id', 'text' and 'embedding'."""
+
+    def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        strategy: Optional[str] = None,
+        weights: Optional[Sequence[float]] = None,
+        text_depth: Optional[int] = None,
+        knn_depth: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Returns the top_k hits matching filters, in OpenSearch hit format."""
+
+
+class OpenSearchBackend:
+    """Retrieval backend storing chunks in an OpenSearch index."""
+
+    name = "opensearch"
+
+    def __init__(
+        self, index_name: str = OPENSEARCH_INDEX, profile_name: Optional[str] = None
+    ) -> None:
+        self.index_name = index_name
+        self.profile_name = profile_name
+
+    def ensure_index(self) -> None:
+        create_index(
+            get_opensearch_client(), self.profile_name, index_name=self.index_name
+        )
+
+    def status(self) -> str:
+        return str(get_cluster_health(get_opensearch_client()).get("status", "red"))
+
+    def index_documents(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        thread_count: int = INGEST_BULK_THREADS,
+    ) -> Tuple[int, List[Any]]:
+        return stream_index_documents(
+            documents, thread_count=thread_count, index_name=self.index_name
+        )
+
+    def delete_document(self, document_name: str) -> None:
+        delete_documents_by_document_name(document_name, index_name=self.index_name)
+
+    def document_chunk_counts(self) -> Dict[str, int]:
+        return get_document_chunk_counts(
+            get_opensearch_client(), index_name=self.index_name
+        )
+
+    def document_chunks(self, document_name: str) -> Dict[str, Dict[str, Any]]:
+        return get_document_chunks(
+            get_opensearch_client(), document_name, index_name=self.index_name
+        )
+
+    def apply_chunk_changes(
+        self, deleted_ids: List[str], offsets: Dict[str, Dict[str, Any]]
+    ) -> Tuple[int, List[Any]]:
+        return apply_chunk_changes(
+            get_opensearch_client(), deleted_ids, offsets, index_name=self.index_name
+        )
+
+    def updates_in_place(self) -> bool:
+        # Partial updates rebuild a chunk from _source, which may lack its embedding
+        return source_has_embeddings(get_opensearch_client(), self.index_name)
+
+    def sample_chunks(self, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+        return sample_chunks(
+            get_opensearch_client(), count, seed, index_name=self.index_name
+        )
+
+    def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        strategy: Optional[str] = None,
+        weights: Optional[Sequence[float]] = None,
+        text_depth: Optional[int] = None,
+        knn_depth: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        # A per-request strategy or weights can only be honoured by client-side fusion
+        return hybrid_search(
+            query_text,
+            query_embedding,
+            top_k=top_k,
+            mode="client" if strategy or weights else None,
+            strategy=strategy,
+            weights=weights,
+            text_depth=text_depth,
+            knn_depth=knn_depth,
+            index_name=self.index_name,
+            filters=filters,
+        )
+
+
+class LocalBackend:
+    """Retrieval backend running entirely in-process on a LocalHybridIndex."""
+
+    name = "local"
+
+    def __init__(self, directory: str, dimension: int) -> None:
+        self.index = LocalHybridIndex(directory, dimension)
+
+    def ensure_index(self) -> None:
+        pass
+
+    def status(self) -> str:
+        return "green"
+
+    def index_documents(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        thread_count: int = INGEST_BULK_THREADS,
+    ) -> Tuple[int, List[Any]]:
+        try:
+            return self.index.add_documents(documents)
+        finally:
+            mark_index_changed()
+
+    def delete_document(self, document_name: str) -> None:
+        self.index.delete_document(document_name)
+        mark_index_changed()
+
+    def document_chunk_counts(self) -> Dict[str, int]:
+        return self.index.document_chunk_counts()
+
+    def document_chunks(self, document_name: str) -> Dict[str, Dict[str, Any]]:
+        return self.index.document_chunks(document_name)
+
+    def apply_chunk_changes(
+        self, deleted_ids: List[str], offsets: Dict[str, Dict[str, Any]]
+    ) -> Tuple[int, List[Any]]:
+        try:
+            return self.index.apply_chunk_changes(deleted_ids, offsets), []
+        finally:
+            mark_index_changed()
+
+    def updates_in_place(self) -> bool:
+        return True
+
+    def sample_chunks(self, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+        return self.index.sample_chunks(count, seed)
+
+    def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        strategy: Optional[str] = None,
+        weights: Optional[Sequence[float]] = None,
+        text_depth: Optional[int] = None,
+        knn_depth: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.index.hybrid_search(
+            query_text,
+            query_embedding,
+            top_k=top_k,
+            strategy=strategy,
+            weights=weights,
+            text_depth=text_depth,
+            knn_depth=knn_depth,
+            filters=filters,
+        )
+
+
+_backend: Optional[RetrievalBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_retrieval_backend() -> RetrievalBackend:
+    """
+    Returns the retrieval backend selected by RETRIEVAL_BACKEND, creating it on first use.
+
+    Returns:
+        RetrievalBackend: The process-wide backend instance.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if RETRIEVAL_BACKEND == "local":
+                _backend = LocalBackend(LOCAL_INDEX_DIR, EMBEDDING_DIMENSION)
+            elif RETRIEVAL_BACKEND == "opensearch":
+                _backend = OpenSearchBackend()
+            else:
+                raise ValueError(f"Unknown retrieval backend: {RETRIEVAL_BACKEND}")
+            logger.info(f"Using the {RETRIEVAL_BACKEND} retrieval backend.")
+        return _backend
+
+
+def set_retrieval_backend(backend: Optional[RetrievalBackend]) -> None:
+    """
+    Replaces the process-wide retrieval backend (eg. with one on a scratch index).
+
+    Args:
+        backend (Optional[RetrievalBackend]): The new backend, or None to recreate the configured one on next use.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,91 @@
+import logging
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Union
+
+from src.catalog import list_documents
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def _iso_date(value: Optional[Union[date, str]]) -> Optional[str]:
+    """Returns a date as "YYYY-MM-DD", or None."""
+    if value is None or value == "":
+        return None
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+
+def resolve_search_filters(
+    filters: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Turns the filters chosen by the user into filters the retrieval backends apply.
+
+    Upload dates and tags are document metadata kept in the catalog, so they are
+    resolved here to the names of the matching documents, intersected with any
+    documents chosen by name. Page ranges are applied per chunk by the backends.
+
+    Args:
+        filters (Optional[Dict[str, Any]]): Any of 'document_names' (list of names),
+            'uploaded_from' and 'uploaded_to' (dates, inclusive, compared in UTC),
+            'tags' (documents with any of the tags), 'page_from' and 'page_to'.
+
+    Returns:
+        Optional[Dict[str, Any]]: None if nothing is filtered, otherwise
+            'document_names' (a sorted list, or None for every document), 'page_from'
+            and 'page_to'. An empty 'document_names' matches no document.
+    """
+    if not filters:
+        return None
+    names = filters.get("document_names")
+    allowed = set(names) if names else None
+
+    uploaded_from = _iso_date(filters.get("uploaded_from"))
+    uploaded_to = _iso_date(filters.get("uploaded_to"))
+    tags = set(filters.get("tags") or [])
+    if uploaded_from or uploaded_to or tags:
+        matching = set()
+        for document in list_documents():
+            uploaded = (document["indexed_at"] or "")[:10]
+            if uploaded_from and uploaded < uploaded_from:
+                continue
+            if uploaded_to and uploaded > uploaded_to:
+                continue
+            if tags and not tags.intersection(document["tags"]):
+                continue
+            matching.add(document["document_name"])
+        allowed = matching if allowed is None else allowed & matching
+
+    page_from = filters.get("page_from")
+    page_to = filters.get("page_to")
+    if allowed is None and page_from is None and page_to is None:
+        return None
+    resolved = {
+        "document_names": sorted(allowed) if allowed is not None else None,
+        "page_from": int(page_from) if page_from is not None else None,
+        "page_to": int(page_to) if page_to is not None else None,
+    }
+    logger.info(f"Search filters resolved to {resolved}.")
+    return resolved
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> Hashable:
+    """
+    Builds a hashable key of resolved filters for the query result cache.
+
+    Args:
+        filters (Optional[Dict[str, Any]]): Filters from resolve_search_filters.
+
+    Returns:
+        Hashable: Equal for filters selecting the same chunks.
+    """
+    if not filters:
+        return None
+    names = filters.get("document_names")
+    return (
+        tuple(names) if names is not None else None,
+        filters.get("page_from"),
+        filters.get("page_to"),
+    )
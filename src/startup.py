@@ -0,0 +1,272 @@
+"""
+Measures how long the app's pages take to import, to keep cold starts fast.
+
+Usage:
+    python -m src.startup
+    python -m src.startup --budget 1.5
+
+Each page's `src` imports are timed in a fresh interpreter, and heavy libraries that
+get loaded at import time are listed. The command exits with status 1 when a page
+takes longer than the budget (STARTUP_IMPORT_BUDGET seconds by default).
+
+Inside the app, `start_warmup` loads the models in a background thread while the first
+page renders, and pages read the progress with `get_readiness`.
+"""
+
+import argparse
+import ast
+import glob
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.constants import RERANK_ENABLED, STARTUP_IMPORT_BUDGET
+from src.metrics import record_span
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# First import of this module, which pages import before anything heavy
+PROCESS_STARTED = time.monotonic()
+
+# Libraries that take long to import and should only be loaded on first use
+HEAVY_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "onnxruntime",
+    "ollama",
+    "opensearchpy",
+    "pytesseract",
+    "PIL",
+)
+
+_readiness: Dict[str, Dict[str, Any]] = {}
+_readiness_lock = threading.Lock()
+_ready_events: Dict[str, threading.Event] = {}
+_warmup_thread: Optional[threading.Thread] = None
+
+
+def _set_state(component: str, state: str, **details: Any) -> None:
+    with _readiness_lock:
+        _readiness[component] = {"state": state, **details}
+        event = _ready_events.setdefault(component, threading.Event())
+    if state in ("ready", "failed"):
+        event.set()
+
+
+def _warm_index() -> None:
+    from src.retrieval import get_retrieval_backend
+
+    backend = get_retrieval_backend()
+    backend.ensure_index()
+    status = backend.status()
+    if status == "red":
+        raise RuntimeError("Search index health is red")
+
+
+def _warm_embedding_model() -> None:
+    from src.embeddings import generate_query_embedding
+
+    generate_query_embedding("warm-up")  # Also compiles the first forward pass
+
+
+def _warm_llm() -> None:
+    from src.chat import ensure_model_pulled, preload_model
+    from src.constants import OLLAMA_MODEL_NAME
+
+    if not ensure_model_pulled(OLLAMA_MODEL_NAME):
+        raise RuntimeError(f"Model {OLLAMA_MODEL_NAME} is not available")
+    preload_model(OLLAMA_MODEL_NAME)
+
+
+def _warm_reranker() -> None:
+    from src.rerank import get_reranker
+
+    get_reranker()
+
+
+def get_warmup_steps() -> List[Tuple[str, Callable[[], None]]]:
+    """
+    Lists the components warmed up in the background, in loading order.
+
+    Returns:
+        List[Tuple[str, Callable[[], None]]]: Component names and their loaders.
+    """
+    steps = [
+        ("index", _warm_index),
+        ("embedding_model", _warm_embedding_model),
+        ("llm", _warm_llm),
+    ]
+    if RERANK_ENABLED:
+        steps.append(("reranker", _warm_reranker))
+    return steps
+
+
+def _run_warmup(steps: List[Tuple[str, Callable[[], None]]]) -> None:
+    for component, load in steps:
+        _set_state(component, "loading")
+        start = time.perf_counter()
+        try:
+            load()
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            logger.error(f"Warm-up of {component} failed after {seconds:.1f}s: {e}")
+            _set_state(component, "failed", seconds=seconds, error=str(e))
+            record_span(f"warmup_{component}", seconds, "error")
+            continue
+        seconds = time.perf_counter() - start
+        since_start = time.monotonic() - PROCESS_STARTED
+        _set_state(component, "ready", seconds=seconds)
+        record_span(
+            f"warmup_{component}",
+            seconds,
+            ready_after_s=round(since_start, 3),
+        )
+    logger.info(
+        f"Warm-up finished {time.monotonic() - PROCESS_STARTED:.1f}s after start."
+    )
+
+
+def start_warmup() -> None:
+    """
+    Loads the search index, embedding model and LLM in a background thread, once per
+    process, so pages can render before the models are ready.
+    """
+    global _warmup_thread
+    with _readiness_lock:
+        if _warmup_thread is not None:
+            return
+        steps = get_warmup_steps()
+        for component, _ in steps:
+            _readiness[component] = {"state": "pending"}
+            _ready_events.setdefault(component, threading.Event())
+        _warmup_thread = threading.Thread(
+            target=_run_warmup, args=(steps,), name="warmup", daemon=True
+        )
+    _warmup_thread.start()
+
+
+def get_readiness() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the warm-up state of every component.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per component, its 'state' ("pending", "loading",
+            "ready" or "failed"), and 'seconds' and 'error' once it finished.
+    """
+    with _readiness_lock:
+        return {component: dict(state) for component, state in _readiness.items()}
+
+
+def is_ready(component: str) -> bool:
+    """
+    Tells whether a component finished warming up successfully.
+
+    Args:
+        component (str): Name of the component, eg. "embedding_model".
+
+    Returns:
+        bool: True once the component is ready.
+    """
+    return get_readiness().get(component, {}).get("state") == "ready"
+
+
+def wait_until_ready(component: str, timeout: Optional[float] = None) -> bool:
+    """
+    Blocks until a component finished warming up, successfully or not.
+
+    Returns immediately if warm-up was not started in this process.
+
+    Args:
+        component (str): Name of the component.
+        timeout (Optional[float]): Maximum seconds to wait. Defaults to no limit.
+
+    Returns:
+        bool: True if the component is ready.
+    """
+    with _readiness_lock:
+        event = _ready_events.get(component)
+    if event is not None:
+        event.wait(timeout)
+    return is_ready(component)
+
+
+def find_page_imports(page: str) -> List[str]:
+    """
+    Lists the `src` modules a page script imports.
+
+    Args:
+        page (str): Path of the page script.
+
+    Returns:
+        List[str]: Module names, in import order.
+    """
+    with open(page, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=page)
+    modules: List[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        modules.extend(name for name in names if name.split(".")[0] == "src")
+    return modules
+
+
+def measure_imports(modules: List[str]) -> Dict[str, Any]:
+    """
+    Times importing modules in a fresh interpreter.
+
+    Args:
+        modules (List[str]): Modules to import.
+
+    Returns:
+        Dict[str, Any]: 'seconds' taken and the 'heavy' modules that were loaded.
+    """
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    __import__(name)\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [name for name in {list(HEAVY_MODULES)!r} if name in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"seconds": float(measured["seconds"]), "heavy": list(measured["heavy"])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=STARTUP_IMPORT_BUDGET,
+        help="Maximum import time of a page in seconds.",
+    )
+    args = parser.parse_args()
+
+    over_budget = False
+    for page in ["Welcome.py", *sorted(glob.glob("pages/*.py"))]:
+        measured = measure_imports(["streamlit", *find_page_imports(page)])
+        flag = "OVER" if measured["seconds"] > args.budget else "ok"
+        over_budget = over_budget or flag == "OVER"
+        heavy = ", ".join(measured["heavy"]) or "none"
+        print(f"{flag:>4}  {measured['seconds']:6.2f}s  {page}  (heavy: {heavy})")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Runs background ingestion workers that process the jobs queued by the upload page.
+
+Usage:
+    python -m src.worker
+    python -m src.worker --processes 2 --once
+
+Each worker process claims one job at a time and runs the extract, chunk, embed and
+index pipeline on it at a lowered priority and with a limited number of threads, so
+ingestion cannot starve chat requests. Extracted pages are checkpointed every
+INGEST_CHECKPOINT_PAGES pages: a job interrupted by a crash or restart is resumed from
+its checkpoint, and chunks it had already indexed are kept rather than embedded again.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterator, List
+
+from src.constants import (
+    INGEST_CHECKPOINT_PAGES,
+    INGEST_WORKER_EXTRACTION_PROCESSES,
+    INGEST_WORKER_NICE,
+    INGEST_WORKER_POLL_INTERVAL,
+    INGEST_WORKER_PROCESSES,
+    INGEST_WORKER_TORCH_THREADS,
+)
+from src.embeddings import set_inference_threads
+from src.jobs import (
+    claim_job,
+    finish_job,
+    load_job_pages,
+    register_worker,
+    release_job,
+    save_job_pages,
+    unregister_worker,
+    update_job_progress,
+)
+from src.ocr import count_pdf_pages, iter_pdf_pages
+from src.pipeline import ingest_pdf
+from src.utils import setup_logging
+
+# Initialize logger
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def limit_resources(nice: int, torch_threads: int) -> None:
+    """
+    Lowers the priority of the current process and caps the threads used for embedding.
+
+    Extraction processes started afterwards inherit the lowered priority.
+
+    Args:
+        nice (int): Increment added to the process niceness.
+        torch_threads (int): Maximum number of threads for CPU inference.
+    """
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    if torch_threads:
+        set_inference_threads(torch_threads)
+
+
+def iter_checkpointed_pages(
+    job: Dict[str, Any], pages_total: int, extraction_workers: int
+) -> Iterator[str]:
+    """
+    Yields the pages of a job's PDF, checkpointing them in batches as they are extracted.
+
+    Pages checkpointed by an earlier attempt are read back instead of extracted again.
+
+    Args:
+        job (Dict[str, Any]): The job being processed.
+        pages_total (int): Number of pages in the PDF.
+        extraction_workers (int): Processes used for page extraction and OCR.
+
+    Yields:
+        str: Raw text of each page, in page order.
+    """
+    job_id = job["job_id"]
+    saved = load_job_pages(job_id)
+    if saved:
+        logger.info(f"Resuming job {job_id} after {len(saved)} checkpointed pages.")
+    yield from saved
+
+    batch: List[str] = []
+    pages_done = len(saved)
+    for page in iter_pdf_pages(
+        job["file_path"], extraction_workers, start_page=len(saved)
+    ):
+        yield page
+        batch.append(page)
+        if len(batch) >= INGEST_CHECKPOINT_PAGES:
+            save_job_pages(job_id, pages_done, batch)
+            pages_done += len(batch)
+            update_job_progress(job_id, pages_done, pages_total)
+            batch = []
+    if batch:
+        save_job_pages(job_id, pages_done, batch)
+        update_job_progress(job_id, pages_done + len(batch), pages_total)
+
+
+def settle_upload(job: Dict[str, Any], indexed: bool) -> None:
+    """
+    Moves a job's staged upload to its target path, or deletes it if the job failed.
+
+    Args:
+        job (Dict[str, Any]): The finished job.
+        indexed (bool): Whether the document was indexed.
+    """
+    target = job.get("target_path")
+    if not target or target == job["file_path"] or not os.path.exists(job["file_path"]):
+        return
+    if indexed:
+        os.replace(job["file_path"], target)
+        logger.info(f"Moved '{job['file_path']}' to '{target}'.")
+    else:
+        os.remove(job["file_path"])
+
+
+def run_job(job: Dict[str, Any], extraction_workers: int) -> None:
+    """
+    Ingests the document of a claimed job and records the outcome.
+
+    Args:
+        job (Dict[str, Any]): The claimed job.
+        extraction_workers (int): Processes used for page extraction and OCR.
+    """
+    job_id = job["job_id"]
+    try:
+        pages_total = count_pdf_pages(job["file_path"])
+        update_job_progress(job_id, job["pages_done"], pages_total)
+        stats = ingest_pdf(
+            job["file_path"],
+            job["document_name"],
+            extraction_workers=extraction_workers,
+            bulk_threads=1,
+            # A retried job keeps the chunks its previous attempt already indexed
+            update=bool(job["update_existing"]) or job["attempts"] > 1,
+            pages=iter_checkpointed_pages(job, pages_total, extraction_workers),
+            tags=json.loads(job["tags"]) if job["tags"] else None,
+            stored_path=job.get("target_path"),
+        )
+    except (KeyboardInterrupt, SystemExit):
+        release_job(job_id)
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed.")
+        settle_upload(job, indexed=False)
+        finish_job(job_id, 0, error=str(e) or type(e).__name__)
+        return
+
+    settle_upload(job, indexed=True)
+
+    chunks = stats["unchanged"] + stats["indexed"]
+    if stats["errors"]:
+        finish_job(
+            job_id, chunks, error=f"{len(stats['errors'])} chunks failed to index"
+        )
+    else:
+        finish_job(job_id, chunks)
+
+
+def run_worker(
+    once: bool = False,
+    max_workers: int = INGEST_WORKER_PROCESSES,
+    nice: int = INGEST_WORKER_NICE,
+    torch_threads: int = INGEST_WORKER_TORCH_THREADS,
+    extraction_workers: int = INGEST_WORKER_EXTRACTION_PROCESSES,
+) -> None:
+    """
+    Processes queued jobs until interrupted, or until the queue is empty if once is set.
+
+    Args:
+        once (bool): Whether to exit when no job is queued. Defaults to False.
+        max_workers (int): Maximum number of concurrent workers. Defaults to INGEST_WORKER_PROCESSES.
+        nice (int): Increment added to the process niceness. Defaults to INGEST_WORKER_NICE.
+        torch_threads (int): Maximum number of threads for CPU inference. Defaults to INGEST_WORKER_TORCH_THREADS.
+        extraction_workers (int): Processes used for page extraction and OCR. Defaults to INGEST_WORKER_EXTRACTION_PROCESSES.
+    """
+    pid = os.getpid()
+    if not register_worker(pid, max_workers):
+        logger.info(f"Worker {pid} not started: {max_workers} workers already run.")
+        return
+    try:
+        limit_resources(nice, torch_threads)
+        logger.info(f"Worker {pid} waiting for ingestion jobs.")
+        while True:
+            job = claim_job(pid)
+            if job is None:
+                if once:
+                    return
+                time.sleep(INGEST_WORKER_POLL_INTERVAL)
+                continue
+            run_job(job, extraction_workers)
+    finally:
+        unregister_worker(pid)
+        logger.info(f"Worker {pid} stopped.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=INGEST_WORKER_PROCESSES,
+        help="Number of jobs processed at the same time.",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Exit once the queue is empty."
+    )
+    parser.add_argument(
+        "--nice",
+        type=int,
+        default=INGEST_WORKER_NICE,
+        help="Niceness increment of the worker processes.",
+    )
+    args = parser.parse_args()
+
+    options = {"once": args.once, "max_workers": args.processes, "nice": args.nice}
+    if args.processes <= 1:
+        run_worker(**options)
+        return
+
+    # Spawned so each worker loads its own embedding model and torch thread pool
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, kwargs=options)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
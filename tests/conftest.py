@@ -0,0 +1,6 @@
+import os
+
+from src.constants import LOG_FILE_PATH
+
+# Modules log to LOG_FILE_PATH, which must exist before they are imported
+os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
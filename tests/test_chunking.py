@@ -0,0 +1,86 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from src.chunking import iter_text_chunks
+from src.utils import clean_text
+
+PAGES = [
+    "The first page opens the report. It describes the goals of the study.\n\n"
+    "A new paragraph starts here. It has two sentences.",
+    "",
+    "The third page is long. "
+    + " ".join(f"Sentence number {i} adds a few more words." for i in range(20)),
+    "Aword " * 40 + "ends an overlong sentence without any punctuation",
+    "The last page is short.",
+]
+
+
+def count_words(texts: List[str]) -> List[int]:
+    return [len(text.split()) for text in texts]
+
+
+def chunk(max_tokens: int, overlap_tokens: int) -> List[Dict[str, Any]]:
+    return list(iter_text_chunks(PAGES, max_tokens, overlap_tokens, count_words))
+
+
+def document_text() -> str:
+    return " ".join(text for text in map(clean_text, PAGES) if text)
+
+
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(12, 0), (25, 8), (500, 50)])
+def test_offsets_slice_back_to_the_text(max_tokens: int, overlap_tokens: int) -> None:
+    document = document_text()
+
+    for piece in chunk(max_tokens, overlap_tokens):
+        assert document[piece["char_start"] : piece["char_end"]] == piece["text"]
+
+
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(12, 0), (25, 8)])
+def test_chunks_fit_the_token_budget(max_tokens: int, overlap_tokens: int) -> None:
+    for piece in chunk(max_tokens, overlap_tokens):
+        assert piece["tokens"] == count_words([piece["text"]])[0]
+        assert 0 < piece["tokens"] <= max_tokens
+
+
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(12, 0), (25, 8), (500, 50)])
+def test_chunks_cover_the_whole_document(max_tokens: int, overlap_tokens: int) -> None:
+    document = document_text()
+    pieces = chunk(max_tokens, overlap_tokens)
+
+    assert pieces[0]["char_start"] == 0
+    assert pieces[-1]["char_end"] == len(document)
+    for previous, piece in zip(pieces, pieces[1:]):
+        assert previous["char_start"] < piece["char_start"]
+        assert document[previous["char_end"] : piece["char_start"]].strip() == ""
+
+
+def test_consecutive_chunks_overlap() -> None:
+    pieces = chunk(25, 8)
+
+    assert any(
+        piece["char_start"] < previous["char_end"]
+        for previous, piece in zip(pieces, pieces[1:])
+    )
+    assert all(
+        piece["char_start"] >= previous["char_end"]
+        for previous, piece in zip(chunk(25, 0), chunk(25, 0)[1:])
+    )
+
+
+def test_pages_count_empty_texts() -> None:
+    document = document_text()
+    page_of_offset: List[int] = []
+    for number, text in enumerate(map(clean_text, PAGES), start=1):
+        if text:
+            page_of_offset += [number] * (len(text) + 1)  # With the joining space
+
+    for piece in chunk(12, 0):
+        assert piece["page_start"] == page_of_offset[piece["char_start"]]
+        assert piece["page_end"] == page_of_offset[piece["char_end"] - 1]
+        assert document[piece["char_start"]] != " "
+    assert {piece["page_start"] for piece in chunk(12, 0)} == {1, 3, 4, 5}
+
+
+def test_empty_input_yields_nothing() -> None:
+    assert list(iter_text_chunks(["", "  "], 10, 2, count_words)) == []
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional
+
+from src.constants import MAX_HISTORY_MESSAGES, PROMPT_HISTORY_TRIM_STEP
+from src.context import (
+    MIN_OVERLAP_WORDS,
+    PASSAGE_PREFIX,
+    estimate_message_tokens,
+    merge_search_results,
+    pack_history,
+)
+
+DOCUMENT = (
+    "Solar panels convert sunlight into electricity. Inverters turn the direct "
+    "current into alternating current. Batteries store energy for the night. "
+    "Meters measure what flows back into the grid."
+)
+
+
+def hit(
+    text: str, start: Optional[int] = None, document_name: str = "solar.pdf"
+) -> Dict[str, Any]:
+    source: Dict[str, Any] = {"text": text, "document_name": document_name}
+    if start is not None:
+        source["char_start"] = start
+        source["char_end"] = start + len(text)
+    return {"_source": source}
+
+
+def chunk_hit(start: int, end: int, **kwargs: Any) -> Dict[str, Any]:
+    return hit(DOCUMENT[start:end], start, **kwargs)
+
+
+def conversation(count: int, content: str = "x" * 40) -> List[Dict[str, str]]:
+    roles = ("user", "assistant")
+    return [{"role": roles[i % 2], "content": content} for i in range(count)]
+
+
+def test_overlapping_chunks_merge_into_one_passage() -> None:
+    passages = merge_search_results([chunk_hit(40, 110), chunk_hit(0, 60)])
+
+    assert passages == [
+        {"document_name": "solar.pdf", "text": DOCUMENT[:110], "rank": 0, "chunks": 2}
+    ]
+
+
+def test_adjacent_chunks_are_joined_with_their_separator() -> None:
+    passages = merge_search_results([chunk_hit(0, 47), chunk_hit(48, 110)])
+
+    assert [passage["text"] for passage in passages] == [DOCUMENT[:110]]
+
+
+def test_distant_chunks_stay_apart_in_rank_order() -> None:
+    passages = merge_search_results(
+        [chunk_hit(120, 150), chunk_hit(0, 30), chunk_hit(5, 40)]
+    )
+
+    assert [(passage["rank"], passage["chunks"]) for passage in passages] == [
+        (0, 1),
+        (1, 2),
+    ]
+    assert passages[1]["text"] == DOCUMENT[:40]
+
+
+def test_chunks_of_other_documents_are_not_merged() -> None:
+    passages = merge_search_results(
+        [chunk_hit(0, 60), chunk_hit(40, 110, document_name="other.pdf")]
+    )
+
+    assert [passage["document_name"] for passage in passages] == [
+        "solar.pdf",
+        "other.pdf",
+    ]
+
+
+def test_passage_prefix_is_removed() -> None:
+    passages = merge_search_results([hit(PASSAGE_PREFIX + DOCUMENT)])
+
+    assert passages[0]["text"] == DOCUMENT
+
+
+def test_chunks_without_offsets_are_stitched_by_shared_words() -> None:
+    words = [f"w{i}" for i in range(MIN_OVERLAP_WORDS + 10)]
+    first = " ".join(words[:-5])
+    second = " ".join(words[5:])
+
+    passages = merge_search_results([hit(second), hit(first)])
+
+    assert [(passage["text"], passage["chunks"]) for passage in passages] == [
+        (" ".join(words), 2)
+    ]
+
+
+def test_chunks_without_offsets_need_enough_shared_words() -> None:
+    words = [f"w{i}" for i in range(MIN_OVERLAP_WORDS + 10)]
+    first = " ".join(words[: MIN_OVERLAP_WORDS - 1])
+    second = " ".join(words[1:])
+
+    passages = merge_search_results([hit(first + " end"), hit(second)])
+
+    assert len(passages) == 2
+
+
+def test_history_within_budget_is_kept() -> None:
+    history = conversation(4)
+    tokens = sum(estimate_message_tokens(message) for message in history)
+
+    kept, summary, counts = pack_history(history, tokens)
+
+    assert (kept, summary) == (history, "")
+    assert counts == {"history": tokens, "kept": 4, "summarised": 0, "dropped": 0}
+
+
+def test_history_is_cut_at_a_trim_step_and_summarised() -> None:
+    history = conversation(PROMPT_HISTORY_TRIM_STEP + 2)
+    history[0]["content"] = "What do inverters do? " + "x" * 40
+
+    kept, summary, counts = pack_history(history, 100)
+
+    assert kept == history[PROMPT_HISTORY_TRIM_STEP:]
+    assert summary.startswith("Earlier, the user asked: What do inverters do?")
+    assert counts["summarised"] == PROMPT_HISTORY_TRIM_STEP
+    assert counts["dropped"] == 0
+    assert counts["history"] <= 100
+
+
+def test_history_summary_is_dropped_when_it_does_not_fit() -> None:
+    history = conversation(PROMPT_HISTORY_TRIM_STEP + 2)
+    kept_tokens = 2 * estimate_message_tokens(history[-1])
+
+    kept, summary, counts = pack_history(history, kept_tokens)
+
+    assert kept == history[PROMPT_HISTORY_TRIM_STEP:]
+    assert summary == ""
+    assert counts["dropped"] == PROMPT_HISTORY_TRIM_STEP
+    assert counts["history"] == kept_tokens
+
+
+def test_history_keeps_at_most_max_history_messages() -> None:
+    history = conversation(MAX_HISTORY_MESSAGES + 1, "hi")
+
+    kept, _, _ = pack_history(history, 10_000)
+
+    assert 0 < len(kept) <= MAX_HISTORY_MESSAGES
+    assert kept == history[-len(kept) :]
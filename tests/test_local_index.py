@@ -0,0 +1,178 @@
+import inspect
+import threading
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from src.local_index import LocalHybridIndex
+from src.retrieval import LocalBackend, OpenSearchBackend, RetrievalBackend
+
+DIMENSION = 4
+
+
+def make_chunk(
+    doc_id: str,
+    document_name: str,
+    text: str,
+    embedding: List[float],
+    page: Optional[int] = None,
+) -> Dict[str, Any]:
+    chunk: Dict[str, Any] = {
+        "doc_id": doc_id,
+        "document_name": document_name,
+        "text": text,
+        "embedding": embedding,
+    }
+    if page is not None:
+        chunk["page_start"] = chunk["page_end"] = page
+    return chunk
+
+
+@pytest.fixture
+def index(tmp_path: Any) -> LocalHybridIndex:
+    index = LocalHybridIndex(str(tmp_path / "index"), DIMENSION)
+    index.add_documents(
+        [
+            make_chunk("a1", "a.pdf", "apples grow on trees", [1, 0, 0, 0], 1),
+            make_chunk("a2", "a.pdf", "pears are sweet fruit", [0, 1, 0, 0], 2),
+            make_chunk("b1", "b.pdf", "rockets fly to space", [0, 0, 1, 0], 1),
+        ]
+    )
+    return index
+
+
+def search_ids(
+    index: LocalHybridIndex, filters: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """Returns the sorted ids of every chunk a search can return."""
+    hits = index.hybrid_search("fruit", [0.5] * DIMENSION, top_k=10, filters=filters)
+    return sorted(hit["_id"] for hit in hits)
+
+
+def test_search_ranks_matching_chunk_first(index: LocalHybridIndex) -> None:
+    hits = index.hybrid_search("apples", [1, 0, 0, 0], top_k=2)
+
+    assert hits[0]["_id"] == "a1"
+    assert hits[0]["_source"]["document_name"] == "a.pdf"
+    assert "embedding" not in hits[0]["_source"]
+
+
+def test_vector_leg_finds_chunks_without_shared_words(index: LocalHybridIndex) -> None:
+    hits = index.hybrid_search("zzz", [0, 0, 1, 0], top_k=1)
+
+    assert [hit["_id"] for hit in hits] == ["b1"]
+
+
+def test_re_adding_a_chunk_replaces_it(index: LocalHybridIndex) -> None:
+    index.add_documents(
+        [make_chunk("a1", "a.pdf", "cherries grow on trees", [1, 0, 0, 0], 1)]
+    )
+
+    hits = index.hybrid_search("cherries", [1, 0, 0, 0], top_k=1)
+
+    assert index.document_chunk_counts() == {"a.pdf": 2, "b.pdf": 1}
+    assert search_ids(index) == ["a1", "a2", "b1"]
+    assert hits[0]["_source"]["text"].endswith("cherries grow on trees")
+
+
+def test_delete_document_removes_its_chunks(index: LocalHybridIndex) -> None:
+    assert index.delete_document("a.pdf") == 2
+
+    assert index.document_chunk_counts() == {"b.pdf": 1}
+    assert search_ids(index) == ["b1"]
+
+
+def test_apply_chunk_changes_deletes_and_moves_chunks(
+    index: LocalHybridIndex,
+) -> None:
+    changed = index.apply_chunk_changes(
+        ["a2"], {"a1": {"page_start": 5, "page_end": 6}}
+    )
+
+    assert changed == 2
+    assert index.document_chunks("a.pdf") == {
+        "a1": {
+            "chunk_hash": None,
+            "char_start": None,
+            "char_end": None,
+            "page_start": 5,
+            "page_end": 6,
+        }
+    }
+
+
+def test_filters_restrict_documents(index: LocalHybridIndex) -> None:
+    assert search_ids(index, {"document_names": ["b.pdf"]}) == ["b1"]
+
+
+def test_filters_restrict_pages(index: LocalHybridIndex) -> None:
+    assert search_ids(index, {"page_from": 2, "page_to": 3}) == ["a2"]
+
+
+def test_page_filters_match_chunks_without_pages(index: LocalHybridIndex) -> None:
+    index.add_documents([make_chunk("c1", "c.pdf", "old pears", [0, 1, 0, 0])])
+
+    assert search_ids(index, {"page_from": 2, "page_to": 2}) == ["a2", "c1"]
+
+
+def test_empty_document_filter_matches_nothing(index: LocalHybridIndex) -> None:
+    assert search_ids(index, {"document_names": []}) == []
+
+
+def test_writes_of_another_instance_are_picked_up(
+    index: LocalHybridIndex, tmp_path: Any
+) -> None:
+    other = LocalHybridIndex(str(tmp_path / "index"), DIMENSION)
+    other.add_documents([make_chunk("d1", "d.pdf", "comets", [0, 0, 0, 1])])
+
+    assert search_ids(index) == ["a1", "a2", "b1", "d1"]
+
+
+def test_concurrent_instances_allocate_distinct_rows(
+    index: LocalHybridIndex, tmp_path: Any
+) -> None:
+    writers = [LocalHybridIndex(str(tmp_path / "index"), DIMENSION) for _ in range(2)]
+
+    def write(writer: LocalHybridIndex, name: str) -> None:
+        for i in range(20):
+            writer.add_documents(
+                [make_chunk(f"{name}{i}", name, "comets", [0, 0, 0, 1])]
+            )
+
+    threads = [
+        threading.Thread(target=write, args=(writer, f"{i}.pdf"))
+        for i, writer in enumerate(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reopened = LocalHybridIndex(str(tmp_path / "index"), DIMENSION)
+    assert reopened.document_chunk_counts() == {
+        "a.pdf": 2,
+        "b.pdf": 1,
+        "0.pdf": 20,
+        "1.pdf": 20,
+    }
+    assert reopened.hybrid_search("zzz", [1, 0, 0, 0], top_k=1)[0]["_id"] == "a1"
+
+
+def test_index_is_reloaded_from_disk(index: LocalHybridIndex, tmp_path: Any) -> None:
+    reopened = LocalHybridIndex(str(tmp_path / "index"), DIMENSION)
+
+    assert reopened.document_chunk_counts() == {"a.pdf": 2, "b.pdf": 1}
+    assert reopened.hybrid_search("zzz", [0, 1, 0, 0], top_k=1)[0]["_id"] == "a2"
+
+
+@pytest.mark.parametrize("backend", [LocalBackend, OpenSearchBackend])
+def test_backends_match_the_protocol(backend: type) -> None:
+    for name, member in vars(RetrievalBackend).items():
+        if name.startswith("_") or not callable(member):
+            continue
+        expected = inspect.signature(member)
+        actual = inspect.signature(getattr(backend, name))
+        assert list(actual.parameters) == list(expected.parameters), name
+        for parameter in expected.parameters.values():
+            assert actual.parameters[parameter.name].default == parameter.default, name
+    assert isinstance(getattr(backend, "name", None), str)
@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Set
+
+import numpy as np
+import pytest
+
+import src.pipeline as pipeline
+from src.catalog import get_document
+from src.retrieval import LocalBackend, set_retrieval_backend
+
+DIMENSION = 4
+SENTENCES = ["Solar panels make power.", "Batteries store it overnight."]
+
+
+class ResendingBackend(LocalBackend):
+    """A local backend that, like OpenSearch, re-indexes chunks that moved."""
+
+    def updates_in_place(self) -> bool:
+        return False
+
+
+def count_words(texts: List[str]) -> List[int]:
+    return [len(text.split()) for text in texts]
+
+
+def embed(chunks: List[str], *args: Any, **kwargs: Any) -> np.ndarray[Any, Any]:
+    return np.ones((len(chunks), DIMENSION), dtype=np.float32)
+
+
+@pytest.fixture
+def pdf(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> str:
+    # The catalog and the index generation marker live under the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, "count_tokens", count_words)
+    monkeypatch.setattr(pipeline, "get_max_chunk_tokens", lambda limit: 4)
+    monkeypatch.setattr(pipeline, "TEXT_CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(pipeline, "generate_embeddings", embed)
+    path = tmp_path / "solar.pdf"
+    path.write_bytes(b"%PDF")
+    return str(path)
+
+
+def ingest(pdf: str, pages: List[str], update: bool = False) -> Dict[str, Any]:
+    return pipeline.ingest_pdf(pdf, "solar.pdf", update=update, pages=pages)
+
+
+@pytest.mark.parametrize("backend_class", [LocalBackend, ResendingBackend])
+def test_update_counts_moved_chunks_once(
+    pdf: str, tmp_path: Any, backend_class: type
+) -> None:
+    backend = backend_class(str(tmp_path / "index"), DIMENSION)
+    set_retrieval_backend(backend)
+    try:
+        assert ingest(pdf, [" ".join(SENTENCES)])["indexed"] == 2
+
+        # The new first sentence shifts the offsets of both indexed chunks
+        stats = ingest(pdf, [" ".join(["Wind turbines help.", *SENTENCES])], True)
+    finally:
+        set_retrieval_backend(None)
+
+    resent = 2 if backend_class is ResendingBackend else 0
+    assert (stats["indexed"], stats["unchanged"]) == (1 + resent, 2 - resent)
+    assert stats["deleted"] == 0
+    assert backend.document_chunk_counts() == {"solar.pdf": 3}
+    document = get_document("solar.pdf")
+    assert document is not None and document["chunk_count"] == 3
+
+
+CHUNKS = [
+    {"doc_id": "new", "char_start": 0},
+    {"doc_id": "same", "char_start": 10},
+    {"doc_id": "moved", "char_start": 30},
+]
+EXISTING = {"same": {"char_start": 10}, "moved": {"char_start": 20}}
+
+
+def test_moved_chunks_are_kept_and_updated_in_place() -> None:
+    kept: Set[str] = set()
+    moved: Dict[str, Dict[str, Any]] = {}
+
+    sent = list(pipeline.iter_new_chunks(CHUNKS, EXISTING, kept, moved))
+
+    assert [chunk["doc_id"] for chunk in sent] == ["new"]
+    assert kept == {"same", "moved"}
+    assert moved == {"moved": {"char_start": 30}}
+
+
+def test_moved_chunks_are_resent_without_being_kept() -> None:
+    kept: Set[str] = set()
+    moved: Dict[str, Dict[str, Any]] = {}
+    resent: Set[str] = set()
+
+    sent = list(pipeline.iter_new_chunks(CHUNKS, EXISTING, kept, moved, resent))
+
+    assert [chunk["doc_id"] for chunk in sent] == ["new", "moved"]
+    assert (kept, moved, resent) == ({"same"}, {}, {"moved"})